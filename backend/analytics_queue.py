@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+
+
+class AnalyticsEvent(NamedTuple):
+    user_id: str
+    interaction_type: str  # 'chat', 'quiz' or 'concept_detective'
+    question: str
+    response: str
+    submitted_at: float
+    attempts: int = 0
+    score: Optional[float] = None  # 0-100 for graded answers
+
+
+class AnalyticsQueue:
+    """
+    In-process queue for learner analytics that must not delay a response.
+
+    Endpoints submit() an event and return right away. Events are sharded by
+    user over the workers, so one user's events are always handled in order
+    by the same worker and never concurrently. A worker collects what arrives
+    within batch_window seconds (up to max_batch events), groups it per user
+    and calls handler(user_id, events) once per user.
+
+    Each shard holds at most max_pending / workers events. When a shard is
+    full, the drop policy decides whether the oldest waiting event or the new
+    one is dropped. A failing batch is retried with a growing delay up to
+    max_retries times and then dropped. CPU-bound work can be handed to
+    run_cpu(), which uses a process pool when process_workers > 0.
+    """
+
+    def __init__(self, handler: Callable[[str, List[AnalyticsEvent]], Awaitable[Any]], workers: int = 2,
+                 max_pending: int = 10000, max_batch: int = 100, batch_window: float = 0.5,
+                 max_retries: int = 3, retry_delay: float = 1.0, drop_policy: str = DROP_OLDEST,
+                 process_workers: int = 0):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.drop_policy = drop_policy
+        self.process_workers = process_workers
+        self._shards: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._accepting = False
+        self.metrics = {
+            "submitted": 0,
+            "processed": 0,
+            "batches": 0,
+            "dropped_full": 0,
+            "retried": 0,
+            "dropped_failed": 0,
+            "max_batch_size": 0,
+            "last_lag": 0.0,
+            "max_lag": 0.0,
+        }
+
+    def _shard_for(self, user_id: str) -> asyncio.Queue:
+        return self._shards[zlib.crc32(user_id.encode("utf-8")) % len(self._shards)]
+
+    def _enqueue(self, event: AnalyticsEvent) -> bool:
+        shard = self._shard_for(event.user_id)
+        if shard.full():
+            self.metrics["dropped_full"] += 1
+            if self.drop_policy != DROP_OLDEST:
+                return False
+            shard.get_nowait()
+            shard.task_done()
+        shard.put_nowait(event)
+        return True
+
+    def submit(self, user_id: Optional[str], interaction_type: str, question: str, response: str,
+               score: Optional[float] = None) -> bool:
+        """
+        Queues an interaction without waiting; False when it was not accepted
+        """
+        if not user_id or not self._accepting:
+            return False
+        self.metrics["submitted"] += 1
+        return self._enqueue(AnalyticsEvent(user_id, interaction_type, question, response, time.monotonic(),
+                                            score=score))
+
+    async def run_cpu(self, fn: Callable, *args):
+        """
+        Runs fn in the process pool when one is configured, otherwise inline
+        """
+        if self._executor is None:
+            return fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def _collect(self, shard: asyncio.Queue) -> List[AnalyticsEvent]:
+        batch = [await shard.get()]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch:
+            if not shard.empty():
+                batch.append(shard.get_nowait())
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(shard.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _retry(self, events: List[AnalyticsEvent]):
+        retry = [event._replace(attempts=event.attempts + 1) for event in events if event.attempts < self.max_retries]
+        self.metrics["dropped_failed"] += len(events) - len(retry)
+        if not retry:
+            return
+        self.metrics["retried"] += len(retry)
+        delay = self.retry_delay * 2 ** retry[0].attempts
+        loop = asyncio.get_running_loop()
+        loop.call_later(delay, lambda: [self._enqueue(event) for event in retry])
+
+    async def _worker(self, shard: asyncio.Queue):
+        while True:
+            batch = await self._collect(shard)
+            try:
+                by_user: Dict[str, List[AnalyticsEvent]] = {}
+                for event in batch:
+                    by_user.setdefault(event.user_id, []).append(event)
+                for user_id, events in by_user.items():
+                    try:
+                        await self.handler(user_id, events)
+                    except Exception as e:
+                        logger.error(f"Analytics for user {user_id} failed ({len(events)} events): {e}")
+                        self._retry(events)
+                        continue
+                    lag = time.monotonic() - min(event.submitted_at for event in events)
+                    self.metrics["processed"] += len(events)
+                    self.metrics["last_lag"] = lag
+                    self.metrics["max_lag"] = max(self.metrics["max_lag"], lag)
+                self.metrics["batches"] += 1
+                self.metrics["max_batch_size"] = max(self.metrics["max_batch_size"], len(batch))
+            finally:
+                for _ in batch:
+                    shard.task_done()
+
+    async def start(self):
+        if self.process_workers > 0:
+            self._executor = ProcessPoolExecutor(max_workers=self.process_workers)
+        shard_size = max(1, self.max_pending // self.workers)
+        self._shards = [asyncio.Queue(maxsize=shard_size) for _ in range(self.workers)]
+        self._tasks = [asyncio.create_task(self._worker(shard)) for shard in self._shards]
+        self._accepting = True
+
+    async def stop(self, timeout: float = 10.0):
+        """
+        Stops accepting events, works off what is queued for up to timeout seconds, then stops the workers
+        """
+        self._accepting = False
+        try:
+            await asyncio.wait_for(asyncio.gather(*(shard.join() for shard in self._shards)), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dropped {self.pending()} queued analytics events at shutdown")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def pending(self) -> int:
+        return sum(shard.qsize() for shard in self._shards)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.metrics, "pending": self.pending(), "workers": self.workers,
+                "process_workers": self.process_workers, "drop_policy": self.drop_policy}
@@ -1,40 +1,101 @@
 # backend/app.py
 
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import os
-import shutil
 import uuid
 from deepgram import Deepgram
 from dotenv import load_dotenv
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, Response
+from starlette.background import BackgroundTask
 import json
 import asyncio
+import hashlib
 from enum import Enum
 import time
-import subprocess
-import requests
+from datetime import datetime
+from contextlib import asynccontextmanager
 import re
 from youtube_transcript_api import YouTubeTranscriptApi
 from youtube_transcript_api.formatters import TextFormatter
 from supadata import Supadata, SupadataError
-import PyPDF2
 import numpy as np
 from sentence_transformers import SentenceTransformer
 from auth import router as auth_router
+from transcript_timeline import SentenceTimeline, TimelineStore, msgpack
+from ytdlp_pool import ytdlp_pool
+from http_client import http_client
+from pdf_extraction import pdf_extractor, join_pages
+from document_store import DocumentPageStore, DocumentArtifactCache
+from uploads import (
+    save_upload,
+    check_pdf_pages,
+    check_audio_duration,
+    configure_spooling,
+    upload_metrics,
+    UploadLimitMiddleware,
+    MAX_PDF_BYTES,
+    MAX_AUDIO_BYTES,
+    MULTIPART_OVERHEAD,
+)
+from chunking import chunk_text, chunk_pages, chunk_sentences
+from caption_parser import parse_captions
+from transcript_cache import transcript_cache
+from bulk_ingest import BulkIngestManager
+from style_profiler import style_profiler
+from profile_cache import profile_cache
+from analytics_queue import AnalyticsQueue, AnalyticsEvent
+from knowledge_tracing import TopicMatcher
+from attempts_repository import attempt_repository, recompute_recent_metrics, ATTEMPT_WINDOW_DAYS
+from cohort_metrics import recompute_cohort_metrics
+from cohort_analytics import cohort_analytics
 from student_modeling import (
-    extract_learning_styles,
     update_knowledge_trace,
-    save_student_profile,
-    get_student_profile,
     get_knowledge_state,
+    LLMInteraction,
+    evaluate_llm_interactions,
+    update_learning_profile_from_llm,
+    save_knowledge_state,
+    attempt_to_row,
+    record_attempt_score,
     LearningStyleProfile,
     KnowledgeState
 )
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm the yt-dlp workers and the outbound connection pool before the first request
+    ytdlp_pool.start()
+    http_client.start()
+    await bulk_ingest_manager.start()
+    await profile_cache.start()
+    await analytics_queue.start()
+    await attempt_repository.start()
+    await cohort_analytics.start()
+    yield
+    await bulk_ingest_manager.stop()
+    await analytics_queue.stop()
+    await cohort_analytics.stop()
+    await attempt_repository.stop()
+    await profile_cache.stop()
+    await http_client.aclose()
+    ytdlp_pool.shutdown()
+    pdf_extractor.shutdown()
+
+app = FastAPI(lifespan=lifespan)
+
+# Reject oversized uploads while they stream in, before they are spooled
+configure_spooling()
+app.add_middleware(
+    UploadLimitMiddleware,
+    limits={
+        "/api/transcribe": MAX_AUDIO_BYTES + MULTIPART_OVERHEAD,
+        "/api/process-pdf": MAX_PDF_BYTES + MULTIPART_OVERHEAD,
+        "/api/process-pdf-stream": MAX_PDF_BYTES + MULTIPART_OVERHEAD,
+    }
+)
 
 # Add CORS middleware to allow frontend to connect
 app.add_middleware(
@@ -81,6 +142,22 @@ if GROQ_API_KEY:
 UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# Compact sentence timelines of recent transcriptions, served page by page
+timeline_store = TimelineStore(max_entries=int(os.getenv("TIMELINE_STORE_SIZE", "256")))
+
+# Extracted document pages, referenced from responses instead of inlined
+document_pages = DocumentPageStore(max_documents=int(os.getenv("DOCUMENT_STORE_SIZE", "128")))
+
+# Extracted pages, chunks, summaries and quizzes of uploaded documents keyed by content hash
+document_cache = DocumentArtifactCache(
+    max_documents=int(os.getenv("DOCUMENT_CACHE_SIZE", "128")),
+    persist_dir=os.getenv("DOCUMENT_CACHE_DIR") or None
+)
+
+# Retrieval chunk size and overlap, in approximate tokens
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "128"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "24"))
+
 # Define the teaching modes
 class TeachingMode(str, Enum):
     SOCRATIC = "socratic"
@@ -89,6 +166,48 @@ class TeachingMode(str, Enum):
     COLLEGE = "college"
     PHD = "phd"
 
+@app.get("/api/upload-stats")
+async def get_upload_stats():
+    """
+    Upload counters, limit rejections and the memory footprint of recent uploads
+    """
+    return upload_metrics.snapshot()
+
+@app.get("/api/profile-cache-stats")
+async def get_profile_cache_stats():
+    """
+    Write-behind metrics of the student profile cache: flush lag, batch sizes and dirty backlog
+    """
+    return profile_cache.snapshot()
+
+@app.get("/api/analytics-queue-stats")
+async def get_analytics_queue_stats():
+    """
+    Backlog, drops, retries and processing lag of the learner analytics queue
+    """
+    return analytics_queue.snapshot()
+
+@app.get("/api/attempt-stats")
+async def get_attempt_stats():
+    """
+    Buffered, inserted and read counts of the learning attempts repository
+    """
+    return attempt_repository.snapshot()
+
+@app.get("/api/cohort-analytics-stats")
+async def get_cohort_analytics_stats():
+    """
+    Observed changes, materialized views and the last rebuild's duration and drift
+    """
+    return cohort_analytics.snapshot()
+
+@app.get("/api/http-stats")
+async def get_http_stats():
+    """
+    Connection reuse metrics of the shared outbound HTTP client
+    """
+    return http_client.snapshot()
+
 # endpoint returns hello world
 @app.get("/")
 async def root():
@@ -175,21 +294,31 @@ async def transcribe_audio_endpoint(file: UploadFile = File(...)):
     
     # Save uploaded file
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        upload = await save_upload(file, file_path, max_bytes=MAX_AUDIO_BYTES)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error saving file: {str(e)}")
     
     # Transcribe the audio
     try:
-        transcription_result = await transcribe_audio(file_path)
+        with upload_metrics.track("/api/transcribe") as report:
+            report["bytes"] = upload["size"]
+            # Reject over-long recordings before paying for transcription
+            await check_audio_duration(file_path)
+            transcription_result = await transcribe_audio(file_path)
+        
+        # Keep a compact timeline so long recordings can be queried by time range
+        timeline_id = str(uuid.uuid4())
+        timeline_store.put(timeline_id, SentenceTimeline.from_sentences(transcription_result.get("sentences", [])))
         
         # Return the transcription with timestamps
         return {
             "success": True,
             "filename": file.filename,
             "transcription": transcription_result["transcript"],
-            "sentences": transcription_result["sentences"]
+            "sentences": transcription_result.get("sentences", []),
+            "timeline_id": timeline_id
         }
     except Exception as e:
         # Clean up the file in case of error
@@ -201,6 +330,66 @@ async def transcribe_audio_endpoint(file: UploadFile = File(...)):
         if os.path.exists(file_path):
             os.remove(file_path)
 
+def get_timeline_or_404(timeline_id: str) -> SentenceTimeline:
+    timeline = timeline_store.get(timeline_id)
+    if timeline is None:
+        raise HTTPException(status_code=404, detail="Transcript timeline not found")
+    return timeline
+
+@app.get("/api/transcripts/{timeline_id}/sentences")
+async def get_timeline_sentences(timeline_id: str, start: float = 0.0, end: Optional[float] = None,
+                                 page: int = 1, page_size: int = 200, format: str = "json"):
+    """
+    Endpoint to page through the sentences overlapping [start, end] of a transcription.
+    format is "json", "binary" (compact timeline wire format) or "msgpack"
+    """
+    timeline = get_timeline_or_404(timeline_id)
+    page = max(1, page)
+    page_size = max(1, min(page_size, 1000))
+    
+    lo, hi = timeline.range_indices(start, end)
+    total = hi - lo
+    page_lo = lo + (page - 1) * page_size
+    page_slice = timeline.slice(page_lo, min(hi, page_lo + page_size))
+    
+    pagination_headers = {
+        "X-Total-Count": str(total),
+        "X-Page": str(page),
+        "X-Page-Size": str(page_size),
+        "X-First-Index": str(page_lo)
+    }
+    
+    if format == "binary":
+        return Response(content=page_slice.to_bytes(), media_type="application/octet-stream", headers=pagination_headers)
+    if format == "msgpack":
+        if msgpack is None:
+            raise HTTPException(status_code=400, detail="msgpack encoding is not available on this server")
+        return Response(content=page_slice.to_msgpack(), media_type="application/x-msgpack", headers=pagination_headers)
+    if format != "json":
+        raise HTTPException(status_code=400, detail="format must be one of: json, binary, msgpack")
+    
+    return {
+        "success": True,
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "first_index": page_lo,
+        "sentences": page_slice.to_list()
+    }
+
+@app.get("/api/transcripts/{timeline_id}/sentence-at")
+async def get_timeline_sentence_at(timeline_id: str, t: float):
+    """
+    Endpoint to look up the sentence being spoken at playback position t (seconds)
+    """
+    timeline = get_timeline_or_404(timeline_id)
+    index = timeline.index_at(t)
+    return {
+        "success": True,
+        "index": index,
+        "sentence": timeline.sentence(index) if index is not None else None
+    }
+
 def generate_bullet_summary(transcript):
     """
     Generate a bullet-point summary of a transcript using Groq API
@@ -281,6 +470,15 @@ def generate_bullet_summary(transcript):
     except Exception as e:
         return f"Error generating summary: {str(e)}"
 
+def is_generated_summary(summary: Optional[str]) -> bool:
+    """
+    False for the mock and error placeholders of generate_bullet_summary and
+    generate_section_summary, which must not be cached
+    """
+    if not GROQ_API_KEY or not groq_client or not summary:
+        return False
+    return not summary.startswith("Error generating summary")
+
 # Define request and response models for the summary endpoint
 class SummaryRequest(BaseModel):
     transcript: str
@@ -438,6 +636,14 @@ def generate_quiz_questions(transcript, num_questions=5):
                 "options": ["Error", "Try again", "Check API key", "Contact support"],
                 "correct_answer": 2}]
 
+def is_generated_quiz(questions) -> bool:
+    """
+    False for the mock and error placeholders of generate_quiz_questions, which must not be cached
+    """
+    if not GROQ_API_KEY or not groq_client or not questions:
+        return False
+    return not any(q["question"].startswith(("Error generating quiz", "Error parsing quiz")) for q in questions)
+
 # Define request and response models for the quiz endpoint
 class QuizRequest(BaseModel):
     transcript: str
@@ -488,96 +694,144 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     messages: List[ChatMessage]
     transcript: str
+    session_id: Optional[str] = None  # Lets the learning-style profile be updated incrementally
 
 # Define the chat response model
 class ChatResponse(BaseModel):
     message: str
     
 @app.post("/api/chat", response_model=ChatResponse)
-async def chat_with_tutor(request: ChatRequest, user_id: str = None):
+async def chat_with_tutor(request: ChatRequest, background_tasks: BackgroundTasks, user_id: str = None):
     """
     Endpoint to chat with an AI tutor about the transcript content with enhanced learning style analysis
     """
     try:
-        # Get or create student profile
-        profile = await get_student_profile(user_id) if user_id else None
-        if not profile:
-            profile = LearningStyleProfile()
-        
-        # Extract learning styles from the conversation with temporal weighting
+        # The prompt only needs the dominant perceptual style. Take it from the cached
+        # profile, or this conversation's own style profile, without waiting on Supabase
         chat_history = [msg.content for msg in request.messages]
-        new_profile = extract_learning_styles(chat_history)
-        
-        # Update knowledge state with enhanced tracking
-        knowledge_state = update_knowledge_trace(chat_history)
-        
-        # Calculate learning metrics with more sophisticated analysis
+        session_key = style_profiler.session_key(chat_history, user_id, request.session_id)
+        profile = None
         if user_id:
-            # Calculate completion rate based on knowledge state with topic weights
-            if knowledge_state.topics:
-                weighted_completion = sum(
-                    score * weight 
-                    for topic, (score, weight) in knowledge_state.topics.items()
-                )
-                total_weight = sum(weight for _, (_, weight) in knowledge_state.topics.items())
-                completion_rate = weighted_completion / total_weight if total_weight > 0 else 0.0
-            else:
-                completion_rate = 0.0
-            
-            # Calculate time to learn with exponential moving average
-            message_times = [msg.timestamp for msg in request.messages if hasattr(msg, 'timestamp')]
-            if len(message_times) >= 2:
-                time_diffs = [(message_times[i] - message_times[i-1]).total_seconds() / 60 
-                            for i in range(1, len(message_times))]
-                alpha = 0.7  # EMA smoothing factor
-                avg_time = time_diffs[0]
-                for diff in time_diffs[1:]:
-                    avg_time = alpha * diff + (1 - alpha) * avg_time
-            else:
-                avg_time = profile.learning_metrics.get('time_to_learn', 0.0)
-            
-            # Calculate engagement score with multiple factors
-            total_chars = sum(len(msg.content) for msg in request.messages if msg.role == "user")
-            avg_msg_length = total_chars / len(request.messages) if request.messages else 0
-            
-            # Consider message frequency, length, and interaction quality
-            time_factor = min(1.0, avg_time / 120)  # Cap at 2 hours
-            length_factor = min(1.0, avg_msg_length / 500)
-            interaction_factor = min(1.0, len(request.messages) / 20)
-            
-            engagement_score = (
-                time_factor * 0.3 +
-                length_factor * 0.4 +
-                interaction_factor * 0.3
-            )
-            
-            # Update learning metrics with new calculations
-            new_profile.learning_metrics = {
-                'completion_rate': completion_rate,
-                'time_to_learn': avg_time,
-                'engagement_score': engagement_score
-            }
-            
-            # Merge profiles with temporal weighting
-            alpha = 0.7  # Profile update smoothing factor
-            for category in ['perceptual_mode', 'cognitive_style', 'social_preference', 
-                           'instruction_style', 'assessment_preference']:
-                current = getattr(profile, category)
-                new = getattr(new_profile, category)
-                for key in current:
-                    current[key] = alpha * new[key] + (1 - alpha) * current[key]
-            
-            # Save the updated profile
-            await save_student_profile(user_id, profile)
+            profile = profile_cache.peek(user_id) or style_profiler.peek(session_key)
+        
+        # Profile bookkeeping runs after the response has been sent
+        background_tasks.add_task(update_chat_analytics, request.messages, session_key, user_id)
         
         # Generate response based on learning style
         response = await generate_adaptive_response(request.messages, profile)
         
+        # The exchange is evaluated off the request path by the analytics queue
+        question = next((msg.content for msg in reversed(request.messages) if msg.role == "user"), "")
+        analytics_queue.submit(user_id, 'chat', question, response)
+        
         return ChatResponse(message=response)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def update_chat_analytics(messages: List[ChatMessage], session_key: str, user_id: Optional[str] = None):
+    """
+    Updates the learning-style profile and learning metrics after a chat turn
+    """
+    try:
+        # Extract learning styles from the conversation with temporal weighting,
+        # only the messages added since the previous turn are analyzed
+        chat_history = [msg.content for msg in messages]
+        new_profile = style_profiler.update(session_key, chat_history)
+        
+        if not user_id:
+            return
+        
+        # Get or create student profile, served from the write-behind cache
+        profile = await profile_cache.get_or_create(user_id)
+        
+        # Chat turns are not graded, so completion comes from the mastery traced on quiz answers
+        knowledge_state = await get_knowledge_state(user_id) or KnowledgeState()
+        
+        # Calculate completion rate based on knowledge state with topic weights
+        if knowledge_state.topics:
+            weighted_completion = sum(
+                score * weight 
+                for topic, (score, weight) in knowledge_state.topics.items()
+            )
+            total_weight = sum(weight for _, (_, weight) in knowledge_state.topics.items())
+            completion_rate = weighted_completion / total_weight if total_weight > 0 else 0.0
+        else:
+            completion_rate = 0.0
+        
+        # Calculate time to learn with exponential moving average
+        message_times = [msg.timestamp for msg in messages if hasattr(msg, 'timestamp')]
+        if len(message_times) >= 2:
+            time_diffs = [(message_times[i] - message_times[i-1]).total_seconds() / 60 
+                        for i in range(1, len(message_times))]
+            alpha = 0.7  # EMA smoothing factor
+            avg_time = time_diffs[0]
+            for diff in time_diffs[1:]:
+                avg_time = alpha * diff + (1 - alpha) * avg_time
+        else:
+            avg_time = profile.learning_metrics.get('time_to_learn', 0.0)
+        
+        # Calculate engagement score with multiple factors
+        total_chars = sum(len(msg.content) for msg in messages if msg.role == "user")
+        avg_msg_length = total_chars / len(messages) if messages else 0
+        
+        # Consider message frequency, length, and interaction quality
+        time_factor = min(1.0, avg_time / 120)  # Cap at 2 hours
+        length_factor = min(1.0, avg_msg_length / 500)
+        interaction_factor = min(1.0, len(messages) / 20)
+        
+        engagement_score = (
+            time_factor * 0.3 +
+            length_factor * 0.4 +
+            interaction_factor * 0.3
+        )
+        
+        # Update learning metrics with new calculations
+        new_profile.learning_metrics = {
+            'completion_rate': completion_rate,
+            'time_to_learn': avg_time,
+            'engagement_score': engagement_score
+        }
+        
+        # Merge profiles with temporal weighting
+        alpha = 0.7  # Profile update smoothing factor
+        for category in ['perceptual_mode', 'cognitive_style', 'social_preference', 
+                       'instruction_style', 'assessment_preference']:
+            current = getattr(profile, category)
+            new = getattr(new_profile, category)
+            for key in current:
+                current[key] = alpha * new[key] + (1 - alpha) * current[key]
+        
+        # Queue the updated profile, it is upserted by the next background flush
+        profile_cache.mark_dirty(user_id, profile)
+    
+    except Exception as e:
+        print(f"Error updating chat analytics: {e}")
+
+async def process_interaction_events(user_id: str, events: List[AnalyticsEvent]):
+    """
+    Evaluates a user's queued interactions and folds them into their profile, oldest first
+    """
+    interactions = [LLMInteraction(event.question, event.response, event.interaction_type, event.score)
+                    for event in events]
+    evaluations = await analytics_queue.run_cpu(evaluate_llm_interactions, interactions)
+    
+    profile = await profile_cache.get_or_create(user_id)
+    for interaction, evaluation in zip(interactions, evaluations):
+        update_learning_profile_from_llm(profile, interaction, evaluation)
+    profile_cache.mark_dirty(user_id, profile)
+
+analytics_queue = AnalyticsQueue(
+    process_interaction_events,
+    workers=int(os.getenv("ANALYTICS_WORKERS", "2")),
+    max_pending=int(os.getenv("ANALYTICS_MAX_PENDING", "10000")),
+    max_batch=int(os.getenv("ANALYTICS_BATCH", "100")),
+    batch_window=float(os.getenv("ANALYTICS_BATCH_SECONDS", "0.5")),
+    max_retries=int(os.getenv("ANALYTICS_RETRIES", "3")),
+    drop_policy=os.getenv("ANALYTICS_DROP_POLICY", "drop_oldest"),
+    process_workers=int(os.getenv("ANALYTICS_PROCESS_WORKERS", "0"))
+)
+
 async def generate_adaptive_response(messages: List[ChatMessage], profile: Optional[LearningStyleProfile] = None) -> str:
     """
     Generate a response that's adapted to the student's learning style
@@ -607,8 +861,8 @@ Your goal is to help the student understand the concepts deeply while matching t
         ChatMessage(role="system", content=system_prompt)
     ] + messages
     
-    # Generate the response using the existing chat generation logic
-    response = await generate_socratic_response(full_messages)
+    # Generate the response using the existing chat generation logic, off the event loop
+    response = await asyncio.to_thread(generate_socratic_response, full_messages)
     
     return response
 
@@ -758,57 +1012,35 @@ async def generate_streaming_response(messages):
         yield f"data: {json.dumps({'chunk': error_message})}\n\n"
         yield f"data: {json.dumps({'done': True})}\n\n"
 
-def get_youtube_subtitles(youtube_url):
+async def get_youtube_subtitles(youtube_url):
     try:
-        # Run yt-dlp to get subtitles using subprocess
-        result = subprocess.run(
-            ["python", "-m", "yt_dlp", "--write-auto-sub", "--sub-format", "vtt", 
-             "--skip-download", "--print-json", youtube_url],
-            capture_output=True, text=True
-        )
-        
-        if result.returncode != 0:
-            return f"Error: Failed to fetch subtitles. {result.stderr}"
+        # Extract video metadata in a warm yt-dlp worker instead of a fresh interpreter
+        try:
+            json_output = await ytdlp_pool.extract_info(
+                youtube_url, fields=("title", "automatic_captions")
+            )
+        except asyncio.TimeoutError:
+            return "Error: Failed to fetch subtitles. yt-dlp timed out"
+        except Exception as e:
+            return f"Error: Failed to fetch subtitles. {str(e)}"
         
-        json_output = json.loads(result.stdout)
-        subtitles = json_output.get("automatic_captions", {}).get("en", [])
+        subtitles = (json_output.get("automatic_captions") or {}).get("en", [])
         
         if not subtitles:
             return "Error: No subtitles found for this video"
         
         subtitle_url = subtitles[-1]["url"]
         
-        response = requests.get(subtitle_url)
+        response = await http_client.get(subtitle_url, route="captions")
         if response.status_code != 200:
             return f"Error: Failed to download subtitles. Status code: {response.status_code}"
         
-        vtt_content = response.text
-        
-        # Extract text content (no timestamps)
-        pattern = r'\d{2}:\d{2}:\d{2}\.\d{3} --> \d{2}:\d{2}:\d{2}\.\d{3}\s*(.*?)(?=\n\d{2}:\d{2}:\d{2}\.\d{3}|$)'
-        matches = re.findall(pattern, vtt_content, re.DOTALL)
-        
-        # Process and clean up the text with better formatting
-        full_transcript = ""
-        current_sentence = ""
-        
-        for text in matches:
-            # Clean up the text
-            clean_text = re.sub(r'align:(?:start|middle|end)\s+position:\d+%\s*', '', text)
-            clean_text = re.sub(r'<[^>]+>', '', clean_text)
-            clean_text = re.sub(r'\s+', ' ', clean_text).strip()
-            
-            if clean_text:
-                # Ensure proper spacing between segments
-                if full_transcript and not full_transcript.endswith(('.', '!', '?', '"', "'", ':', ';')):
-                    full_transcript += " "
-                full_transcript += clean_text
-        
-        # Improve sentence capitalization and spacing
-        full_transcript = re.sub(r'([.!?])\s*([a-z])', lambda m: m.group(1) + ' ' + m.group(2).upper(), full_transcript)
+        # Single pass over the cues, collapsing YouTube's rolling duplicate lines
+        parsed = parse_captions(response.text)
         
         return {
-            "full_transcript": full_transcript.strip(),
+            "full_transcript": parsed["full_transcript"],
+            "sentences": parsed["sentences"],
             "video_title": json_output.get("title", "YouTube Video")
         }
         
@@ -816,6 +1048,23 @@ def get_youtube_subtitles(youtube_url):
         return f"Error processing YouTube subtitles: {str(e)}"
 
 
+async def fetch_youtube_transcript(youtube_url: str) -> Dict[str, Any]:
+    """
+    Fetches captions with yt-dlp, reading through the shared transcript cache
+    """
+    async def fetch_subtitles():
+        result = await get_youtube_subtitles(youtube_url)
+        # Check if the result is an error message
+        if isinstance(result, str) and result.startswith("Error"):
+            raise HTTPException(status_code=500, detail=result)
+        return result
+    
+    video_id = extract_video_id(youtube_url)
+    if video_id:
+        return await transcript_cache.get_or_fetch(video_id, "en", fetch_subtitles,
+                                                   required=("full_transcript", "sentences", "video_title"))
+    return await fetch_subtitles()
+
 # Define request model for YouTube URL
 class YouTubeRequest(BaseModel):
     youtube_url: str
@@ -823,7 +1072,7 @@ class YouTubeRequest(BaseModel):
 @app.post("/api/youtube-transcribe2")
 async def youtube_transcribe_endpoint(request: YouTubeRequest):
     """
-    Endpoint to get transcription from a YouTube video URL (without timestamps)
+    Endpoint to get transcription from a YouTube video URL
     """
     try:
         if not request.youtube_url:
@@ -833,18 +1082,20 @@ async def youtube_transcribe_endpoint(request: YouTubeRequest):
         if not request.youtube_url.startswith(("https://www.youtube.com/", "https://youtu.be/")):
             raise HTTPException(status_code=400, detail="Invalid YouTube URL format")
             
-        # Get the transcription
-        result = get_youtube_subtitles(request.youtube_url)
-        
-        # Check if the result is an error message
-        if isinstance(result, str) and result.startswith("Error"):
-            raise HTTPException(status_code=500, detail=result)
+        # Get the transcription, reading through the shared transcript cache
+        result = await fetch_youtube_transcript(request.youtube_url)
             
-        # Format the response without timestamps/sentences
+        sentences = result.get("sentences", [])
+        timeline_id = str(uuid.uuid4())
+        timeline_store.put(timeline_id, SentenceTimeline.from_sentences(sentences))
+        
+        # Caption cue timestamps give YouTube transcripts the same sentence structure as audio
         return {
             "success": True,
             "video_title": result.get("video_title", "YouTube Video"),
-            "transcription": result.get("full_transcript", "")
+            "transcription": result.get("full_transcript", ""),
+            "sentences": sentences,
+            "timeline_id": timeline_id
         }
         
     except HTTPException:
@@ -1001,19 +1252,22 @@ async def youtube_transcribe_v2_endpoint(request: YouTubeRequest):
         if not video_id:
             raise HTTPException(status_code=400, detail="Could not extract video ID from URL")
             
-        try:
-            text_transcript = supadata.youtube.transcript(
+        async def fetch_from_supadata():
+            text_transcript = await asyncio.to_thread(
+                supadata.youtube.transcript,
                 video_id=video_id,
                 text=True,
                 lang="en"
             )
+            return {"full_transcript": text_transcript.content}
             
-            formatted_transcript = text_transcript.content
+        try:
+            result = await transcript_cache.get_or_fetch(video_id, "en", fetch_from_supadata)
             
             return {
                 "success": True,
-                "video_title": "YouTube Video",  # Default title
-                "transcription": formatted_transcript
+                "video_title": result.get("video_title", "YouTube Video"),  # Default title
+                "transcription": result.get("full_transcript", "")
             }
             
         except Exception as e:
@@ -1028,12 +1282,95 @@ async def youtube_transcribe_v2_endpoint(request: YouTubeRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing YouTube transcription: {str(e)}")
 
+async def ingest_video(video_id: str) -> Dict[str, Any]:
+    """
+    Bulk ingestion pipeline for one video: fetch and normalize captions,
+    chunk them for retrieval and pre-generate the summary
+    """
+    result = await fetch_youtube_transcript(f"https://www.youtube.com/watch?v={video_id}")
+    
+    if "summary" not in result:
+        transcript = result.get("full_transcript", "")
+        summary = await asyncio.to_thread(generate_bullet_summary, transcript[:16000])
+        sentences = result.get("sentences")
+        chunks = (chunk_sentences(sentences, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS) if sentences
+                  else chunk_text(transcript, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS))
+        result = {**result, "chunks": chunks}
+        # A placeholder summary is left out so the next ingest generates it again
+        if is_generated_summary(summary):
+            result["summary"] = summary
+        await transcript_cache.put(video_id, "en", result)
+    
+    return {
+        "video_title": result.get("video_title", "YouTube Video"),
+        "chunks": len(result.get("chunks", [])),
+        "sentences": len(result.get("sentences", []))
+    }
+
+bulk_ingest_manager = BulkIngestManager(
+    ingest_video,
+    checkpoint_dir=os.getenv("BULK_INGEST_DIR", "ingest_jobs"),
+    max_concurrency=int(os.getenv("BULK_INGEST_CONCURRENCY", "3"))
+)
+
+class BulkIngestRequest(BaseModel):
+    url: str
+    max_videos: Optional[int] = 200
+
+@app.post("/api/bulk-ingest")
+async def bulk_ingest_endpoint(request: BulkIngestRequest):
+    """
+    Endpoint to queue every video of a YouTube playlist or channel for ingestion
+    """
+    if not request.url.startswith(("https://www.youtube.com/", "https://youtube.com/")):
+        raise HTTPException(status_code=400, detail="Invalid YouTube playlist or channel URL")
+    
+    try:
+        job = await bulk_ingest_manager.submit(request.url, max(1, min(request.max_videos, 500)))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error expanding playlist: {str(e)}")
+    
+    if not job.videos:
+        raise HTTPException(status_code=400, detail="No videos found at this URL")
+    
+    return {
+        "success": True,
+        "job_id": job.job_id,
+        "title": job.title,
+        "total": len(job.videos)
+    }
+
+@app.get("/api/bulk-ingest/{job_id}")
+async def bulk_ingest_status(job_id: str):
+    """
+    Endpoint to get the per-video status of a bulk ingestion job
+    """
+    job = bulk_ingest_manager.jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Bulk ingest job not found")
+    return {"success": True, **job.to_dict()}
+
+@app.get("/api/bulk-ingest/{job_id}/events")
+async def bulk_ingest_events(job_id: str):
+    """
+    Endpoint streaming per-video progress of a bulk ingestion job as server-sent events
+    """
+    if job_id not in bulk_ingest_manager.jobs:
+        raise HTTPException(status_code=404, detail="Bulk ingest job not found")
+    
+    async def event_stream():
+        async for event in bulk_ingest_manager.events(job_id):
+            yield f"data: {json.dumps(event)}\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 # Add new models for PDF processing
 class PDFSummaryResponse(BaseModel):
     success: bool
     summary: str
     questions: List[QuizQuestion]
     transcript: str
+    document_id: Optional[str] = None  # SHA-256 of the uploaded file
     error: Optional[str] = None
 
 @app.post("/api/process-pdf", response_model=PDFSummaryResponse)
@@ -1048,15 +1385,34 @@ async def process_pdf_endpoint(file: UploadFile = File(...)):
         # Create a temporary file to store the uploaded PDF
         temp_file_path = os.path.join(UPLOAD_DIR, f"temp_{uuid.uuid4()}.pdf")
         try:
-            # Save the uploaded file temporarily
-            with open(temp_file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-
-            # Extract text from PDF
-            pdf_text = extract_text_from_pdf_file(temp_file_path)
+            # Save the uploaded file temporarily, hashing it on the way
+            upload = await save_upload(file, temp_file_path, max_bytes=MAX_PDF_BYTES)
+            content_hash = upload["sha256"]
+            
+            # A known document is served from its cached artifacts without extraction or LLM calls
+            cached = await document_cache.get(content_hash)
+            if cached and "summary" in cached and "questions" in cached:
+                return {
+                    "success": True,
+                    "document_id": content_hash,
+                    "transcript": join_pages(cached["pages"]),
+                    "summary": cached["summary"],
+                    "questions": cached["questions"],
+                    "error": None
+                }
+
+            # Extract text from PDF, the page limit is checked before any text is extracted
+            if cached and "pages" in cached:
+                pages = cached["pages"]
+            else:
+                with upload_metrics.track("/api/process-pdf") as report:
+                    report["bytes"] = upload["size"]
+                    page_count = await check_pdf_pages(temp_file_path)
+                    pages = await extract_pages_from_pdf_file(temp_file_path, page_count)
+            pdf_text = join_pages(pages)
             
             # Create chunks
-            chunks = create_chunks(pdf_text)
+            chunks = cached["chunks"] if cached and "chunks" in cached else chunk_pages(pages, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS)
             
             if not chunks:
                 raise HTTPException(status_code=400, detail="Could not extract text from PDF")
@@ -1130,8 +1486,21 @@ async def process_pdf_endpoint(file: UploadFile = File(...)):
                 
             summary = response.choices[0].message.content
             
+            # A placeholder quiz is left out so the next upload generates it again
+            artifacts = {"questions": questions} if is_generated_quiz(questions) else {}
+            await document_cache.update(
+                content_hash,
+                filename=file.filename,
+                page_count=len(pages),
+                pages=pages,
+                chunks=chunks,
+                summary=summary,
+                **artifacts
+            )
+            
             return {
                 "success": True,
+                "document_id": content_hash,
                 "transcript": pdf_text,
                 "summary": summary,
                 "questions": questions,
@@ -1152,42 +1521,196 @@ async def process_pdf_endpoint(file: UploadFile = File(...)):
             "error": str(e)
         }
 
-def extract_text_from_pdf_file(file_path: str) -> str:
+def generate_section_summary(section_text: str, first_page: int, last_page: int) -> str:
     """
-    Extract text from a PDF file
+    Generate a short bullet-point summary of one page window of a document using Groq API
     """
+    if not GROQ_API_KEY or not groq_client:
+        return f"• Mock summary of pages {first_page}-{last_page}. Please set the GROQ_API_KEY environment variable for actual summary generation."
+    
     try:
-        with open(file_path, 'rb') as file:
-            # Create a PDF reader object
-            pdf_reader = PyPDF2.PdfReader(file)
-            # Join text from all pages into one string
-            text = " ".join(page.extract_text() or "" for page in pdf_reader.pages)
-            return text.strip()
+        prompt = f"""
+        Summarize pages {first_page}-{last_page} of a document as concise bullet points.
+        
+        - Use a markdown header (##) naming the main topic of these pages
+        - Use bullet points (*) for the key points, definitions and examples
+        - Only cover what appears in this excerpt
+        
+        Excerpt:
+        {section_text}
+        """
+        
+        response = groq_client.chat.completions.create(
+            model="llama-3.3-70b-versatile",
+            messages=[
+                {"role": "system", "content": "You are a helpful assistant that creates concise, well-organized bullet point summaries."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.3,
+            max_tokens=512
+        )
+        return response.choices[0].message.content
     except Exception as e:
+        return f"Error generating summary: {str(e)}"
+
+PDF_STREAM_WINDOW = int(os.getenv("PDF_STREAM_WINDOW", "10"))
+
+@app.post("/api/process-pdf-stream")
+async def process_pdf_stream_endpoint(file: UploadFile = File(...)):
+    """
+    Endpoint to process a PDF progressively. Pages are extracted window by window
+    and a server-sent event is emitted for each window (a reference to its raw
+    text and a section summary), followed by the quiz
+    """
+    if not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="File must be a PDF")
+    
+    temp_file_path = os.path.join(UPLOAD_DIR, f"temp_{uuid.uuid4()}.pdf")
+    try:
+        upload = await save_upload(file, temp_file_path, max_bytes=MAX_PDF_BYTES)
+        document_id = upload["sha256"]
+        cached = await document_cache.get(document_id)
+        page_count = cached["page_count"] if cached and "page_count" in cached else await check_pdf_pages(temp_file_path)
+    except HTTPException:
+        if os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
+        raise
+    except Exception as e:
+        if os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
         raise HTTPException(status_code=400, detail=f"Error reading PDF: {str(e)}")
+    
+    if cached and "section_summaries" in cached and "questions" in cached:
+        os.remove(temp_file_path)
+        
+        # Known document: replay the cached events without extraction or LLM calls
+        async def cached_stream():
+            yield f"data: {json.dumps({'type': 'document', 'document_id': document_id, 'page_count': page_count, 'window_size': PDF_STREAM_WINDOW, 'cached': True})}\n\n"
+            for section in cached["section_summaries"]:
+                first_page, last_page = section["first_page"], section["last_page"]
+                yield f"data: {json.dumps({'type': 'pages', 'first_page': first_page, 'last_page': last_page, 'characters': section['characters'], 'text_ref': f'/api/documents/{document_id}/pages?start={first_page}&end={last_page}'})}\n\n"
+                if section["summary"] is not None:
+                    yield f"data: {json.dumps({'type': 'section_summary', 'first_page': section['first_page'], 'last_page': section['last_page'], 'summary': section['summary']})}\n\n"
+            yield f"data: {json.dumps({'type': 'quiz', 'questions': cached['questions']})}\n\n"
+            yield f"data: {json.dumps({'type': 'done', 'document_id': document_id})}\n\n"
+        
+        return StreamingResponse(cached_stream(), media_type="text/event-stream")
+    
+    async def event_stream():
+        try:
+            yield f"data: {json.dumps({'type': 'document', 'document_id': document_id, 'page_count': page_count, 'window_size': PDF_STREAM_WINDOW})}\n\n"
+            
+            all_pages = []
+            section_summaries = []
+            quiz_source = []
+            quiz_source_length = 0
+            async for pages in pdf_extractor.iter_page_windows(temp_file_path, PDF_STREAM_WINDOW, page_count):
+                document_pages.add_pages(document_id, pages)
+                all_pages.extend(pages)
+                first_page, last_page = pages[0]["page"], pages[-1]["page"]
+                window_text = join_pages(pages)
+                
+                # Raw text is sent as a reference, clients fetch the pages they display
+                yield f"data: {json.dumps({'type': 'pages', 'first_page': first_page, 'last_page': last_page, 'characters': len(window_text), 'text_ref': f'/api/documents/{document_id}/pages?start={first_page}&end={last_page}'})}\n\n"
+                
+                section = {"first_page": first_page, "last_page": last_page, "characters": len(window_text), "summary": None}
+                section_summaries.append(section)
+                if not window_text:
+                    continue
+                
+                if quiz_source_length < 16000:
+                    quiz_source.append(window_text)
+                    quiz_source_length += len(window_text)
+                
+                summary = await asyncio.to_thread(generate_section_summary, window_text[:16000], first_page, last_page)
+                section["summary"] = summary
+                yield f"data: {json.dumps({'type': 'section_summary', 'first_page': first_page, 'last_page': last_page, 'summary': summary})}\n\n"
+            
+            if not quiz_source:
+                yield f"data: {json.dumps({'type': 'error', 'error': 'Could not extract text from PDF'})}\n\n"
+                return
+            
+            questions = await asyncio.to_thread(generate_quiz_questions, "\n\n".join(quiz_source)[:16000], 5)
+            yield f"data: {json.dumps({'type': 'quiz', 'questions': questions})}\n\n"
+            yield f"data: {json.dumps({'type': 'done', 'document_id': document_id})}\n\n"
+            
+            # Placeholders are left out so the next upload generates them again
+            artifacts = {}
+            if all(section["summary"] is None or is_generated_summary(section["summary"])
+                   for section in section_summaries):
+                artifacts["section_summaries"] = section_summaries
+            if is_generated_quiz(questions):
+                artifacts["questions"] = questions
+            await document_cache.update(
+                document_id,
+                filename=file.filename,
+                page_count=page_count,
+                pages=all_pages,
+                **artifacts
+            )
+        
+        except Exception as e:
+            yield f"data: {json.dumps({'type': 'error', 'error': str(e)})}\n\n"
+        finally:
+            if os.path.exists(temp_file_path):
+                os.remove(temp_file_path)
+    
+    def remove_temp_file():
+        # The stream's finally never runs if the client leaves before it starts
+        if os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
+    
+    try:
+        document_pages.create(document_id, file.filename, page_count)
+        return StreamingResponse(event_stream(), media_type="text/event-stream",
+                                 background=BackgroundTask(remove_temp_file))
+    except Exception:
+        remove_temp_file()
+        raise
 
-# Add the RAG helper functions
-def create_chunks(text: str, chunk_size: int = 500) -> List[str]:
+@app.get("/api/documents/{document_id}/pages")
+async def get_document_pages(document_id: str, start: int = 1, end: Optional[int] = None):
     """
-    Break the text into chunks of roughly chunk_size characters each.
+    Endpoint to fetch the raw extracted text of a document page range (1-based, inclusive)
     """
-    words = text.split()
-    chunks = []
-    current_chunk = []
-    current_length = 0
+    end = end if end is not None else start
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    end = min(end, start + 49)  # At most 50 pages per request
     
-    for word in words:
-        current_length += len(word) + 1  # +1 for space
-        if current_length > chunk_size:
-            chunks.append(" ".join(current_chunk))
-            current_chunk = [word]
-            current_length = len(word)
-        else:
-            current_chunk.append(word)
-    if current_chunk:
-        chunks.append(" ".join(current_chunk))
-    return chunks
+    document = document_pages.get(document_id)
+    if document is None:
+        # Fall back to the artifact cache, which outlives the in-progress page store
+        cached = await document_cache.get(document_id)
+        if not cached or "pages" not in cached:
+            raise HTTPException(status_code=404, detail="Document not found")
+        document_pages.create(document_id, cached.get("filename", ""), cached["page_count"])
+        document_pages.add_pages(document_id, cached["pages"])
+        document = document_pages.get(document_id)
+    
+    return {
+        "success": True,
+        "document_id": document_id,
+        "page_count": document["page_count"],
+        "pages": document_pages.get_pages(document_id, start, end)
+    }
 
+async def extract_pages_from_pdf_file(file_path: str, page_count: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Extract the text of every page of a PDF file, page ranges are extracted in parallel worker processes
+    """
+    try:
+        return await pdf_extractor.extract_pages(file_path, page_count)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error reading PDF: {str(e)}")
+
+async def extract_text_from_pdf_file(file_path: str) -> str:
+    """
+    Extract text from a PDF file
+    """
+    return join_pages(await extract_pages_from_pdf_file(file_path)).strip()
+
+# Add the RAG helper functions
 def get_embeddings(texts: List[str]) -> List[List[float]]:
     """
     Get embeddings using Hugging Face Inference API
@@ -1259,14 +1782,16 @@ async def get_signed_url():
             )
 
         # Make request to ElevenLabs API
-        response = await requests.get(
-            f"https://api.elevenlabs.io/v1/convai/conversation/get_signed_url?agent_id={agent_id}",
+        response = await http_client.get(
+            "https://api.elevenlabs.io/v1/convai/conversation/get_signed_url",
+            route="elevenlabs",
+            params={"agent_id": agent_id},
             headers={
                 "xi-api-key": ELEVENLABS_API_KEY
             }
         )
 
-        if not response.ok:
+        if not response.is_success:
             raise HTTPException(
                 status_code=response.status_code,
                 detail=f"Failed to get signed URL: {response.text}"
@@ -1393,10 +1918,13 @@ class ConceptDetectiveAnswer(BaseModel):
     levelIndex: int
     questionIndex: int
     answer: str
+    question: Optional[str] = None
 
 class ConceptDetectiveEvaluationRequest(BaseModel):
     transcript: str
     answers: List[ConceptDetectiveAnswer]
+    user_id: Optional[str] = None
+    source_id: Optional[str] = None  # YouTube video id or PDF document_id the game was generated from
 
 class ConceptDetectiveEvaluationResponse(BaseModel):
     success: bool
@@ -1483,6 +2011,29 @@ async def evaluate_concept_detective(request: ConceptDetectiveEvaluationRequest)
         # Extract the evaluation data from the response
         evaluation_data = json.loads(response.choices[0].message.content)
         
+        scores = evaluation_data.get("scores", {})
+        if request.user_id:
+            # Named like quiz topics ("source_id:..."), so both count toward the source's cohort
+            content_id = request.source_id or hashlib.sha256(request.transcript.encode("utf-8")).hexdigest()[:16]
+            levels = ('beginner', 'intermediate', 'advanced')
+            rows = [
+                attempt_to_row(request.user_id, 'concept_detective',
+                               f"{content_id}:{answer.levelIndex}-{answer.questionIndex}",
+                               scores[f"{answer.levelIndex}-{answer.questionIndex}"] * 25, 0.0,
+                               levels[min(max(answer.levelIndex, 0), 2)])
+                for answer in request.answers
+                if isinstance(scores.get(f"{answer.levelIndex}-{answer.questionIndex}"), (int, float))
+            ]
+            attempt_repository.add_many(rows)
+            if rows:
+                profile = await profile_cache.get_or_create(request.user_id)
+                for row in rows:
+                    record_attempt_score(profile, 'concept_detective', row['score'])
+                profile_cache.mark_dirty(request.user_id, profile)
+        
+        for answer in request.answers:
+            analytics_queue.submit(request.user_id, 'concept_detective', answer.question or "", answer.answer)
+        
         return {
             "success": True,
             "scores": evaluation_data.get("scores", {}),
@@ -1510,8 +2061,8 @@ async def get_student_profile_endpoint(user_id: str):
     Get a student's learning profile and knowledge state
     """
     try:
-        # Get the student's profile
-        profile = await get_student_profile(user_id)
+        # Get the student's profile, including changes not yet flushed to Supabase
+        profile = await profile_cache.get(user_id)
         if not profile:
             return StudentProfileResponse(
                 success=False,
@@ -1523,7 +2074,7 @@ async def get_student_profile_endpoint(user_id: str):
         
         return StudentProfileResponse(
             success=True,
-            profile=profile.__dict__,
+            profile=profile.to_dict(),
             knowledge_state=knowledge_state.__dict__ if knowledge_state else None
         )
         
@@ -1532,3 +2083,175 @@ async def get_student_profile_endpoint(user_id: str):
             success=False,
             error=str(e)
         )
+
+class AttemptsResponse(BaseModel):
+    success: bool
+    attempts: List[Dict[str, Any]] = []
+    next_cursor: Optional[str] = None
+    error: Optional[str] = None
+
+@app.get("/api/student/{user_id}/attempts", response_model=AttemptsResponse)
+async def get_student_attempts(user_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                               attempt_type: Optional[str] = None, cursor: Optional[str] = None, limit: int = 100):
+    """
+    A page of a student's quiz and Concept Detective attempts in [since, until), oldest first.
+    Pass next_cursor back as cursor for the following page.
+    """
+    try:
+        attempts, next_cursor = await attempt_repository.fetch_page(
+            user_id, since, until, attempt_type, cursor, min(max(limit, 1), 1000)
+        )
+        return AttemptsResponse(success=True, attempts=attempts, next_cursor=next_cursor)
+    except Exception as e:
+        return AttemptsResponse(success=False, error=str(e))
+
+@app.post("/api/student/{user_id}/recompute-metrics", response_model=StudentProfileResponse)
+async def recompute_student_metrics(user_id: str, days: float = ATTEMPT_WINDOW_DAYS):
+    """
+    Recomputes a student's level, progress and behavioral metrics from their attempts
+    of the last days days
+    """
+    try:
+        rows = await attempt_repository.recent_attempts(user_id, days)
+        profile = recompute_recent_metrics(await profile_cache.get_or_create(user_id), rows)
+        profile_cache.mark_dirty(user_id, profile)
+        return StudentProfileResponse(success=True, profile=profile.to_dict())
+    except Exception as e:
+        return StudentProfileResponse(success=False, error=str(e))
+
+@app.post("/api/admin/recompute-cohort-metrics")
+async def recompute_all_student_metrics():
+    """
+    The nightly recompute of every student's metrics, run inside the app so the result goes
+    through the profile cache instead of being overwritten by it
+    """
+    try:
+        # Buffered attempts and profile changes are stored first so the recompute sees them
+        await attempt_repository.flush()
+        await profile_cache.flush()
+        return {"success": True, **await recompute_cohort_metrics(cache=profile_cache)}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+class CohortAnalyticsResponse(BaseModel):
+    success: bool
+    analytics: Optional[Dict[str, Any]] = None
+    cohorts: List[Dict[str, Any]] = []
+    error: Optional[str] = None
+
+@app.get("/api/cohorts", response_model=CohortAnalyticsResponse)
+async def list_cohorts():
+    """
+    Every cohort (video or document, plus "all") with its number of students
+    """
+    return CohortAnalyticsResponse(success=True, cohorts=cohort_analytics.cohorts())
+
+@app.get("/api/cohorts/{cohort_id}/analytics", response_model=CohortAnalyticsResponse)
+async def get_cohort_analytics(cohort_id: str):
+    """
+    Average progress and engagement, level distribution and weekly activity of a cohort,
+    served from precomputed aggregates
+    """
+    analytics = cohort_analytics.get(cohort_id)
+    if analytics is None:
+        return CohortAnalyticsResponse(success=False, error="Cohort not found")
+    return CohortAnalyticsResponse(success=True, analytics=analytics)
+
+class QuizAnswer(BaseModel):
+    question: str
+    correct: float  # 1/0 for multiple choice, or a score in [0, 1]
+    answer: Optional[str] = None  # the answer given, evaluated by the analytics queue
+
+class QuizSubmissionRequest(BaseModel):
+    user_id: str
+    answers: List[QuizAnswer]
+    source_id: Optional[str] = None  # YouTube video id or PDF document_id
+    transcript: Optional[str] = None  # used when the source is not cached
+    level: Optional[str] = "intermediate"
+    time_taken: Optional[float] = 0.0  # in minutes, for the whole quiz
+
+class QuizSubmissionResponse(BaseModel):
+    success: bool
+    mastery: Dict[str, float] = {}
+    strengths: List[str] = []
+    areas_for_improvement: List[str] = []
+    error: Optional[str] = None
+
+async def get_topic_chunks(source_id: Optional[str], transcript: Optional[str]):
+    """
+    Returns the source id and the retrieval chunks its topics are named after,
+    taken from the document or transcript cache, or chunked from the transcript
+    """
+    if source_id:
+        cached = await document_cache.get(source_id)
+        if cached and cached.get("chunks"):
+            return source_id, cached["chunks"]
+        if cached and cached.get("pages"):
+            return source_id, chunk_pages(cached["pages"], CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS)
+        cached = await transcript_cache.get(source_id, "en")
+        if cached and cached.get("chunks"):
+            return source_id, cached["chunks"]
+        if cached and cached.get("full_transcript"):
+            return source_id, chunk_text(cached["full_transcript"], CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS)
+    if transcript:
+        source_id = source_id or hashlib.sha256(transcript.encode("utf-8")).hexdigest()[:16]
+        return source_id, chunk_text(transcript, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS)
+    return source_id, []
+
+@app.post("/api/quiz/submit", response_model=QuizSubmissionResponse)
+async def submit_quiz(request: QuizSubmissionRequest):
+    """
+    Records a student's quiz answers and updates their per-topic mastery
+    """
+    try:
+        if not request.answers:
+            raise HTTPException(status_code=400, detail="Answers are required")
+        
+        source_id, chunks = await get_topic_chunks(request.source_id, request.transcript)
+        if not chunks:
+            raise HTTPException(status_code=400, detail="A cached source_id or the transcript is required")
+        
+        # Each question counts toward the transcript chunk it is about
+        matcher = TopicMatcher(source_id, chunks)
+        observations = []
+        for answer in request.answers:
+            topic = matcher.match(answer.question)
+            if topic:
+                observations.append((topic, min(1.0, max(0.0, answer.correct))))
+        
+        knowledge_state = update_knowledge_trace(await get_knowledge_state(request.user_id), observations)
+        await save_knowledge_state(request.user_id, knowledge_state)
+        
+        # The full attempt history: one 'quiz' row per submission for the quiz metrics,
+        # and one 'quiz_answer' row per topic-matched answer, the source of bulk re-tracing
+        level = request.level if request.level in ('beginner', 'intermediate', 'advanced') else 'intermediate'
+        time_per_answer = (request.time_taken or 0.0) / len(request.answers)
+        score = sum(min(1.0, max(0.0, answer.correct)) for answer in request.answers) / len(request.answers) * 100
+        attempt_repository.add_many([
+            attempt_to_row(request.user_id, 'quiz', f"{source_id}:quiz", score, request.time_taken or 0.0, level,
+                           metadata={'answers': len(request.answers)})
+        ] + [
+            attempt_to_row(request.user_id, 'quiz_answer', topic, correct * 100, time_per_answer, level,
+                           metadata={'topic_id': topic, 'correct': correct})
+            for topic, correct in observations
+        ])
+        profile = await profile_cache.get_or_create(request.user_id)
+        profile_cache.mark_dirty(request.user_id, record_attempt_score(profile, 'quiz', score))
+        
+        for answer in request.answers:
+            if answer.answer:
+                analytics_queue.submit(request.user_id, 'quiz', answer.question, answer.answer,
+                                       score=min(1.0, max(0.0, answer.correct)) * 100)
+        
+        touched = {topic for topic, _ in observations}
+        return QuizSubmissionResponse(
+            success=True,
+            mastery={topic: knowledge_state.topics[topic][0] for topic in touched},
+            strengths=knowledge_state.strengths,
+            areas_for_improvement=knowledge_state.areas_for_improvement
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        return QuizSubmissionResponse(success=False, error=str(e))
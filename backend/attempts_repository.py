@@ -0,0 +1,247 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from student_modeling import (
+    ConceptDetectiveAttempt,
+    LearningStyleProfile,
+    QuizAttempt,
+    attempt_to_row,
+    attempts_from_rows,
+    save_learning_attempts,
+    update_behavioral_metrics,
+    update_cognitive_metrics,
+)
+from supabase_client import get_supabase_client
+
+logger = logging.getLogger(__name__)
+
+# Metrics recomputes read only this many days of attempts
+ATTEMPT_WINDOW_DAYS = float(os.getenv("ATTEMPT_WINDOW_DAYS", "90"))
+
+ATTEMPT_COLUMNS = 'id,user_id,attempt_type,content_id,score,time_taken,level,timestamp,metadata'
+
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    return f"{row['timestamp']}|{row['id']}"
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    timestamp, _, attempt_id = cursor.rpartition('|')
+    return timestamp, attempt_id
+
+
+class AttemptRepository:
+    """
+    Quiz and Concept Detective attempts in the learning_attempts table.
+
+    Writes are buffered and inserted as multi-row inserts of up to max_batch
+    rows, once max_batch rows are waiting or every flush_interval seconds.
+    A failed insert keeps its rows buffered for the next flush, up to
+    max_buffered rows; beyond that the oldest are dropped and counted.
+    Rows being inserted stay readable until the insert is acknowledged.
+    Every listener is called with the rows as they are added.
+
+    Reads are range queries on (user_id, timestamp), served by the
+    idx_learning_attempts_user_time index (idx_learning_attempts_time_id when
+    reading every user's attempts), and paginated by keyset on (timestamp, id),
+    so a page costs the same however deep into the history it is.
+    """
+
+    def __init__(self, max_batch: int = 500, flush_interval: float = 2.0, max_buffered: int = 50000):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self._buffer: List[Dict[str, Any]] = []
+        self._inserting: List[Dict[str, Any]] = []  # the batch of the insert in progress
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self.listeners: List[Callable[[List[Dict[str, Any]]], None]] = []
+        self.metrics = {
+            "buffered": 0,
+            "inserted": 0,
+            "inserts": 0,
+            "insert_errors": 0,
+            "dropped": 0,
+            "pages_read": 0,
+            "rows_read": 0,
+        }
+
+    def add(self, row: Dict[str, Any]):
+        """
+        Buffers one learning_attempts row (see student_modeling.attempt_to_row)
+        """
+        self.add_many([row])
+
+    def add_many(self, rows: List[Dict[str, Any]]):
+        self._buffer.extend(rows)
+        for listener in self.listeners:
+            try:
+                listener(rows)
+            except Exception as e:
+                logger.error(f"Attempt listener failed: {e}")
+        self.metrics["buffered"] += len(rows)
+        overflow = len(self._buffer) - self.max_buffered
+        if overflow > 0:
+            del self._buffer[:overflow]
+            self.metrics["dropped"] += overflow
+            logger.error(f"Dropped {overflow} unsaved learning attempts, the insert buffer is full")
+        if len(self._buffer) >= self.max_batch and self._wakeup is not None:
+            self._wakeup.set()
+
+    def add_attempts(self, user_id: str, quiz_attempts: List[QuizAttempt],
+                     concept_attempts: List[ConceptDetectiveAttempt]):
+        self.add_many([
+            attempt_to_row(user_id, 'quiz', attempt.quiz_id, attempt.score, attempt.time_taken,
+                           attempt.level, attempt.timestamp)
+            for attempt in quiz_attempts
+        ] + [
+            attempt_to_row(user_id, 'concept_detective', attempt.concept_id, attempt.score, attempt.time_taken,
+                           attempt.level, attempt.timestamp)
+            for attempt in concept_attempts
+        ])
+
+    async def flush(self) -> bool:
+        """
+        Inserts the buffered rows in batches of max_batch, returns False if an insert failed
+        """
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            while self._buffer:
+                batch = self._buffer[:self.max_batch]
+                del self._buffer[:len(batch)]
+                self._inserting = batch
+                try:
+                    saved = await save_learning_attempts(batch)
+                finally:
+                    self._inserting = []
+                if saved is None:
+                    self.metrics["insert_errors"] += 1
+                    self._buffer[:0] = batch
+                    return False
+                self.metrics["inserts"] += 1
+                self.metrics["inserted"] += len(batch)
+            return True
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                self.metrics["insert_errors"] += 1
+                logger.error(f"Learning attempts flush failed: {e}")
+
+    async def start(self):
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self, attempts: int = 3):
+        """
+        Stops the flusher and inserts everything still buffered, called on shutdown
+        """
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        for attempt in range(attempts):
+            if await self.flush():
+                return
+            await asyncio.sleep(0.5 * (attempt + 1))
+        logger.error(f"Lost {len(self._buffer)} unsaved learning attempts, Supabase rejected the final flush")
+
+    async def fetch_page(self, user_id: Optional[str], since: Optional[datetime] = None,
+                         until: Optional[datetime] = None, attempt_type: Optional[str] = None,
+                         cursor: Optional[str] = None, limit: int = 500,
+                         columns: str = ATTEMPT_COLUMNS) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        One page of a user's attempts (every user's when user_id is None) in [since, until),
+        oldest first, and the cursor of the next page (None on the last page).
+        columns must include timestamp and id, the cursor is made of them.
+        """
+        query = get_supabase_client().table('learning_attempts').select(columns)
+        if user_id is not None:
+            query = query.eq('user_id', user_id)
+        if since is not None:
+            query = query.gte('timestamp', since.isoformat())
+        if until is not None:
+            query = query.lt('timestamp', until.isoformat())
+        if attempt_type is not None:
+            query = query.eq('attempt_type', attempt_type)
+        if cursor:
+            timestamp, attempt_id = decode_cursor(cursor)
+            query = query.or_(f'timestamp.gt."{timestamp}",and(timestamp.eq."{timestamp}",id.gt.{attempt_id})')
+        response = await query.order('timestamp').order('id').limit(limit).execute()
+
+        rows = response.data
+        self.metrics["pages_read"] += 1
+        self.metrics["rows_read"] += len(rows)
+        next_cursor = encode_cursor(rows[-1]) if len(rows) == limit else None
+        return rows, next_cursor
+
+    async def iter_attempts(self, user_id: str, since: Optional[datetime] = None,
+                            until: Optional[datetime] = None, attempt_type: Optional[str] = None,
+                            page_size: int = 500) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Every attempt of a user in [since, until), page by page, followed by matching
+        attempts that are not inserted yet
+        """
+        # Taken before the pages are read: a row inserted meanwhile is then in both and
+        # yielded once, where taking it after could miss it in both
+        since_text = since.isoformat() if since is not None else None
+        until_text = until.isoformat() if until is not None else None
+        pending = {
+            row['id']: row for row in self._inserting + self._buffer
+            if (row['user_id'] == user_id
+                and (attempt_type is None or row['attempt_type'] == attempt_type)
+                and (since_text is None or row['timestamp'] >= since_text)
+                and (until_text is None or row['timestamp'] < until_text))
+        }
+        cursor = None
+        while True:
+            rows, cursor = await self.fetch_page(user_id, since, until, attempt_type, cursor, page_size)
+            for row in rows:
+                pending.pop(row['id'], None)
+                yield row
+            if cursor is None:
+                break
+        for row in pending.values():
+            yield row
+
+    async def recent_attempts(self, user_id: str, days: float) -> List[Dict[str, Any]]:
+        return [row async for row in self.iter_attempts(user_id, since=datetime.now() - timedelta(days=days))]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.metrics, "pending": len(self._buffer) + len(self._inserting)}
+
+
+def recompute_recent_metrics(profile: LearningStyleProfile, rows: List[Dict[str, Any]]) -> LearningStyleProfile:
+    """
+    Sets the level, progress and behavioral metrics of profile from the given (recent)
+    attempts. The lifetime aggregates, score stats and total_quizzes_taken, are left as they
+    are; record_attempt_score keeps them current as attempts are recorded.
+    """
+    quiz_attempts, concept_attempts = attempts_from_rows(rows)
+    window = update_cognitive_metrics(LearningStyleProfile(), quiz_attempts, concept_attempts)
+    window = update_behavioral_metrics(window, quiz_attempts, concept_attempts)
+    for key in ('beginner_level', 'intermediate_level', 'advanced_level', 'overall_progress'):
+        profile.cognitive_metrics[key] = window.cognitive_metrics[key]
+    profile.behavioral_metrics = dict(window.behavioral_metrics)
+    profile.last_updated = datetime.now()
+    return profile
+
+
+attempt_repository = AttemptRepository(
+    max_batch=int(os.getenv("ATTEMPT_INSERT_BATCH", "500")),
+    flush_interval=float(os.getenv("ATTEMPT_FLUSH_SECONDS", "2.0")),
+    max_buffered=int(os.getenv("ATTEMPT_MAX_BUFFERED", "50000")),
+)
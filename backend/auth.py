@@ -3,7 +3,7 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr
 from typing import Dict, Any, Optional
 from supabase_client import get_supabase_client
-import httpx
+from http_client import http_client
 import os
 from dotenv import load_dotenv
 
@@ -206,33 +206,33 @@ async def verify_token_endpoint(credentials: HTTPAuthorizationCredentials = Depe
 async def signup_user(email: str, password: str):
     if not SUPABASE_URL or not SUPABASE_KEY:
         raise HTTPException(status_code=500, detail="Supabase URL or Key not configured")
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            f"{SUPABASE_URL}/auth/v1/signup",
-            headers=headers,
-            json={"email": email, "password": password}
-        )
-        response_data = response.json()
-        if response.status_code >= 400: # Check for HTTP error status
-            error_detail = response_data.get("msg") or response_data.get("message") or "Signup failed"
-            if "User already registered" in str(response_data):
-                 error_detail = "User already registered"
-            raise HTTPException(status_code=response.status_code, detail=error_detail)
-        return response_data
+    response = await http_client.post(
+        f"{SUPABASE_URL}/auth/v1/signup",
+        route="supabase_auth",
+        headers=headers,
+        json={"email": email, "password": password}
+    )
+    response_data = response.json()
+    if response.status_code >= 400: # Check for HTTP error status
+        error_detail = response_data.get("msg") or response_data.get("message") or "Signup failed"
+        if "User already registered" in str(response_data):
+             error_detail = "User already registered"
+        raise HTTPException(status_code=response.status_code, detail=error_detail)
+    return response_data
 
 async def login_user(email: str, password: str):
     if not SUPABASE_URL or not SUPABASE_KEY:
         raise HTTPException(status_code=500, detail="Supabase URL or Key not configured")
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            f"{SUPABASE_URL}/auth/v1/token?grant_type=password",
-            headers=headers,
-            json={"email": email, "password": password}
-        )
-        response_data = response.json()
-        if response.status_code >= 400: # Check for HTTP error status
-            error_detail = response_data.get("error_description") or response_data.get("msg") or "Login failed"
-            if "Invalid login credentials" in str(response_data):
-                error_detail = "Invalid login credentials"
-            raise HTTPException(status_code=response.status_code, detail=error_detail)
-        return response_data 
\ No newline at end of file
+    response = await http_client.post(
+        f"{SUPABASE_URL}/auth/v1/token?grant_type=password",
+        route="supabase_auth",
+        headers=headers,
+        json={"email": email, "password": password}
+    )
+    response_data = response.json()
+    if response.status_code >= 400: # Check for HTTP error status
+        error_detail = response_data.get("error_description") or response_data.get("msg") or "Login failed"
+        if "Invalid login credentials" in str(response_data):
+            error_detail = "Invalid login credentials"
+        raise HTTPException(status_code=response.status_code, detail=error_detail)
+    return response_data 
\ No newline at end of file
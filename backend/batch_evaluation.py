@@ -0,0 +1,248 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from cohort_metrics import RECOMPUTE_PAGE_SIZE, RECOMPUTE_WRITE_BATCH, _select_all
+from student_modeling import (
+    EVALUATION_METRICS,
+    QUESTION_DEPTH_INDICATORS,
+    LearningStyleProfile,
+    LLMInteraction,
+    profile_from_row,
+    profile_to_row,
+    _CRITICAL_THINKING_MATCHERS,
+    _EXPLANATION_MATCHERS,
+    _QUESTION_DEPTH_MATCHERS,
+    save_student_profiles,
+    update_learning_profile_from_llm,
+)
+
+logger = logging.getLogger(__name__)
+
+EVALUATION_CHUNK = int(os.getenv("EVALUATION_CHUNK", "20000"))
+
+
+class EvaluationColumns(NamedTuple):
+    """
+    Evaluation metrics of many interactions, one float64 array entry per interaction
+    """
+    comprehension: np.ndarray
+    depth: np.ndarray
+    engagement: np.ndarray
+    critical_thinking: np.ndarray
+
+    def evaluation(self, index: int) -> Dict[str, float]:
+        """
+        The evaluate_llm_interaction dict of one interaction
+        """
+        return {metric: float(column[index]) for metric, column in zip(EVALUATION_METRICS, self)}
+
+
+# Joins the texts of a chunk: not a word or space character, so no match spans two texts
+_SEPARATOR = '\x00'
+
+
+def _join(texts: Sequence[str]) -> Tuple[str, np.ndarray]:
+    """
+    The lowercased texts joined by _SEPARATOR, and where each one starts
+    """
+    lowered = [text.lower() for text in texts]
+    lengths = np.fromiter(map(len, lowered), dtype=np.int64, count=len(lowered))
+    starts = np.zeros(len(lowered), dtype=np.int64)
+    np.cumsum(lengths[:-1] + 1, out=starts[1:])
+    return _SEPARATOR.join(lowered), starts
+
+
+def _chunk_matcher(matcher):
+    """
+    The matcher extended over the rest of its text, so a text yields at most one match
+    """
+    return re.compile(matcher.pattern + f'[^{_SEPARATOR}]*')
+
+
+_QUESTION_DEPTH_CHUNK = [(QUESTION_DEPTH_INDICATORS[indicator], _chunk_matcher(matcher))
+                         for indicator, matcher in _QUESTION_DEPTH_MATCHERS]
+_EXPLANATION_CHUNK = [_chunk_matcher(matcher) for _, matcher in _EXPLANATION_MATCHERS]
+_CRITICAL_THINKING_CHUNK = [_chunk_matcher(matcher) for _, matcher in _CRITICAL_THINKING_MATCHERS]
+
+
+def _matching_texts(matcher, joined: str, starts: np.ndarray) -> np.ndarray:
+    """
+    Indices of the texts the matcher finds, one regex scan for the whole chunk
+    """
+    positions = [match.start() for match in matcher.finditer(joined)]
+    return np.searchsorted(starts, positions, side='right') - 1
+
+
+def _evaluate_chunk(questions: Sequence[str], responses: Sequence[str]) -> np.ndarray:
+    """
+    One (len, 4) block of score_interaction metrics; top-level so worker processes can run it
+    """
+    count = len(questions)
+    depth = np.zeros(count)
+    comprehension = np.zeros(count)
+    critical = np.zeros(count)
+
+    joined, starts = _join(questions)
+    for weight, matcher in _QUESTION_DEPTH_CHUNK:
+        depth[_matching_texts(matcher, joined, starts)] += weight
+
+    joined, starts = _join(responses)
+    for matcher in _EXPLANATION_CHUNK:
+        comprehension[_matching_texts(matcher, joined, starts)] = 0.5
+    for matcher in _CRITICAL_THINKING_CHUNK:
+        critical[_matching_texts(matcher, joined, starts)] += 1
+    engagement = np.fromiter((len(response.split()) for response in responses), dtype=np.float64, count=count) / 100
+
+    scores = np.column_stack([comprehension, depth, engagement, 0.3 * critical])
+    return np.minimum(scores, 1.0)
+
+
+def evaluate_batch(questions: Sequence[str], responses: Sequence[str], workers: Optional[int] = None,
+                   chunk_size: int = EVALUATION_CHUNK) -> Tuple[EvaluationColumns, Dict[str, Any]]:
+    """
+    Scores question/response pairs like score_interaction, in chunks of chunk_size
+    spread over workers processes (all cores by default). Each matcher scans a
+    chunk's texts in one pass rather than once per interaction.
+    Returns the metrics as columns, in input order, and the throughput.
+    """
+    if len(questions) != len(responses):
+        raise ValueError("questions and responses must have the same length")
+    count = len(questions)
+    workers = workers or os.cpu_count() or 1
+    bounds = range(0, count, chunk_size)
+
+    started = time.perf_counter()
+    if workers <= 1 or count <= chunk_size:
+        blocks = [_evaluate_chunk(questions[start:start + chunk_size], responses[start:start + chunk_size])
+                  for start in bounds]
+        workers = 1
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            blocks = list(executor.map(
+                _evaluate_chunk,
+                [questions[start:start + chunk_size] for start in bounds],
+                [responses[start:start + chunk_size] for start in bounds],
+            ))
+    scores = np.concatenate(blocks) if blocks else np.empty((0, len(EVALUATION_METRICS)))
+    seconds = time.perf_counter() - started
+
+    columns = EvaluationColumns(*(np.ascontiguousarray(scores[:, index]) for index in range(len(EVALUATION_METRICS))))
+    stats = {
+        'interactions': count,
+        'workers': workers,
+        'chunks': len(blocks),
+        'seconds': round(seconds, 3),
+        'interactions_per_second': round(count / seconds) if seconds > 0 else 0,
+    }
+    return columns, stats
+
+
+def read_interaction_log(path: str) -> List[Dict[str, Any]]:
+    """
+    Reads a JSON lines chat log export: user_id, question, response and optionally
+    interaction_type and timestamp per line. Ordered by timestamp when present.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    if all(row.get('timestamp') for row in rows):
+        rows.sort(key=lambda row: row['timestamp'])
+    return rows
+
+
+async def backfill_profiles(rows: List[Dict[str, Any]], workers: Optional[int] = None,
+                            page_size: int = RECOMPUTE_PAGE_SIZE,
+                            write_batch: int = RECOMPUTE_WRITE_BATCH) -> Dict[str, Any]:
+    """
+    Scores logged interactions in bulk and folds them, oldest first, into the profiles
+    of their users, then upserts those profiles in batches. An offline job: run it
+    while the app is stopped, or the app's cached profiles overwrite the result.
+    """
+    columns, stats = await asyncio.to_thread(
+        evaluate_batch, [row['question'] for row in rows], [row['response'] for row in rows], workers
+    )
+
+    profiles = {row['user_id']: profile_from_row(row)
+                for row in await _select_all('student_profiles', '*', page_size, order='user_id')}
+    touched: Dict[str, LearningStyleProfile] = {}
+    for index, row in enumerate(rows):
+        user_id = row['user_id']
+        profile = touched.get(user_id) or profiles.get(user_id) or LearningStyleProfile()
+        interaction = LLMInteraction(row['question'], row['response'], row.get('interaction_type', 'chat'))
+        touched[user_id] = update_learning_profile_from_llm(profile, interaction, columns.evaluation(index))
+
+    profile_rows = [profile_to_row(user_id, profile) for user_id, profile in touched.items()]
+    failed_batches = 0
+    for offset in range(0, len(profile_rows), write_batch):
+        if await save_student_profiles(profile_rows[offset:offset + write_batch]) is None:
+            failed_batches += 1
+
+    summary = {**stats, 'students': len(touched), 'failed_batches': failed_batches}
+    logger.info(f"Interaction backfill finished: {summary}")
+    return summary
+
+
+if __name__ == "__main__":
+    import random
+    import sys
+
+    from benchmark_baselines import legacy_evaluate_llm_interaction
+    from student_modeling import evaluate_llm_interaction
+
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    workers = int(os.getenv("EVALUATION_WORKERS", "0")) or None
+    if args:
+        log = read_interaction_log(args[0])
+        if "--backfill" in sys.argv:
+            print(asyncio.run(backfill_profiles(log, workers)))
+        else:
+            _, stats = evaluate_batch([row['question'] for row in log], [row['response'] for row in log], workers)
+            print(stats)
+        sys.exit(0)
+
+    rng = random.Random(3)
+    openers = ["What is", "How does", "Why does", "Can you compare", "Please analyze", "Evaluate",
+               "I somewhat get", "Show me how", "Whatever, explain", "Who discovered"]
+    topics = ["photosynthesis", "the water cycle", "recursion", "supply and demand", "entropy"]
+    fillers = ["the process", "energy", "each step", "the result", "its inputs", "the system", "this", "that"]
+    links = ["because", "therefore", "however", "although", "on the other hand", "alternatively",
+             "and", "so", "otherwise", "becausee", "whereas"]
+    count = int(os.getenv("EVALUATION_BENCH_INTERACTIONS", "400000"))
+    questions = [f"{rng.choice(openers)} {rng.choice(topics)} {rng.choice(fillers)}?" for _ in range(count)]
+    responses = [
+        " ".join(rng.choice(fillers + links) for _ in range(rng.randint(5, 160)))
+        for _ in range(count)
+    ]
+    print(f"{count} interactions on {os.cpu_count()} cores")
+
+    # The batch columns match evaluate_llm_interaction one by one
+    sample = range(0, count, max(1, count // 5000))
+    columns, _ = evaluate_batch(questions, responses, workers=1)
+    for index in sample:
+        expected = evaluate_llm_interaction(LLMInteraction(questions[index], responses[index], 'chat'))
+        assert columns.evaluation(index) == expected, (questions[index], expected)
+    changed = sum(
+        legacy_evaluate_llm_interaction(LLMInteraction(questions[index], responses[index], 'chat'))
+        != columns.evaluation(index)
+        for index in sample
+    )
+    print(f"batch matches evaluate_llm_interaction; word boundaries change {changed / len(sample):.0%} "
+          f"of the substring-based evaluations")
+
+    started = time.perf_counter()
+    for question, response in zip(questions, responses):
+        legacy_evaluate_llm_interaction(LLMInteraction(question, response, 'chat'))
+    legacy_rate = count / (time.perf_counter() - started)
+    print(f"substring checks, one at a time: {legacy_rate:,.0f} interactions/s")
+    _, stats = evaluate_batch(questions, responses, workers=1)
+    print(f"compiled matchers, 1 process:    {stats['interactions_per_second']:,} interactions/s")
+    _, stats = evaluate_batch(questions, responses, workers)
+    print(f"compiled matchers, {stats['workers']} processes:   {stats['interactions_per_second']:,} interactions/s "
+          f"({stats['chunks']} chunks)")
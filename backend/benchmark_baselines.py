@@ -0,0 +1,224 @@
+"""
+Implementations replaced by faster or more accurate ones, kept only as baselines
+for the __main__ benchmarks of the modules that replaced them. Nothing the app
+runs imports this module.
+"""
+import re
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, List
+
+from learning_profile import PROFILE_LAYOUT, SCORE_STATS_FIELDS
+from score_stats import new_score_stats
+
+if TYPE_CHECKING:
+    from student_modeling import LLMInteraction
+
+
+def legacy_create_chunks(text: str, chunk_size: int = 500) -> List[str]:
+    """
+    The whitespace bucketing previously used as create_chunks in app.py
+    """
+    words = text.split()
+    chunks = []
+    current_chunk = []
+    current_length = 0
+
+    for word in words:
+        current_length += len(word) + 1  # +1 for space
+        if current_length > chunk_size:
+            chunks.append(" ".join(current_chunk))
+            current_chunk = [word]
+            current_length = len(word)
+        else:
+            current_chunk.append(word)
+    if current_chunk:
+        chunks.append(" ".join(current_chunk))
+    return chunks
+
+
+def legacy_analyze_message_for_learning_style(message: str) -> Dict[str, float]:
+    """
+    The substring-scanning analyzer replaced by the precompiled matcher in student_modeling
+    """
+    # Enhanced psychological markers for each dimension
+    indicators = {
+        'visual': [
+            'see', 'look', 'picture', 'diagram', 'graph', 'image', 'visualize', 'draw',
+            'color', 'observe', 'view', 'watch', 'appear', 'show', 'visible'
+        ],
+        'auditory': [
+            'hear', 'sound', 'tell', 'explain', 'discuss', 'listen', 'speak', 'talk',
+            'voice', 'audio', 'noise', 'silence', 'loud', 'quiet'
+        ],
+        'reading_writing': [
+            'read', 'write', 'note', 'text', 'book', 'document', 'list', 'word',
+            'essay', 'paper', 'journal', 'summary', 'definition'
+        ],
+        'kinesthetic': [
+            'do', 'try', 'practice', 'experiment', 'hands-on', 'build', 'create',
+            'feel', 'touch', 'move', 'action', 'physical', 'experience'
+        ],
+        'global': [
+            'overall', 'big picture', 'generally', 'concept', 'broad', 'whole',
+            'context', 'relationship', 'connection', 'pattern'
+        ],
+        'analytical': [
+            'detail', 'specific', 'step', 'analyze', 'break down', 'precise',
+            'exact', 'particular', 'component', 'element'
+        ],
+        'independent': [
+            'self', 'alone', 'individual', 'my own', 'personally', 'independent',
+            'autonomy', 'self-directed', 'private'
+        ],
+        'collaborative': [
+            'group', 'team', 'together', 'share', 'discuss', 'collaborate',
+            'partner', 'peer', 'collective', 'community'
+        ],
+        'formative': [
+            'feedback', 'improve', 'progress', 'learn from', 'guidance',
+            'development', 'growth', 'adjust', 'refine'
+        ],
+        'summative': [
+            'test', 'exam', 'final', 'grade', 'assessment', 'evaluation',
+            'measure', 'score', 'performance'
+        ],
+        'performance': [
+            'project', 'demonstrate', 'show', 'present', 'portfolio',
+            'exhibit', 'display', 'practical', 'real-world'
+        ]
+    }
+    
+    # Context patterns for more accurate analysis
+    context_patterns = {
+        'visual': r'(prefer|like|need)\s+to\s+(see|visualize)',
+        'auditory': r'(better|best)\s+when\s+I\s+(hear|listen)',
+        'reading_writing': r'(learn|understand)\s+by\s+(reading|writing)',
+        'kinesthetic': r'(learn|work)\s+best\s+with\s+hands[-\s]on',
+        'global': r'(understand|see)\s+the\s+big\s+picture',
+        'analytical': r'(break|break\s+down|analyze)\s+step\s+by\s+step',
+        'independent': r'(prefer|like)\s+to\s+work\s+alone',
+        'collaborative': r'(enjoy|prefer)\s+group\s+work',
+        'formative': r'(want|need)\s+regular\s+feedback',
+        'summative': r'(focus|concerned)\s+about\s+(grades|scores)',
+        'performance': r'(show|demonstrate)\s+what\s+I\s+(know|learned)'
+    }
+    
+    scores = {style: 0.0 for style in indicators.keys()}
+    message = message.lower()
+    
+    # Word-based analysis
+    for style, words in indicators.items():
+        for word in words:
+            if word in message:
+                scores[style] += 0.2  # Base score for word matches
+                
+    # Context-based analysis
+    for style, pattern in context_patterns.items():
+        if re.search(pattern, message):
+            scores[style] += 0.4  # Higher score for contextual matches
+    
+    # Consider sentence structure and emphasis
+    emphasis_patterns = {
+        r'really\s+(\w+)': 0.3,
+        r'definitely\s+(\w+)': 0.3,
+        r'always\s+(\w+)': 0.3,
+        r'prefer\s+(\w+)': 0.4
+    }
+    
+    for pattern, bonus in emphasis_patterns.items():
+        matches = re.finditer(pattern, message)
+        for match in matches:
+            emphasized_word = match.group(1)
+            for style, words in indicators.items():
+                if any(word in emphasized_word for word in words):
+                    scores[style] += bonus
+    
+    # Normalize scores
+    total = sum(scores.values()) + 1e-10  # Avoid division by zero
+    normalized_scores = {k: min(v/total, 1.0) for k, v in scores.items()}
+    
+    return normalized_scores
+
+
+class LegacyLearningStyleProfile:
+    """
+    The dict-of-dicts profile replaced by learning_profile.LearningStyleProfile
+    """
+
+    def __init__(self):
+        for dimension, keys in PROFILE_LAYOUT:
+            setattr(self, dimension, dict.fromkeys(keys, 0.0))
+        self.cognitive_metrics['total_quizzes_taken'] = 0
+        for name in SCORE_STATS_FIELDS:
+            self.cognitive_metrics[name] = new_score_stats()
+        self.last_updated = datetime.now()
+
+
+def legacy_evaluate_llm_interaction(interaction: 'LLMInteraction') -> Dict[str, float]:
+    """
+    The substring-based evaluate_llm_interaction replaced by the compiled matchers
+    """
+    # Initialize evaluation metrics
+    evaluation = {
+        'comprehension': 0.0,
+        'depth': 0.0,
+        'engagement': 0.0,
+        'critical_thinking': 0.0
+    }
+    
+    # Analyze question complexity
+    question_indicators = {
+        'what': 0.3,  # Basic comprehension
+        'how': 0.6,   # Process understanding
+        'why': 0.8,   # Deep understanding
+        'compare': 0.7,
+        'analyze': 0.8,
+        'evaluate': 0.9
+    }
+    
+    # Calculate question complexity score
+    question = interaction.question.lower()
+    for indicator, weight in question_indicators.items():
+        if indicator in question:
+            evaluation['depth'] += weight
+    
+    # Analyze response quality
+    response = interaction.response.lower()
+    
+    # Check for explanation patterns
+    if 'because' in response or 'therefore' in response:
+        evaluation['comprehension'] += 0.5
+    
+    # Check for critical thinking indicators
+    critical_indicators = ['however', 'although', 'on the other hand', 'alternatively']
+    for indicator in critical_indicators:
+        if indicator in response:
+            evaluation['critical_thinking'] += 0.3
+    
+    # Calculate engagement based on response length and detail
+    words = len(response.split())
+    evaluation['engagement'] = min(1.0, words / 100)  # Cap at 1.0
+    
+    # Normalize scores
+    for metric in evaluation:
+        evaluation[metric] = min(1.0, evaluation[metric])
+    
+    return evaluation
+
+
+def legacy_parse_captions(vtt_content: str) -> str:
+    """
+    The regex-based VTT handling previously inlined in get_youtube_subtitles
+    """
+    pattern = r'\d{2}:\d{2}:\d{2}\.\d{3} --> \d{2}:\d{2}:\d{2}\.\d{3}\s*(.*?)(?=\n\d{2}:\d{2}:\d{2}\.\d{3}|$)'
+    matches = re.findall(pattern, vtt_content, re.DOTALL)
+    full_transcript = ""
+    for text in matches:
+        clean_text = re.sub(r'align:(?:start|middle|end)\s+position:\d+%\s*', '', text)
+        clean_text = re.sub(r'<[^>]+>', '', clean_text)
+        clean_text = re.sub(r'\s+', ' ', clean_text).strip()
+        if clean_text:
+            if full_transcript and not full_transcript.endswith(('.', '!', '?', '"', "'", ':', ';')):
+                full_transcript += " "
+            full_transcript += clean_text
+    return re.sub(r'([.!?])\s*([a-z])', lambda m: m.group(1) + ' ' + m.group(2).upper(), full_transcript)
@@ -0,0 +1,233 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from ytdlp_pool import ytdlp_pool
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+async def expand_video_ids(url: str, max_videos: int = 500) -> Dict[str, Any]:
+    """
+    Expands a playlist or channel URL into its video ids without resolving each video.
+    Channel tabs (Videos, Live, Shorts) are expanded one level deep.
+    """
+    info = await ytdlp_pool.extract_info(url, profile="flat", fields=("id", "title", "entries"))
+    video_ids: List[str] = []
+    seen = set()
+
+    async def collect(entries):
+        for entry in entries or []:
+            if len(video_ids) >= max_videos:
+                return
+            if entry.get("ie_key") == "YoutubeTab" or entry.get("_type") == "playlist":
+                nested = await ytdlp_pool.extract_info(entry["url"], profile="flat", fields=("entries",))
+                await collect(nested.get("entries"))
+            elif entry.get("id") and entry["id"] not in seen:
+                seen.add(entry["id"])
+                video_ids.append(entry["id"])
+
+    await collect(info.get("entries"))
+    return {"title": info.get("title") or "YouTube Playlist", "video_ids": video_ids}
+
+
+class BulkIngestJob:
+    """
+    Progress of one playlist/channel ingestion, checkpointed to disk after every change
+    """
+
+    def __init__(self, job_id: str, source_url: str, title: str, video_ids: List[str]):
+        self.job_id = job_id
+        self.source_url = source_url
+        self.title = title
+        self.videos: Dict[str, Dict[str, Any]] = {
+            video_id: {"status": PENDING, "error": None, "result": None} for video_id in video_ids
+        }
+        self.created_at = time.time()
+        self.subscribers: List[asyncio.Queue] = []
+
+    @property
+    def finished(self) -> bool:
+        return all(video["status"] in (DONE, FAILED) for video in self.videos.values())
+
+    def counts(self) -> Dict[str, int]:
+        counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        for video in self.videos.values():
+            counts[video["status"]] += 1
+        return counts
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "source_url": self.source_url,
+            "title": self.title,
+            "created_at": self.created_at,
+            "total": len(self.videos),
+            "counts": self.counts(),
+            "finished": self.finished,
+            "videos": self.videos
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BulkIngestJob":
+        job = cls(data["job_id"], data["source_url"], data["title"], [])
+        job.videos = data["videos"]
+        job.created_at = data["created_at"]
+        for video in job.videos.values():
+            # Work that was in flight when the process stopped is redone
+            if video["status"] == RUNNING:
+                video["status"] = PENDING
+        return job
+
+
+class BulkIngestManager:
+    """
+    Runs bulk ingestion jobs through one queue drained by max_concurrency workers,
+    so a large playlist cannot monopolise the providers or the LLM.
+
+    process_video(video_id) does the per-video work (fetch captions, normalize,
+    index, pre-generate summary) and returns a small JSON-serializable result.
+    Job state is checkpointed to checkpoint_dir and unfinished jobs are
+    re-queued by start() after a restart.
+    """
+
+    def __init__(self, process_video: Callable[[str], Awaitable[Dict[str, Any]]],
+                 checkpoint_dir: str = "ingest_jobs", max_concurrency: int = 3):
+        self.process_video = process_video
+        self.checkpoint_dir = checkpoint_dir
+        self.max_concurrency = max_concurrency
+        self.jobs: Dict[str, BulkIngestJob] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+    def _checkpoint_path(self, job_id: str) -> str:
+        return os.path.join(self.checkpoint_dir, f"{job_id}.json")
+
+    def _write_checkpoint(self, job_id: str, data: Dict[str, Any]):
+        path = self._checkpoint_path(job_id)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+
+    async def _checkpoint(self, job: BulkIngestJob):
+        try:
+            await asyncio.to_thread(self._write_checkpoint, job.job_id, job.to_dict())
+        except Exception as e:
+            logger.error(f"Could not checkpoint bulk ingest job {job.job_id}: {e}")
+
+    def _publish(self, job: BulkIngestJob, event: Dict[str, Any]):
+        for queue in job.subscribers:
+            queue.put_nowait(event)
+
+    def _load_checkpoints(self) -> List[BulkIngestJob]:
+        jobs = []
+        for filename in os.listdir(self.checkpoint_dir):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.checkpoint_dir, filename), "r", encoding="utf-8") as f:
+                    jobs.append(BulkIngestJob.from_dict(json.load(f)))
+            except Exception as e:
+                logger.error(f"Skipping unreadable bulk ingest checkpoint {filename}: {e}")
+        return jobs
+
+    async def start(self):
+        """
+        Starts the workers and resumes unfinished jobs from their checkpoints
+        """
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_concurrency)]
+
+        for job in await asyncio.to_thread(self._load_checkpoints):
+            self.jobs[job.job_id] = job
+            if not job.finished:
+                logger.info(f"Resuming bulk ingest job {job.job_id}")
+                self._enqueue_pending(job)
+
+    async def stop(self):
+        """
+        Stops the workers, in-flight videos are redone when the job resumes
+        """
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def _enqueue_pending(self, job: BulkIngestJob):
+        for video_id, video in job.videos.items():
+            if video["status"] == PENDING:
+                self._queue.put_nowait((job.job_id, video_id))
+
+    async def submit(self, source_url: str, max_videos: int = 500) -> BulkIngestJob:
+        """
+        Expands the playlist/channel and queues every video for ingestion
+        """
+        expanded = await expand_video_ids(source_url, max_videos)
+        job = BulkIngestJob(str(uuid.uuid4()), source_url, expanded["title"], expanded["video_ids"])
+        self.jobs[job.job_id] = job
+        await self._checkpoint(job)
+        self._enqueue_pending(job)
+        return job
+
+    async def _worker(self):
+        while True:
+            job_id, video_id = await self._queue.get()
+            try:
+                await self._run_video(self.jobs[job_id], video_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run_video(self, job: BulkIngestJob, video_id: str):
+        video = job.videos[video_id]
+        video["status"] = RUNNING
+        self._publish(job, {"video_id": video_id, "status": RUNNING})
+
+        try:
+            video["result"] = await self.process_video(video_id)
+            video["status"] = DONE
+        except asyncio.CancelledError:
+            video["status"] = PENDING
+            raise
+        except Exception as e:
+            video["status"] = FAILED
+            video["error"] = getattr(e, "detail", None) or str(e)
+
+        await self._checkpoint(job)
+        self._publish(job, {
+            "video_id": video_id,
+            "status": video["status"],
+            "error": video["error"],
+            "counts": job.counts()
+        })
+        if job.finished:
+            self._publish(job, {"done": True, "counts": job.counts()})
+
+    async def events(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yields a snapshot of the job followed by per-video progress events until the job finishes
+        """
+        job = self.jobs[job_id]
+        queue: asyncio.Queue = asyncio.Queue()
+        job.subscribers.append(queue)
+        try:
+            yield {"snapshot": job.to_dict()}
+            if job.finished:
+                return
+            while True:
+                event = await queue.get()
+                yield event
+                if event.get("done"):
+                    return
+        finally:
+            job.subscribers.remove(queue)
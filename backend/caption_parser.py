@@ -0,0 +1,221 @@
+import html
+import io
+import re
+from itertools import chain
+from typing import Iterable, Iterator, List, Dict, Tuple, Union, Any
+
+# Inline cue markup: <00:00:01.234>, <c>, </c>, <i>, <v Speaker> ...
+_TAG_RE = re.compile(r'<[^>]*>')
+# Same capitalization fix-up the old VTT path applied to the joined transcript
+_SENTENCE_START_RE = re.compile(r'([.!?])\s*([a-z])')
+
+_SENTENCE_END = ('.', '!', '?')
+
+
+def _parse_timestamp(value: str) -> float:
+    """
+    Parses a VTT (00:01:02.345, 01:02.345) or SRT (00:01:02,345) timestamp into seconds
+    """
+    parts = value.replace(',', '.').split(':')
+    seconds = float(parts[-1])
+    if len(parts) > 1:
+        seconds += int(parts[-2]) * 60
+    if len(parts) > 2:
+        seconds += int(parts[-3]) * 3600
+    return seconds
+
+
+def _clean_line(line: str) -> str:
+    """
+    Strips cue markup and entities and collapses whitespace
+    """
+    if '<' in line:
+        line = _TAG_RE.sub('', line)
+    if '&' in line:
+        line = html.unescape(line)
+    return ' '.join(line.split())
+
+
+def iter_cues(lines: Iterable[str]) -> Iterator[Tuple[float, float, List[str]]]:
+    """
+    Yields (start, end, cleaned_lines) for every cue of a WebVTT or SRT stream.
+    Header, NOTE/STYLE blocks, cue identifiers and SRT indices are skipped.
+    """
+    in_cue = False
+    start = end = 0.0
+    cue_lines: List[str] = []
+
+    for raw in lines:
+        line = raw.rstrip('\r\n')
+
+        if '-->' in line:
+            if in_cue and cue_lines:
+                yield start, end, cue_lines
+            left, _, right = line.partition('-->')
+            right_fields = right.split()
+            start = _parse_timestamp(left.strip())
+            end = _parse_timestamp(right_fields[0]) if right_fields else start
+            cue_lines = []
+            in_cue = True
+        elif not line:
+            # Only a truly empty line ends a cue, YouTube emits " " lines inside cues
+            if in_cue and cue_lines:
+                yield start, end, cue_lines
+            in_cue = False
+            cue_lines = []
+        elif in_cue:
+            cleaned = _clean_line(line)
+            if cleaned:
+                cue_lines.append(cleaned)
+
+    if in_cue and cue_lines:
+        yield start, end, cue_lines
+
+
+# Longest cue YouTube uses to hold the finished line between two rolling cues
+_TRANSITION_CUE_SECONDS = 0.05
+
+
+def iter_caption_segments(lines: Iterable[str]) -> Iterator[Tuple[float, float, str]]:
+    """
+    Yields (start, end, text) for each new line of captions.
+
+    YouTube auto-captions are rolling: every cue repeats the previous line above
+    the new one, and short transition cues repeat it again. Repeats are only
+    looked for where they can come from rolling, in a cue that overlaps the
+    previous one or in a WebVTT cue that carries lines above its new one or is a
+    transition cue. There a line of the previous cue is dropped, and a line
+    that extends the previous line by whole words only contributes the new
+    words. Every other cue is kept as is, including lines that really repeat.
+    """
+    lines = iter(lines)
+    first = next(lines, '')
+    is_vtt = first.lstrip('\ufeff').startswith('WEBVTT')
+    previous_lines: List[str] = []
+    previous_end = None
+    last_line = ''
+
+    for start, end, cue_lines in iter_cues(chain((first,), lines)):
+        overlaps = previous_end is not None and start < previous_end
+        rolling = is_vtt and (len(cue_lines) > 1 or end - start <= _TRANSITION_CUE_SECONDS)
+        for index, line in enumerate(cue_lines):
+            if overlaps or rolling:
+                carried = index < len(cue_lines) - 1 or end - start <= _TRANSITION_CUE_SECONDS
+                if line in previous_lines and (overlaps or carried):
+                    continue
+                if last_line and line.startswith(last_line) and line[len(last_line):len(last_line) + 1].isspace():
+                    text = line[len(last_line):].strip()
+                else:
+                    text = line
+            else:
+                text = line
+            last_line = line
+            if text:
+                yield start, end, text
+        previous_lines = cue_lines
+        previous_end = end
+
+
+def parse_captions(content: Union[str, Iterable[str]], max_sentence_seconds: float = 12.0) -> Dict[str, Any]:
+    """
+    Parses WebVTT or SRT captions in a single pass.
+
+    Returns the deduplicated plain-text transcript together with timestamped
+    sentences in the same {"text", "start", "end"} shape as transcribe_audio.
+    Captions without punctuation are cut into sentences every
+    max_sentence_seconds.
+    """
+    if isinstance(content, str):
+        content = io.StringIO(content)
+
+    parts: List[str] = []
+    sentences: List[Dict[str, Any]] = []
+    sentence_parts: List[str] = []
+    sentence_start = sentence_end = 0.0
+
+    for start, end, text in iter_caption_segments(content):
+        parts.append(text)
+        if not sentence_parts:
+            sentence_start = start
+        sentence_parts.append(text)
+        sentence_end = end
+
+        if text.endswith(_SENTENCE_END) or sentence_end - sentence_start >= max_sentence_seconds:
+            sentences.append({
+                "text": ' '.join(sentence_parts),
+                "start": sentence_start,
+                "end": sentence_end
+            })
+            sentence_parts = []
+
+    if sentence_parts:
+        sentences.append({
+            "text": ' '.join(sentence_parts),
+            "start": sentence_start,
+            "end": sentence_end
+        })
+
+    full_transcript = _SENTENCE_START_RE.sub(lambda m: m.group(1) + ' ' + m.group(2).upper(), ' '.join(parts))
+
+    return {
+        "full_transcript": full_transcript.strip(),
+        "sentences": sentences
+    }
+
+
+def _format_vtt_timestamp(seconds: float) -> str:
+    hours, remainder = divmod(seconds, 3600)
+    minutes, secs = divmod(remainder, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{secs:06.3f}"
+
+
+def _synthetic_youtube_vtt(hours: float = 3.0, cue_seconds: float = 2.0) -> str:
+    """
+    Builds a rolling auto-caption file shaped like YouTube's, for benchmarking
+    """
+    words = "so the next thing we want to look at is how the gradient flows through the network".split()
+    lines = ["WEBVTT", "Kind: captions", "Language: en", ""]
+    previous = ""
+    t = 0.0
+    index = 0
+    while t < hours * 3600:
+        current_words = [words[(index + i) % len(words)] for i in range(6)]
+        timed = current_words[0] + ''.join(
+            f"<{_format_vtt_timestamp(t + 0.3 * i)}><c> {word}</c>" for i, word in enumerate(current_words[1:], 1)
+        )
+        lines.append(f"{_format_vtt_timestamp(t)} --> {_format_vtt_timestamp(t + cue_seconds)} align:start position:0%")
+        lines.append(previous or " ")
+        lines.append(timed)
+        lines.append("")
+        plain = ' '.join(current_words)
+        lines.append(f"{_format_vtt_timestamp(t + cue_seconds)} --> {_format_vtt_timestamp(t + cue_seconds + 0.01)} align:start position:0%")
+        lines.append(plain)
+        lines.append(" ")
+        lines.append("")
+        previous = plain
+        t += cue_seconds + 0.01
+        index += 6
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    import time
+
+    from benchmark_baselines import legacy_parse_captions
+
+    content = _synthetic_youtube_vtt(hours=3.0)
+    print(f"Synthetic 3-hour caption file: {len(content) / 1e6:.1f} MB")
+
+    started = time.perf_counter()
+    legacy = legacy_parse_captions(content)
+    legacy_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    parsed = parse_captions(content)
+    parsed_seconds = time.perf_counter() - started
+
+    print(f"legacy regex parser:  {legacy_seconds:.3f}s, {len(legacy):,} chars")
+    print(f"streaming parser:     {parsed_seconds:.3f}s, {len(parsed['full_transcript']):,} chars, "
+          f"{len(parsed['sentences']):,} sentences")
+    print(f"speedup: {legacy_seconds / parsed_seconds:.1f}x, "
+          f"transcript size reduced by {1 - len(parsed['full_transcript']) / len(legacy):.0%}")
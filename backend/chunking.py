@@ -0,0 +1,284 @@
+import re
+from bisect import bisect_right
+from collections import namedtuple
+from typing import Any, Dict, Iterator, List, Optional
+
+DEFAULT_MAX_TOKENS = 128
+DEFAULT_OVERLAP_TOKENS = 24
+
+# Word-piece approximation of LLM tokens: runs of word characters and single punctuation marks
+_TOKEN_RE = re.compile(r'\w+|[^\w\s]')
+_PARAGRAPH_BREAK_RE = re.compile(r'\n[ \t]*\n\s*')
+_SENTENCE_BREAK_RE = re.compile(r'[.!?]+["\')\]]*\s+')
+_NUMBERED_HEADING_RE = re.compile(r'^(?:\d+(?:\.\d+)*\.?|[IVX]+\.|(?:chapter|section|part|unit|lesson)\s+\w+)\s+\S', re.IGNORECASE)
+
+# A unit is the smallest piece a chunk is built from: a heading line or a sentence.
+# start/end are character offsets into the source text.
+_Unit = namedtuple('_Unit', ['start', 'end', 'tokens', 'heading', 'paragraph_start'])
+
+
+def count_tokens(text: str) -> int:
+    """
+    Approximate token count used for chunk sizing
+    """
+    return len(_TOKEN_RE.findall(text))
+
+
+def _is_heading(line: str) -> bool:
+    line = line.strip()
+    if not line or len(line) > 80 or line[-1] in '.,;!?':
+        return False
+    if line.startswith('#'):
+        return True
+    if _NUMBERED_HEADING_RE.match(line):
+        return count_tokens(line) <= 12
+    letters = [c for c in line if c.isalpha()]
+    return len(letters) >= 3 and line.isupper()
+
+
+def _trimmed(text: str, start: int, end: int) -> Optional[tuple]:
+    """
+    Narrows [start, end) to exclude surrounding whitespace, None if nothing is left
+    """
+    piece = text[start:end]
+    stripped = piece.strip()
+    if not stripped:
+        return None
+    start += len(piece) - len(piece.lstrip())
+    return start, start + len(stripped)
+
+
+def _sentence_units(text: str, start: int, end: int, max_tokens: int, paragraph_start: bool) -> Iterator[_Unit]:
+    """
+    Splits text[start:end] into sentences; a sentence longer than max_tokens is cut at token boundaries
+    """
+    cursor = start
+    boundaries = [m.end() for m in _SENTENCE_BREAK_RE.finditer(text, start, end)]
+    boundaries.append(end)
+    for boundary in boundaries:
+        span = _trimmed(text, cursor, boundary)
+        cursor = boundary
+        if span is None:
+            continue
+        token_count = len(_TOKEN_RE.findall(text, span[0], span[1]))
+        if token_count <= max_tokens:
+            yield _Unit(span[0], span[1], token_count, False, paragraph_start)
+        else:
+            tokens = list(_TOKEN_RE.finditer(text, span[0], span[1]))
+            for i in range(0, len(tokens), max_tokens):
+                piece = tokens[i:i + max_tokens]
+                yield _Unit(piece[0].start(), piece[-1].end(), len(piece), False, paragraph_start and i == 0)
+        paragraph_start = False
+
+
+def _text_units(text: str, max_tokens: int) -> List[_Unit]:
+    """
+    Segments text into headings and sentences, marking the first unit of every paragraph
+    """
+    units: List[_Unit] = []
+    paragraph_bounds = [0]
+    for m in _PARAGRAPH_BREAK_RE.finditer(text):
+        paragraph_bounds.extend((m.start(), m.end()))
+    paragraph_bounds.append(len(text))
+
+    for start, end in zip(paragraph_bounds[::2], paragraph_bounds[1::2]):
+        # A heading is the first line of a paragraph, PDFs rarely put a blank line after it
+        line_end = text.find('\n', start, end)
+        line_end = end if line_end == -1 else line_end
+        paragraph_start = True
+        if _is_heading(text[start:line_end]):
+            span = _trimmed(text, start, line_end)
+            units.append(_Unit(span[0], span[1], count_tokens(text[span[0]:span[1]]), True, True))
+            start = line_end
+            paragraph_start = False
+        units.extend(_sentence_units(text, start, end, max_tokens, paragraph_start))
+    return units
+
+
+def _pack(units: List[_Unit], max_tokens: int, overlap_tokens: int) -> List[tuple]:
+    """
+    Groups consecutive units into chunks of at most max_tokens tokens, returned as
+    (first, last) unit indices. A chunk is closed before a heading, at a paragraph
+    break once it is half full, or when the next unit would not fit. The next chunk
+    repeats up to overlap_tokens tokens of trailing sentences, never across a heading.
+    """
+    groups = []
+    first = 0
+    tokens = 0
+    for i, unit in enumerate(units):
+        if i > first:
+            section_change = unit.heading and not units[i - 1].heading
+            full = tokens + unit.tokens > max_tokens
+            paragraph_end = unit.paragraph_start and tokens >= max_tokens // 2
+            if section_change or full or paragraph_end:
+                groups.append((first, i - 1))
+                new_first, carried = i, 0
+                if not section_change:
+                    while (new_first - 1 > first and not units[new_first - 1].heading
+                           and carried + units[new_first - 1].tokens <= overlap_tokens):
+                        new_first -= 1
+                        carried += units[new_first].tokens
+                if carried + unit.tokens > max_tokens:
+                    new_first, carried = i, 0
+                first, tokens = new_first, carried
+        tokens += unit.tokens
+    if units:
+        groups.append((first, len(units) - 1))
+    return groups
+
+
+def chunk_text(text: str, max_tokens: int = DEFAULT_MAX_TOKENS,
+               overlap_tokens: int = DEFAULT_OVERLAP_TOKENS) -> List[Dict[str, Any]]:
+    """
+    Splits text into retrieval chunks along heading, paragraph and sentence boundaries.
+
+    Each chunk is {"text", "tokens", "start_char", "end_char"}, the text being the
+    exact source slice text[start_char:end_char].
+    """
+    units = _text_units(text, max_tokens)
+    chunks = []
+    for first, last in _pack(units, max_tokens, overlap_tokens):
+        start, end = units[first].start, units[last].end
+        chunks.append({
+            "text": text[start:end],
+            "tokens": sum(unit.tokens for unit in units[first:last + 1]),
+            "start_char": start,
+            "end_char": end
+        })
+    return chunks
+
+
+def chunk_pages(pages: List[Dict[str, Any]], max_tokens: int = DEFAULT_MAX_TOKENS,
+                overlap_tokens: int = DEFAULT_OVERLAP_TOKENS) -> List[Dict[str, Any]]:
+    """
+    Chunks extracted PDF pages ([{"page", "text"}]) and adds the page range of every
+    chunk as page_start/page_end. Offsets refer to the join_pages text.
+    """
+    page_offsets: List[int] = []
+    page_numbers: List[int] = []
+    parts: List[str] = []
+    offset = 0
+    for page in pages:
+        text = page["text"].strip()
+        if not text:
+            continue
+        if parts:
+            offset += 2
+        page_offsets.append(offset)
+        page_numbers.append(page["page"])
+        parts.append(text)
+        offset += len(text)
+
+    chunks = chunk_text("\n\n".join(parts), max_tokens, overlap_tokens)
+    for chunk in chunks:
+        chunk["page_start"] = page_numbers[bisect_right(page_offsets, chunk["start_char"]) - 1]
+        chunk["page_end"] = page_numbers[bisect_right(page_offsets, chunk["end_char"] - 1) - 1]
+    return chunks
+
+
+def chunk_sentences(sentences: List[Dict[str, Any]], max_tokens: int = DEFAULT_MAX_TOKENS,
+                    overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+                    pause_seconds: float = 2.0) -> List[Dict[str, Any]]:
+    """
+    Chunks timestamped transcript sentences ([{"text", "start", "end"}]) and adds the
+    time range of every chunk as start/end. A pause longer than pause_seconds counts
+    as a paragraph break. Sentences are never split, so a single sentence longer than
+    max_tokens becomes a chunk of its own.
+    """
+    units: List[_Unit] = []
+    previous_end = None
+    for index, sentence in enumerate(sentences):
+        paragraph_start = previous_end is None or sentence["start"] - previous_end > pause_seconds
+        units.append(_Unit(index, index + 1, count_tokens(sentence["text"]), False, paragraph_start))
+        previous_end = sentence["end"]
+
+    chunks = []
+    for first, last in _pack(units, max_tokens, overlap_tokens):
+        chunks.append({
+            "text": ' '.join(sentence["text"] for sentence in sentences[first:last + 1]),
+            "tokens": sum(unit.tokens for unit in units[first:last + 1]),
+            "start": sentences[first]["start"],
+            "end": sentences[last]["end"]
+        })
+    return chunks
+
+
+if __name__ == "__main__":
+    import math
+    import os
+    import random
+    import sys
+    import time
+    from collections import Counter
+
+    from benchmark_baselines import legacy_create_chunks
+    from pdf_extraction import PDFExtractor, join_pages
+
+    samples_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "frontend", "public", "samples")
+    paths = sys.argv[1:] or [os.path.join(samples_dir, f"doc{i}.pdf") for i in range(1, 4)]
+    extractor = PDFExtractor(min_pages_for_pool=10 ** 9)
+    documents = [extractor.extract_pages_sync(path) for path in paths]
+    texts = [join_pages(pages) for pages in documents]
+
+    def measure(label, chunker, repeats=20):
+        started = time.perf_counter()
+        for _ in range(repeats):
+            for text in texts:
+                chunker(text)
+        elapsed = time.perf_counter() - started
+        characters = repeats * sum(len(text) for text in texts)
+        print(f"{label:<22} {characters / elapsed / 1e6:8.2f} MB/s")
+
+    print("Speed")
+    measure("create_chunks", legacy_create_chunks)
+    measure("chunk_text", chunk_text)
+    pages_by_text = dict(zip(map(id, texts), documents))
+    measure("chunk_pages", lambda text: chunk_pages(pages_by_text[id(text)]))
+
+    # Retrieval quality with a lexical retriever standing in for the embedding model:
+    # a query is a source sentence with a third of its words dropped, a hit is a
+    # top-k chunk that contains the whole original sentence.
+    def words_of(text):
+        return re.findall(r'\w+', text.lower())
+
+    def build_index(chunks):
+        vectors = [Counter(words_of(chunk)) for chunk in chunks]
+        document_frequency = Counter(word for vector in vectors for word in vector)
+        idf = {word: math.log(len(vectors) / count) + 1 for word, count in document_frequency.items()}
+        norms = [math.sqrt(sum((count * idf[word]) ** 2 for word, count in vector.items())) or 1.0 for vector in vectors]
+        return vectors, idf, norms
+
+    def search(index, query, top_k):
+        vectors, idf, norms = index
+        query_vector = Counter(words_of(query))
+        scores = [
+            sum(count * idf.get(word, 0) ** 2 * vector.get(word, 0) for word, count in query_vector.items()) / norm
+            for vector, norm in zip(vectors, norms)
+        ]
+        return sorted(range(len(scores)), key=scores.__getitem__, reverse=True)[:top_k]
+
+    rng = random.Random(7)
+    queries = []
+    for text in texts:
+        sentences = [unit for unit in _text_units(text, DEFAULT_MAX_TOKENS) if not unit.heading and unit.tokens >= 8]
+        for unit in rng.sample(sentences, min(100, len(sentences))):
+            sentence = text[unit.start:unit.end]
+            kept = [word for word in sentence.split() if rng.random() > 0.33]
+            queries.append((texts.index(text), ' '.join(sentence.split()), ' '.join(kept)))
+
+    def normalized(chunk):
+        return ' '.join(chunk.split())
+
+    print(f"\nRetrieval over {len(queries)} sentence queries")
+    for label, chunker in (("create_chunks", legacy_create_chunks),
+                           ("chunk_text", lambda text: [chunk["text"] for chunk in chunk_text(text)])):
+        per_document = [[normalized(chunk) for chunk in chunker(text)] for text in texts]
+        indexes = [build_index(chunks) for chunks in per_document]
+        sizes = [len(chunk) for chunks in per_document for chunk in chunks]
+        for top_k in (1, 3):
+            hits = sum(
+                any(sentence in per_document[doc][i] for i in search(indexes[doc], query, top_k))
+                for doc, sentence, query in queries
+            )
+            print(f"{label:<14} top-{top_k}: {hits / len(queries):6.1%} hit rate, "
+                  f"{top_k * sum(sizes) / len(sizes):6.0f} chars of context")
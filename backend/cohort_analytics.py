@@ -0,0 +1,328 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from attempts_repository import attempt_repository
+from cohort_metrics import ATTEMPT_TYPES, LEVELS, RECOMPUTE_PAGE_SIZE, _select_all
+from profile_cache import profile_cache
+from student_modeling import LearningStyleProfile, get_current_level, profile_from_row
+
+logger = logging.getLogger(__name__)
+
+COHORT_ALL = 'all'  # every student, whatever they study
+
+# What a rebuild reads of each attempt and profile
+ATTEMPT_COLUMNS = 'id,user_id,attempt_type,content_id,score,time_taken,timestamp'
+PROFILE_COLUMNS = 'user_id,cognitive_metrics,behavioral_metrics'
+
+# (overall_progress, engagement_score, current level) a student adds to their cohorts
+Contribution = Tuple[float, float, str]
+
+
+def cohort_of(content_id: str) -> Optional[str]:
+    """
+    The video or document an attempt belongs to: the source part of a
+    "source_id:chunk" topic id, None for content that is not tied to a source
+    """
+    source, separator, _ = content_id.partition(':')
+    return source if separator and source else None
+
+
+def week_of(timestamp: str) -> str:
+    """
+    Monday of the week of an ISO timestamp
+    """
+    day = date.fromisoformat(timestamp[:10])
+    return (day - timedelta(days=day.weekday())).isoformat()
+
+
+def contribution_of(profile: LearningStyleProfile) -> Contribution:
+    return (profile.cognitive_metrics['overall_progress'], profile.behavioral_metrics['engagement_score'],
+            get_current_level(profile))
+
+
+def _new_week() -> Dict[str, Any]:
+    return {'attempts': 0, 'score_sum': 0.0, 'minutes': 0.0, 'students': set()}
+
+
+def _new_totals() -> Dict[str, Any]:
+    return {'students': 0, 'progress_sum': 0.0, 'engagement_sum': 0.0, 'levels': dict.fromkeys(LEVELS, 0)}
+
+
+class _CohortState:
+    """
+    The aggregates themselves, swapped out whole by a rebuild
+    """
+
+    def __init__(self):
+        self.weeks: Dict[str, Dict[str, Dict[str, Any]]] = {}  # cohort -> week -> attempt totals
+        self.totals: Dict[str, Dict[str, Any]] = {COHORT_ALL: _new_totals()}  # cohort -> profile totals
+        self.members: Dict[str, Set[str]] = {}  # user_id -> cohorts other than COHORT_ALL
+        self.contributions: Dict[str, Contribution] = {}  # user_id -> what is counted in totals
+
+    def _apply(self, cohort: str, contribution: Contribution, sign: int):
+        totals = self.totals.setdefault(cohort, _new_totals())
+        progress, engagement, level = contribution
+        totals['students'] += sign
+        totals['progress_sum'] += sign * progress
+        totals['engagement_sum'] += sign * engagement
+        totals['levels'][level] += sign
+
+    def add_attempt(self, row: Dict[str, Any], first_week: str) -> Tuple[str, ...]:
+        """
+        Counts one learning_attempts row, returns the cohorts it changed. Only whole
+        quizzes and Concept Detective answers count, not the per-topic rows of a quiz.
+        """
+        week = week_of(row['timestamp'])
+        if week < first_week or row['attempt_type'] not in ATTEMPT_TYPES:
+            return ()
+        user_id = row['user_id']
+        cohort = cohort_of(row['content_id'])
+        cohorts = (COHORT_ALL, cohort) if cohort else (COHORT_ALL,)
+        for name in cohorts:
+            stats = self.weeks.setdefault(name, {}).setdefault(week, _new_week())
+            stats['attempts'] += 1
+            stats['score_sum'] += row['score']
+            stats['minutes'] += row['time_taken']
+            stats['students'].add(user_id)
+        if cohort:
+            joined = self.members.setdefault(user_id, set())
+            if cohort not in joined:
+                joined.add(cohort)
+                contribution = self.contributions.get(user_id)
+                if contribution is not None:
+                    self._apply(cohort, contribution, 1)
+        return cohorts
+
+    def set_profile(self, user_id: str, contribution: Contribution) -> List[str]:
+        """
+        Replaces what a student adds to the profile totals, returns the cohorts it changed
+        """
+        previous = self.contributions.get(user_id)
+        if previous == contribution:
+            return []
+        self.contributions[user_id] = contribution
+        cohorts = [COHORT_ALL, *self.members.get(user_id, ())]
+        for cohort in cohorts:
+            if previous is not None:
+                self._apply(cohort, previous, -1)
+            self._apply(cohort, contribution, 1)
+        return cohorts
+
+    def prune(self, first_week: str):
+        for weeks in self.weeks.values():
+            for week in [week for week in weeks if week < first_week]:
+                del weeks[week]
+
+
+class CohortAnalytics:
+    """
+    Class-level analytics per cohort, kept up to date as attempts and profiles change.
+
+    A cohort is the video or document students are quizzed on (see cohort_of),
+    plus COHORT_ALL. For each cohort the weekly attempt totals of the last
+    weeks weeks, and running sums of progress, engagement and current level
+    over its students' profiles, are updated in O(1) per attempt or profile
+    change through the listeners of attempt_repository and profile_cache.
+
+    get() serves a cohort's view from a materialized dict, rebuilt from the
+    aggregates only after the cohort changed, so a read never touches
+    Supabase or scales with the number of students. Since the running sums
+    only see changes made in this process, a full rebuild from
+    learning_attempts and student_profiles runs at start() and every
+    rebuild_interval seconds to correct drift.
+    """
+
+    def __init__(self, weeks: int = 12, rebuild_interval: float = 3600.0, page_size: int = RECOMPUTE_PAGE_SIZE):
+        self.weeks = weeks
+        self.rebuild_interval = rebuild_interval
+        self.page_size = page_size
+        self._state = _CohortState()
+        self._views: Dict[str, Dict[str, Any]] = {}
+        self._rebuilding = False
+        self._during_rebuild: List[Tuple[str, Any]] = []
+        self._rebuilder: Optional[asyncio.Task] = None
+        self.metrics = {
+            "attempts_observed": 0,
+            "profiles_observed": 0,
+            "views_built": 0,
+            "views_served": 0,
+            "rebuilds": 0,
+            "rebuild_errors": 0,
+            "last_rebuild_seconds": 0.0,
+            "last_rebuild_drift": 0,
+            "last_rebuilt_at": None,
+        }
+
+    def _first_week(self) -> str:
+        return week_of((datetime.now() - timedelta(weeks=self.weeks - 1)).isoformat())
+
+    def _invalidate(self, cohorts):
+        for cohort in cohorts:
+            self._views.pop(cohort, None)
+
+    def observe_attempts(self, rows: List[Dict[str, Any]]):
+        """
+        attempt_repository listener
+        """
+        if self._rebuilding:
+            self._during_rebuild.extend(('attempt', row) for row in rows)
+        first_week = self._first_week()
+        for row in rows:
+            self._invalidate(self._state.add_attempt(row, first_week))
+        self.metrics["attempts_observed"] += len(rows)
+
+    def observe_profile(self, user_id: str, profile: LearningStyleProfile):
+        """
+        profile_cache listener
+        """
+        contribution = contribution_of(profile)
+        if self._rebuilding:
+            self._during_rebuild.append(('profile', (user_id, contribution)))
+        self._invalidate(self._state.set_profile(user_id, contribution))
+        self.metrics["profiles_observed"] += 1
+
+    def _build_view(self, cohort: str) -> Dict[str, Any]:
+        totals = self._state.totals.get(cohort) or _new_totals()
+        students = totals['students']
+        first_week = self._first_week()
+        weeks = []
+        for week, stats in sorted(self._state.weeks.get(cohort, {}).items()):
+            if week < first_week:
+                continue
+            weeks.append({
+                'week': week,
+                'attempts': stats['attempts'],
+                'active_students': len(stats['students']),
+                'average_score': stats['score_sum'] / stats['attempts'],
+                'learning_minutes': stats['minutes'],
+            })
+        self.metrics["views_built"] += 1
+        return {
+            'cohort': cohort,
+            'students': students,
+            'average_progress': totals['progress_sum'] / students if students else 0.0,
+            'average_engagement': totals['engagement_sum'] / students if students else 0.0,
+            'level_distribution': dict(totals['levels']),
+            'weeks': weeks,
+            'updated_at': datetime.now().isoformat(),
+            'rebuilt_at': self.metrics["last_rebuilt_at"],
+        }
+
+    def get(self, cohort: str) -> Optional[Dict[str, Any]]:
+        """
+        The cohort's analytics, None for a cohort nobody has attempted anything in
+        """
+        view = self._views.get(cohort)
+        if view is None:
+            if cohort not in self._state.weeks and cohort not in self._state.totals:
+                return None
+            view = self._views[cohort] = self._build_view(cohort)
+        self.metrics["views_served"] += 1
+        return view
+
+    def cohorts(self) -> List[Dict[str, Any]]:
+        names = sorted(self._state.totals.keys() | self._state.weeks.keys())
+        return [{'cohort': cohort, 'students': self._state.totals.get(cohort, _new_totals())['students']}
+                for cohort in names]
+
+    async def rebuild(self) -> Dict[str, Any]:
+        """
+        Recomputes every aggregate from learning_attempts and student_profiles and
+        swaps them in. Changes observed while loading are replayed on the new state;
+        an attempt flushed to Supabase during the load is then counted twice until the
+        next rebuild.
+        """
+        started = time.perf_counter()
+        self._rebuilding = True
+        self._during_rebuild = []
+        try:
+            # Buffered attempts would be in neither the load nor the replay
+            await attempt_repository.flush()
+            first_week = self._first_week()
+            state = _CohortState()
+            profile_rows = await _select_all('student_profiles', PROFILE_COLUMNS, self.page_size, order='user_id')
+            for row in profile_rows:
+                state.set_profile(row['user_id'], contribution_of(profile_from_row(row)))
+            del profile_rows
+            # Only the weeks kept, page by page on the (timestamp, id) keyset
+            since = datetime.fromisoformat(first_week)
+            cursor = None
+            while True:
+                rows, cursor = await attempt_repository.fetch_page(None, since=since, cursor=cursor,
+                                                                   limit=self.page_size, columns=ATTEMPT_COLUMNS)
+                for row in rows:
+                    state.add_attempt(row, first_week)
+                if cursor is None:
+                    break
+            for kind, item in self._during_rebuild:
+                if kind == 'attempt':
+                    state.add_attempt(item, first_week)
+                else:
+                    state.set_profile(*item)
+        finally:
+            self._rebuilding = False
+            self._during_rebuild = []
+
+        old = self._state
+        old.prune(first_week)
+        drift = sum(
+            abs(stats['attempts'] - old.weeks.get(cohort, {}).get(week, {}).get('attempts', 0))
+            for cohort, weeks in state.weeks.items() for week, stats in weeks.items()
+        ) + sum(
+            stats['attempts'] for cohort, weeks in old.weeks.items() for week, stats in weeks.items()
+            if week not in state.weeks.get(cohort, {})
+        )
+        self._state = state
+        self._views = {}
+
+        seconds = time.perf_counter() - started
+        self.metrics["rebuilds"] += 1
+        self.metrics["last_rebuild_seconds"] = round(seconds, 3)
+        self.metrics["last_rebuild_drift"] = drift
+        self.metrics["last_rebuilt_at"] = datetime.now().isoformat()
+        summary = {'cohorts': len(state.totals), 'students': len(state.contributions),
+                   'drift_attempts': drift, 'seconds': round(seconds, 3)}
+        logger.info(f"Cohort analytics rebuilt: {summary}")
+        return summary
+
+    async def _rebuild_loop(self):
+        while True:
+            try:
+                await self.rebuild()
+            except Exception as e:
+                self.metrics["rebuild_errors"] += 1
+                logger.error(f"Cohort analytics rebuild failed: {e}")
+            await asyncio.sleep(self.rebuild_interval)
+
+    async def start(self):
+        """
+        Subscribes to attempt and profile changes and starts the periodic rebuild,
+        the first one right away
+        """
+        attempt_repository.listeners.append(self.observe_attempts)
+        profile_cache.listeners.append(self.observe_profile)
+        self._rebuilder = asyncio.create_task(self._rebuild_loop())
+
+    async def stop(self):
+        if self.observe_attempts in attempt_repository.listeners:
+            attempt_repository.listeners.remove(self.observe_attempts)
+        if self.observe_profile in profile_cache.listeners:
+            profile_cache.listeners.remove(self.observe_profile)
+        if self._rebuilder is not None:
+            self._rebuilder.cancel()
+            await asyncio.gather(self._rebuilder, return_exceptions=True)
+            self._rebuilder = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.metrics, "cohorts": len(self._state.totals.keys() | self._state.weeks.keys()), "students": len(self._state.contributions),
+                "materialized_views": len(self._views)}
+
+
+cohort_analytics = CohortAnalytics(
+    weeks=int(os.getenv("COHORT_WEEKS", "12")),
+    rebuild_interval=float(os.getenv("COHORT_REBUILD_SECONDS", "3600")),
+)
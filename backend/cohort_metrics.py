@@ -0,0 +1,382 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from knowledge_tracing import summarize_topics
+from profile_cache import ProfileCache
+from score_stats import RECENT_SCORES, SCORE_EWMA_ALPHA
+from student_modeling import (
+    LearningStyleProfile,
+    knowledge_tracer,
+    profile_from_row,
+    profile_to_row,
+    save_student_profiles,
+)
+from supabase_client import get_supabase_client
+
+logger = logging.getLogger(__name__)
+
+LEVELS = ('beginner', 'intermediate', 'advanced')
+ATTEMPT_TYPES = ('quiz', 'concept_detective')
+LEVEL_WEIGHTS = np.array([0.3, 0.3, 0.4])  # overall_progress weights of update_cognitive_metrics
+RECOMPUTE_PAGE_SIZE = int(os.getenv("COHORT_PAGE_SIZE", "10000"))
+RECOMPUTE_WRITE_BATCH = int(os.getenv("COHORT_WRITE_BATCH", "500"))
+
+
+class AttemptColumns(NamedTuple):
+    """
+    learning_attempts rows in columnar form, one array entry per attempt
+    """
+    user_ids: List[str]  # user_index -> user_id
+    user_index: np.ndarray  # int64
+    attempt_type: np.ndarray  # int8, index into ATTEMPT_TYPES
+    level: np.ndarray  # int8, index into LEVELS
+    score: np.ndarray  # float64
+    time_taken: np.ndarray  # float64
+    timestamp: np.ndarray  # float64, seconds since the epoch
+
+
+def attempt_columns_from_rows(rows: List[Dict[str, Any]]) -> AttemptColumns:
+    """
+    Builds the columns from learning_attempts rows, skipping rows with an unknown type or level
+    """
+    type_codes = {name: code for code, name in enumerate(ATTEMPT_TYPES)}
+    level_codes = {name: code for code, name in enumerate(LEVELS)}
+    rows = [row for row in rows if row['attempt_type'] in type_codes and row['level'] in level_codes]
+
+    user_ids, user_index = np.unique(np.array([row['user_id'] for row in rows], dtype=object), return_inverse=True)
+    timestamps = [row.get('timestamp') for row in rows]
+    return AttemptColumns(
+        user_ids=user_ids.tolist(),
+        user_index=user_index.astype(np.int64),
+        attempt_type=np.fromiter((type_codes[row['attempt_type']] for row in rows), dtype=np.int8, count=len(rows)),
+        level=np.fromiter((level_codes[row['level']] for row in rows), dtype=np.int8, count=len(rows)),
+        score=np.fromiter((row['score'] for row in rows), dtype=np.float64, count=len(rows)),
+        time_taken=np.fromiter((row['time_taken'] for row in rows), dtype=np.float64, count=len(rows)),
+        timestamp=np.fromiter(
+            (datetime.fromisoformat(ts).timestamp() if isinstance(ts, str) else (ts or 0.0) for ts in timestamps),
+            dtype=np.float64, count=len(rows)
+        ),
+    )
+
+
+def _score_stats_columns(group: np.ndarray, score: np.ndarray, n_groups: int) -> Dict[str, Any]:
+    """
+    score_stats aggregates of every group at once; group and score must be sorted by group, then time
+    """
+    count = np.bincount(group, minlength=n_groups)
+    present = count > 0
+    mean = np.divide(np.bincount(group, score, minlength=n_groups), count,
+                     out=np.zeros(n_groups), where=present)
+    m2 = np.bincount(group, (score - mean[group]) ** 2, minlength=n_groups)
+
+    starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]]) if len(group) else np.empty(0, dtype=np.int64)
+    minimum = np.full(n_groups, np.nan)
+    maximum = np.full(n_groups, np.nan)
+    if len(group):
+        minimum[group[starts]] = np.minimum.reduceat(score, starts)
+        maximum[group[starts]] = np.maximum.reduceat(score, starts)
+
+    # add_score's EWMA in closed form: score k of n counts with alpha * (1 - alpha) ** (n - 1 - k),
+    # except the first, which seeds the average with weight (1 - alpha) ** (n - 1)
+    position = np.arange(len(group)) - np.repeat(starts, count[present])
+    from_end = count[group] - 1 - position
+    weight = (1 - SCORE_EWMA_ALPHA) ** from_end * np.where(position == 0, 1.0, SCORE_EWMA_ALPHA)
+    ewma = np.bincount(group, weight * score, minlength=n_groups)
+
+    # Last RECENT_SCORES scores of each group, oldest first
+    keep = from_end < RECENT_SCORES
+    recent_counts = np.bincount(group[keep], minlength=n_groups)
+    recent = np.split(score[keep], np.cumsum(recent_counts)[:-1])
+
+    return {'count': count, 'present': present, 'mean': mean, 'm2': m2, 'min': minimum,
+            'max': maximum, 'ewma': ewma, 'recent': recent}
+
+
+def compute_cohort_metrics(columns: AttemptColumns) -> Dict[str, Any]:
+    """
+    Every per-user metric of update_cognitive_metrics, update_behavioral_metrics and
+    get_current_level, computed from all of a user's attempts with grouped array
+    operations instead of a Python loop per profile
+    """
+    n_users = len(columns.user_ids)
+    n_levels = len(LEVELS)
+    user, kind, level = columns.user_index, columns.attempt_type.astype(np.int64), columns.level.astype(np.int64)
+    score, time_taken = columns.score, columns.time_taken
+
+    # Level averages and the weighted overall progress over the levels a user attempted
+    level_key = user * n_levels + level
+    level_count = np.bincount(level_key, minlength=n_users * n_levels).reshape(n_users, n_levels)
+    level_sum = np.bincount(level_key, score, minlength=n_users * n_levels).reshape(n_users, n_levels)
+    attempted = level_count > 0
+    level_mean = np.divide(level_sum, level_count, out=np.zeros((n_users, n_levels)), where=attempted)
+    weight = attempted * LEVEL_WEIGHTS
+    weight_total = weight.sum(axis=1)
+    overall_progress = np.divide((level_mean * weight).sum(axis=1), weight_total,
+                                 out=np.zeros(n_users), where=weight_total > 0)
+
+    # Per-type counts and times
+    type_key = user * len(ATTEMPT_TYPES) + kind
+    type_count = np.bincount(type_key, minlength=n_users * 2).reshape(n_users, 2)
+    type_time = np.bincount(type_key, time_taken, minlength=n_users * 2).reshape(n_users, 2)
+    average_time = np.divide(type_time, type_count, out=np.zeros((n_users, 2)), where=type_count > 0)
+    total_attempts = type_count.sum(axis=1)
+    total_time = type_time.sum(axis=1)
+    completed = np.bincount(user, (score > 0).astype(np.float64), minlength=n_users)
+    completion_rate = np.divide(completed, total_attempts, out=np.zeros(n_users), where=total_attempts > 0)
+    engagement = np.minimum(1.0, total_time / (60 * 8)) * 0.4 + completion_rate * 0.6
+
+    # Score aggregates per (user, type), in attempt order
+    order = np.lexsort((columns.timestamp, kind, user))
+    score_stats = _score_stats_columns(type_key[order], score[order], n_users * 2)
+
+    return {
+        'level_mean': level_mean,
+        'overall_progress': overall_progress,
+        'total_quizzes_taken': total_attempts,
+        'average_time_per_quiz': average_time[:, 0],
+        'average_time_per_concept': average_time[:, 1],
+        'total_learning_time': total_time,
+        'session_completion_rate': completion_rate,
+        'engagement_score': engagement,
+        'current_level': np.argmax(level_mean, axis=1),
+        'score_stats': score_stats,
+    }
+
+
+def apply_cohort_metrics(columns: AttemptColumns, metrics: Dict[str, Any],
+                         profiles: Optional[Dict[str, LearningStyleProfile]] = None) -> Dict[str, LearningStyleProfile]:
+    """
+    Writes the computed cognitive and behavioral metrics into each user's profile, creating
+    missing ones; learning styles and learning_metrics are left as they are
+    """
+    profiles = profiles if profiles is not None else {}
+    level_mean = metrics['level_mean'].tolist()
+    overall_progress = metrics['overall_progress'].tolist()
+    total_quizzes = metrics['total_quizzes_taken'].tolist()
+    behavioral = {name: metrics[name].tolist() for name in (
+        'average_time_per_quiz', 'average_time_per_concept', 'total_learning_time',
+        'session_completion_rate', 'engagement_score')}
+    stats = {name: metrics['score_stats'][name].tolist() for name in ('count', 'mean', 'm2', 'min', 'max', 'ewma')}
+    recent = metrics['score_stats']['recent']
+
+    def score_stats(group: int) -> Dict[str, Any]:
+        count = stats['count'][group]
+        scores = recent[group].tolist()
+        return {
+            'count': count,
+            'mean': stats['mean'][group],
+            'm2': stats['m2'][group],
+            'min': stats['min'][group] if count else None,
+            'max': stats['max'][group] if count else None,
+            'ewma': stats['ewma'][group] if count else None,
+            'recent': scores,
+            'recent_head': len(scores) % RECENT_SCORES,
+        }
+
+    for index, user_id in enumerate(columns.user_ids):
+        profile = profiles.get(user_id) or LearningStyleProfile()
+        profile.cognitive_metrics = {
+            'beginner_level': level_mean[index][0],
+            'intermediate_level': level_mean[index][1],
+            'advanced_level': level_mean[index][2],
+            'total_quizzes_taken': total_quizzes[index],
+            'overall_progress': overall_progress[index],
+            'quiz_score_stats': score_stats(index * 2),
+            'concept_detective_score_stats': score_stats(index * 2 + 1),
+        }
+        profile.behavioral_metrics = {name: values[index] for name, values in behavioral.items()}
+        profile.last_updated = datetime.now()
+        profiles[user_id] = profile
+    return profiles
+
+
+async def _select_all(table: str, columns: str, page_size: int, order: str = 'id') -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    start = 0
+    while True:
+        response = await get_supabase_client().table(table).select(columns).order(order) \
+            .range(start, start + page_size - 1).execute()
+        rows.extend(response.data)
+        if len(response.data) < page_size:
+            return rows
+        start += page_size
+
+
+async def recompute_cohort_metrics(page_size: int = RECOMPUTE_PAGE_SIZE,
+                                   write_batch: int = RECOMPUTE_WRITE_BATCH,
+                                   cache: Optional[ProfileCache] = None) -> Dict[str, Any]:
+    """
+    Recomputes the cognitive and behavioral metrics of every student from learning_attempts
+    and upserts the profiles back in batches. Meant for the nightly job, not the request path.
+
+    The running app passes its profile cache: profiles it holds are updated in place and
+    every profile is written through it, so a cached copy is never flushed back over the
+    result. Without a cache, run it only while the app is stopped.
+    """
+    timings = {}
+    started = time.perf_counter()
+    attempt_rows = await _select_all('learning_attempts', 'user_id,attempt_type,score,time_taken,level,timestamp', page_size)
+    profile_rows = await _select_all('student_profiles', '*', page_size)
+    timings['load_seconds'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    columns = attempt_columns_from_rows(attempt_rows)
+    del attempt_rows
+    metrics = compute_cohort_metrics(columns)
+    stored = {row['user_id']: profile_from_row(row) for row in profile_rows}
+    if cache is not None:
+        stored.update((user_id, profile) for user_id, profile in
+                      ((user_id, cache.peek(user_id)) for user_id in columns.user_ids) if profile is not None)
+    profiles = apply_cohort_metrics(columns, metrics, stored)
+    timings['compute_seconds'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    failed_batches = 0
+    if cache is not None:
+        for user_id in columns.user_ids:
+            cache.mark_dirty(user_id, profiles[user_id])
+        if not await cache.flush():
+            failed_batches += 1
+    else:
+        rows = [profile_to_row(user_id, profiles[user_id]) for user_id in columns.user_ids]
+        for offset in range(0, len(rows), write_batch):
+            if await save_student_profiles(rows[offset:offset + write_batch]) is None:
+                failed_batches += 1
+    timings['write_seconds'] = time.perf_counter() - started
+
+    summary = {'students': len(columns.user_ids), 'attempts': len(columns.score),
+               'failed_batches': failed_batches, **{k: round(v, 3) for k, v in timings.items()}}
+    logger.info(f"Cohort recompute finished: {summary}")
+    return summary
+
+
+async def retrace_knowledge_states(page_size: int = RECOMPUTE_PAGE_SIZE,
+                                   write_batch: int = RECOMPUTE_WRITE_BATCH) -> Dict[str, Any]:
+    """
+    Rebuilds every student's topic mastery by replaying their topic-tagged attempts
+    through BKT, e.g. after the BKT parameters change
+    """
+    started = time.perf_counter()
+    rows = await _select_all('learning_attempts', 'user_id,score,timestamp,metadata', page_size, order='timestamp')
+    rows = [row for row in rows if (row.get('metadata') or {}).get('topic_id')]
+    states = knowledge_tracer.trace_cohort(
+        [row['user_id'] for row in rows],
+        [row['metadata']['topic_id'] for row in rows],
+        (row['metadata'].get('correct', row['score'] / 100) for row in rows)
+    )
+
+    now = datetime.now().isoformat()
+    state_rows = []
+    for user_id, topics in states.items():
+        strengths, areas_for_improvement = summarize_topics(topics)
+        state_rows.append({'user_id': user_id, 'topics': topics, 'strengths': strengths,
+                           'areas_for_improvement': areas_for_improvement, 'last_updated': now})
+    failed_batches = 0
+    for offset in range(0, len(state_rows), write_batch):
+        try:
+            await get_supabase_client().table('knowledge_states') \
+                .upsert(state_rows[offset:offset + write_batch], on_conflict='user_id').execute()
+        except Exception as e:
+            failed_batches += 1
+            logger.error(f"Error saving knowledge states: {e}")
+
+    summary = {'students': len(state_rows), 'attempts': len(rows), 'failed_batches': failed_batches,
+               'seconds': round(time.perf_counter() - started, 3)}
+    logger.info(f"Knowledge state retrace finished: {summary}")
+    return summary
+
+
+if __name__ == "__main__":
+    import random
+    import sys
+
+    from score_stats import recent_scores
+    from student_modeling import (
+        ConceptDetectiveAttempt,
+        QuizAttempt,
+        get_current_level,
+        update_behavioral_metrics,
+        update_cognitive_metrics,
+    )
+
+    if "--recompute" in sys.argv:
+        print(asyncio.run(recompute_cohort_metrics()))
+        sys.exit(0)
+    if "--retrace" in sys.argv:
+        print(asyncio.run(retrace_knowledge_states()))
+        sys.exit(0)
+
+    students = int(os.getenv("COHORT_BENCH_STUDENTS", "20000"))
+    rng = random.Random(11)
+    rows = []
+    base = datetime(2024, 1, 1).timestamp()
+    for student in range(students):
+        for attempt in range(rng.randint(0, 60)):
+            rows.append({
+                'user_id': f"user-{student:06d}",
+                'attempt_type': rng.choice(ATTEMPT_TYPES),
+                'content_id': f"c{attempt}",
+                'score': rng.choice([0.0, rng.uniform(0, 100)]) if rng.random() < 0.1 else rng.uniform(0, 100),
+                'time_taken': rng.uniform(1, 30),
+                'level': rng.choice(LEVELS),
+                'timestamp': datetime.fromtimestamp(base + attempt * 3600 + rng.random()).isoformat(),
+            })
+    print(f"{students} students, {len(rows)} attempts")
+
+    # Per-object path: group attempt objects per user, then one profile at a time
+    started = time.perf_counter()
+    per_user: Dict[str, Any] = {}
+    for row in sorted(rows, key=lambda r: r['timestamp']):
+        quizzes, concepts = per_user.setdefault(row['user_id'], ([], []))
+        if row['attempt_type'] == 'quiz':
+            attempt = QuizAttempt(row['content_id'], row['score'], row['time_taken'], row['level'])
+            quizzes.append(attempt)
+        else:
+            attempt = ConceptDetectiveAttempt(row['content_id'], row['score'], row['time_taken'], row['level'])
+            concepts.append(attempt)
+    expected = {}
+    for user_id, (quizzes, concepts) in per_user.items():
+        profile = update_cognitive_metrics(LearningStyleProfile(), quizzes, concepts)
+        profile = update_behavioral_metrics(profile, quizzes, concepts)
+        expected[user_id] = (profile, get_current_level(profile))
+    object_seconds = time.perf_counter() - started
+
+    # Columnar path
+    started = time.perf_counter()
+    columns = attempt_columns_from_rows(rows)
+    load_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    metrics = compute_cohort_metrics(columns)
+    compute_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    profiles = apply_cohort_metrics(columns, metrics)
+    apply_seconds = time.perf_counter() - started
+
+    worst = 0.0
+    for index, user_id in enumerate(columns.user_ids):
+        profile, level = expected[user_id]
+        actual = profiles[user_id]
+        assert LEVELS[metrics['current_level'][index]] == level, user_id
+        assert actual.cognitive_metrics['total_quizzes_taken'] == profile.cognitive_metrics['total_quizzes_taken']
+        for group in ('cognitive_metrics', 'behavioral_metrics'):
+            for name, value in getattr(profile, group).items():
+                if isinstance(value, dict):
+                    other = getattr(actual, group)[name]
+                    assert other['count'] == value['count'] and other['recent'] == recent_scores(value), (user_id, name)
+                    for key in ('mean', 'm2', 'min', 'max', 'ewma'):
+                        if value[key] is not None:
+                            worst = max(worst, abs(other[key] - value[key]) / max(1.0, abs(value[key])))
+                else:
+                    worst = max(worst, abs(getattr(actual, group)[name] - value) / max(1.0, abs(value)))
+    assert worst < 1e-9, worst
+    print(f"matches the per-object path, max relative difference {worst:.1e}")
+    print(f"per-object: {object_seconds:.2f}s")
+    print(f"columnar:   {load_seconds + compute_seconds + apply_seconds:.2f}s "
+          f"(columns {load_seconds:.2f}s, compute {compute_seconds:.2f}s, profiles {apply_seconds:.2f}s), "
+          f"compute alone {object_seconds / compute_seconds:.0f}x faster")
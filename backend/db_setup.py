@@ -28,8 +28,8 @@ async def setup_student_profiles_table():
                     "intermediate_level": 0,
                     "advanced_level": 0,
                     "total_quizzes_taken": 0,
-                    "quiz_scores": [],
-                    "concept_detective_scores": [],
+                    "quiz_score_stats": {"count": 0, "mean": 0, "m2": 0, "min": null, "max": null, "ewma": null, "recent": [], "recent_head": 0},
+                    "concept_detective_score_stats": {"count": 0, "mean": 0, "m2": 0, "min": null, "max": null, "ewma": null, "recent": [], "recent_head": 0},
                     "overall_progress": 0
                 }'::jsonb,
                 behavioral_metrics JSONB NOT NULL DEFAULT '{
@@ -77,7 +77,8 @@ async def setup_knowledge_states_table():
                 strengths TEXT[] DEFAULT ARRAY[]::TEXT[],
                 areas_for_improvement TEXT[] DEFAULT ARRAY[]::TEXT[],
                 last_updated TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-                created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+                UNIQUE(user_id)
             );
         """)
         
@@ -87,6 +88,22 @@ async def setup_knowledge_states_table():
             CREATE INDEX IF NOT EXISTS idx_knowledge_states_last_updated ON knowledge_states(last_updated);
         """)
         
+        # Tables created before state upserts may hold several rows per user and lack the
+        # unique constraint upserts on user_id need: keep each user's latest row, then add it
+        await supabase.table('knowledge_states').execute("""
+            DELETE FROM knowledge_states a USING knowledge_states b
+                WHERE a.user_id = b.user_id
+                AND (COALESCE(a.last_updated, '-infinity'), a.id) < (COALESCE(b.last_updated, '-infinity'), b.id);
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT 1 FROM pg_constraint WHERE conname = 'knowledge_states_user_id_key'
+                ) THEN
+                    ALTER TABLE knowledge_states ADD CONSTRAINT knowledge_states_user_id_key UNIQUE (user_id);
+                END IF;
+            END $$;
+        """)
+        
         logger.info("Knowledge states table setup completed successfully")
         return True
     except Exception as e:
@@ -109,7 +126,7 @@ async def setup_learning_attempts_table():
             CREATE TABLE IF NOT EXISTS learning_attempts (
                 id UUID DEFAULT uuid_generate_v4() PRIMARY KEY,
                 user_id TEXT REFERENCES auth.users(id) NOT NULL,
-                attempt_type TEXT NOT NULL CHECK (attempt_type IN ('quiz', 'concept_detective')),
+                attempt_type TEXT NOT NULL CHECK (attempt_type IN ('quiz', 'quiz_answer', 'concept_detective', 'llm_quiz')),
                 content_id TEXT NOT NULL,
                 score FLOAT NOT NULL,
                 time_taken FLOAT NOT NULL,
@@ -124,6 +141,18 @@ async def setup_learning_attempts_table():
             CREATE INDEX IF NOT EXISTS idx_learning_attempts_user_id ON learning_attempts(user_id);
             CREATE INDEX IF NOT EXISTS idx_learning_attempts_type ON learning_attempts(attempt_type);
             CREATE INDEX IF NOT EXISTS idx_learning_attempts_timestamp ON learning_attempts(timestamp);
+            CREATE INDEX IF NOT EXISTS idx_learning_attempts_user_time ON learning_attempts(user_id, timestamp, id);
+            CREATE INDEX IF NOT EXISTS idx_learning_attempts_time_id ON learning_attempts(timestamp, id);
+        """)
+        
+        # Tables created before quiz answers and LLM-judged answers got their own attempt
+        # types reject them, and hold per-answer rows typed as whole quizzes
+        await supabase.table('learning_attempts').execute("""
+            ALTER TABLE learning_attempts DROP CONSTRAINT IF EXISTS learning_attempts_attempt_type_check;
+            ALTER TABLE learning_attempts ADD CONSTRAINT learning_attempts_attempt_type_check
+                CHECK (attempt_type IN ('quiz', 'quiz_answer', 'concept_detective', 'llm_quiz'));
+            UPDATE learning_attempts SET attempt_type = 'quiz_answer'
+                WHERE attempt_type = 'quiz' AND metadata ? 'topic_id';
         """)
         
         logger.info("Learning attempts table setup completed successfully")
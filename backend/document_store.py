@@ -0,0 +1,135 @@
+import asyncio
+import json
+import logging
+import os
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentPageStore:
+    """
+    Size-bounded in-memory store of extracted document pages keyed by document id.
+
+    Endpoints return references into this store instead of the full document
+    text, and clients fetch the raw pages they need page range by page range.
+    """
+
+    def __init__(self, max_documents: int = 128):
+        self.max_documents = max_documents
+        self._documents: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def create(self, document_id: str, filename: str, page_count: int):
+        self._documents[document_id] = {
+            "filename": filename,
+            "page_count": page_count,
+            "pages": {}
+        }
+        self._documents.move_to_end(document_id)
+        while len(self._documents) > self.max_documents:
+            self._documents.popitem(last=False)
+
+    def add_pages(self, document_id: str, pages: List[Dict[str, Any]]):
+        document = self._documents.get(document_id)
+        if document is not None:
+            for page in pages:
+                document["pages"][page["page"]] = page["text"]
+
+    def get(self, document_id: str) -> Optional[Dict[str, Any]]:
+        document = self._documents.get(document_id)
+        if document is not None:
+            self._documents.move_to_end(document_id)
+        return document
+
+    def get_pages(self, document_id: str, start: int, end: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Returns the extracted pages start..end (1-based, inclusive) that are available so far
+        """
+        document = self.get(document_id)
+        if document is None:
+            return None
+        return [
+            {"page": number, "text": document["pages"][number]}
+            for number in range(max(1, start), min(end, document["page_count"]) + 1)
+            if number in document["pages"]
+        ]
+
+
+class DocumentArtifactCache:
+    """
+    Processing artifacts of uploaded documents keyed by the SHA-256 of their bytes.
+
+    A record holds whatever has been produced for the document so far: the
+    extracted pages, chunks, embeddings, summary, section summaries and quiz.
+    Re-uploading a known document skips extraction and the LLM calls. Records
+    live in a size-bounded LRU and, when persist_dir is set, as JSON files that
+    survive restarts.
+    """
+
+    def __init__(self, max_documents: int = 128, persist_dir: Optional[str] = None):
+        self.max_documents = max_documents
+        self.persist_dir = persist_dir
+        self._records: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.stats = {"hits": 0, "persistent_hits": 0, "misses": 0}
+        if persist_dir:
+            os.makedirs(persist_dir, exist_ok=True)
+
+    def _path_for(self, content_hash: str) -> str:
+        return os.path.join(self.persist_dir, f"{content_hash}.json")
+
+    def _remember(self, content_hash: str, record: Dict[str, Any]):
+        self._records[content_hash] = record
+        self._records.move_to_end(content_hash)
+        while len(self._records) > self.max_documents:
+            self._records.popitem(last=False)
+
+    def _read_persistent(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path_for(content_hash), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable document cache entry {content_hash}: {e}")
+            return None
+
+    def _write_persistent(self, content_hash: str, record: Dict[str, Any]):
+        path = self._path_for(content_hash)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(record, f)
+            os.replace(temp_path, path)
+        except Exception as e:
+            logger.warning(f"Could not persist document cache entry {content_hash}: {e}")
+
+    async def get(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        record = self._records.get(content_hash)
+        if record is not None:
+            self._records.move_to_end(content_hash)
+            self.stats["hits"] += 1
+            return record
+
+        if self.persist_dir:
+            record = await asyncio.to_thread(self._read_persistent, content_hash)
+            if record is not None:
+                self._remember(content_hash, record)
+                self.stats["persistent_hits"] += 1
+                return record
+
+        self.stats["misses"] += 1
+        return None
+
+    async def update(self, content_hash: str, **artifacts):
+        """
+        Merges new artifacts into the document's record
+        """
+        record = dict(self._records.get(content_hash) or {})
+        if artifacts.get("embeddings") is not None:
+            # get_embeddings returns numpy vectors, records are kept JSON-serializable
+            artifacts["embeddings"] = [[float(x) for x in vector] for vector in artifacts["embeddings"]]
+        record.update(artifacts)
+        self._remember(content_hash, record)
+        if self.persist_dir:
+            await asyncio.to_thread(self._write_persistent, content_hash, record)
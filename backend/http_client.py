@@ -0,0 +1,120 @@
+import logging
+import os
+from typing import Any, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401  HTTP/2 support for httpx is optional
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Timeouts per outbound route, in seconds
+ROUTE_TIMEOUTS = {
+    "default": httpx.Timeout(15.0, connect=5.0),
+    "captions": httpx.Timeout(30.0, connect=5.0),
+    "elevenlabs": httpx.Timeout(10.0, connect=5.0),
+    "supabase_auth": httpx.Timeout(10.0, connect=5.0),
+}
+
+
+class SharedHTTPClient:
+    """
+    Application-scoped async HTTP client for all outbound provider calls.
+
+    One connection pool with keep-alive is shared by every request so TLS
+    handshakes are paid once per host instead of once per call. Connection
+    setup is counted through httpcore trace events to show how well
+    connections are being reused.
+    """
+
+    def __init__(self, max_connections: int = 100, max_keepalive_connections: int = 20,
+                 keepalive_expiry: float = 30.0, http2: bool = False):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = http2 and HTTP2_AVAILABLE
+        if http2 and not HTTP2_AVAILABLE:
+            logger.warning("HTTP/2 requested but the h2 package is not installed, using HTTP/1.1")
+        self._client: Optional[httpx.AsyncClient] = None
+        self.metrics = {
+            "requests": 0,
+            "tcp_connects": 0,
+            "tls_handshakes": 0,
+            "errors": 0,
+        }
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self.start()
+        return self._client
+
+    def start(self):
+        """
+        Opens the connection pool, called from the app lifespan
+        """
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                limits=self.limits,
+                http2=self.http2,
+                timeout=ROUTE_TIMEOUTS["default"],
+            )
+
+    async def aclose(self):
+        """
+        Closes every pooled connection, called on shutdown
+        """
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _trace(self, event_name: str, info: Dict[str, Any]):
+        if event_name == "connection.connect_tcp.complete":
+            self.metrics["tcp_connects"] += 1
+        elif event_name == "connection.start_tls.complete":
+            self.metrics["tls_handshakes"] += 1
+
+    async def request(self, method: str, url: str, route: str = "default", **kwargs) -> httpx.Response:
+        """
+        Sends a request through the shared pool using the timeout configured for the route
+        """
+        kwargs.setdefault("timeout", ROUTE_TIMEOUTS.get(route, ROUTE_TIMEOUTS["default"]))
+        extensions = kwargs.pop("extensions", {})
+        extensions.setdefault("trace", self._trace)
+        self.metrics["requests"] += 1
+        try:
+            return await self.client.request(method, url, extensions=extensions, **kwargs)
+        except httpx.HTTPError:
+            self.metrics["errors"] += 1
+            raise
+
+    async def get(self, url: str, route: str = "default", **kwargs) -> httpx.Response:
+        return await self.request("GET", url, route=route, **kwargs)
+
+    async def post(self, url: str, route: str = "default", **kwargs) -> httpx.Response:
+        return await self.request("POST", url, route=route, **kwargs)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Returns the request counters and the share of requests that reused a connection
+        """
+        requests = self.metrics["requests"]
+        reused = max(0, requests - self.metrics["tcp_connects"])
+        return {
+            **self.metrics,
+            "http2": self.http2,
+            "connection_reuse_rate": reused / requests if requests else 0.0,
+        }
+
+
+http_client = SharedHTTPClient(
+    max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+    max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", "20")),
+    http2=os.getenv("HTTP2_ENABLED", "true").lower() == "true",
+)
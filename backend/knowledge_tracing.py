@@ -0,0 +1,221 @@
+import os
+import re
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+MASTERY_THRESHOLD = 0.95  # a topic counts as mastered (a strength) from here
+STRUGGLING_THRESHOLD = 0.4  # below this after MIN_EVIDENCE attempts it needs work
+MIN_EVIDENCE = 3
+
+_TOPIC_WORD_RE = re.compile(r'[a-z0-9]{4,}')
+
+
+class BKTParams(NamedTuple):
+    """
+    Bayesian Knowledge Tracing parameters, shared by every topic
+    """
+    p_init: float = 0.2  # P(L0), mastery before the first attempt
+    p_learn: float = 0.15  # P(T), chance of learning the topic at each attempt
+    p_slip: float = 0.1  # P(S), wrong answer despite mastery
+    p_guess: float = 0.2  # P(G), right answer without mastery
+
+
+DEFAULT_BKT = BKTParams(
+    p_init=float(os.getenv("BKT_P_INIT", "0.2")),
+    p_learn=float(os.getenv("BKT_P_LEARN", "0.15")),
+    p_slip=float(os.getenv("BKT_P_SLIP", "0.1")),
+    p_guess=float(os.getenv("BKT_P_GUESS", "0.2")),
+)
+
+
+def bkt_update(mastery, correct, params: BKTParams = DEFAULT_BKT):
+    """
+    One BKT step: the posterior mastery after observing an attempt, followed by the
+    learning transition. correct is 1/0, or a score in [0, 1] taken as soft evidence.
+    Only arithmetic, so it works on floats and element-wise on NumPy arrays alike.
+    """
+    slip, guess = params.p_slip, params.p_guess
+    right = mastery * (1 - slip)
+    right_posterior = right / (right + (1 - mastery) * guess)
+    wrong = mastery * slip
+    wrong_posterior = wrong / (wrong + (1 - mastery) * (1 - guess))
+    posterior = correct * right_posterior + (1 - correct) * wrong_posterior
+    return posterior + (1 - posterior) * params.p_learn
+
+
+def trace_stream(keys: np.ndarray, correct: np.ndarray, mastery: np.ndarray,
+                 params: BKTParams = DEFAULT_BKT) -> np.ndarray:
+    """
+    Runs a whole attempt stream through BKT in one pass and returns the final mastery.
+
+    keys[i] is the trace (a topic, or a (student, topic) pair) attempt i belongs to,
+    attempts being in time order; mastery holds the starting mastery of every trace
+    and is updated in place. The recurrence is sequential within a trace only, so
+    step r of every trace is applied at once: the loop runs once per attempt depth,
+    each iteration a vectorized update over all traces that have an r-th attempt.
+    """
+    if len(keys) == 0:
+        return mastery
+    order = np.argsort(keys, kind='stable')
+    keys, correct = keys[order], correct[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    depth = np.arange(len(keys)) - np.repeat(starts, np.diff(np.r_[starts, len(keys)]))
+
+    by_depth = np.argsort(depth, kind='stable')
+    bounds = np.r_[0, np.cumsum(np.bincount(depth))]
+    for step in range(len(bounds) - 1):
+        index = by_depth[bounds[step]:bounds[step + 1]]
+        traces = keys[index]
+        mastery[traces] = bkt_update(mastery[traces], correct[index], params)
+    return mastery
+
+
+class KnowledgeTracer:
+    """
+    Per-topic mastery kept as {topic_id: [mastery, attempts]}, the shape
+    KnowledgeState.topics is stored in.
+
+    observe() is the O(1) incremental update for a single new attempt;
+    observe_many() and trace_cohort() replay whole attempt streams through
+    trace_stream.
+    """
+
+    def __init__(self, params: BKTParams = DEFAULT_BKT):
+        self.params = params
+
+    def observe(self, topics: Dict[str, List[float]], topic_id: str, correct: float) -> float:
+        mastery, attempts = topics.get(topic_id, (self.params.p_init, 0))
+        mastery = bkt_update(mastery, correct, self.params)
+        topics[topic_id] = [mastery, attempts + 1]
+        return mastery
+
+    def observe_many(self, topics: Dict[str, List[float]],
+                     observations: Sequence[Tuple[str, float]]) -> Dict[str, List[float]]:
+        """
+        Applies a student's attempts, oldest first, in one vectorized pass
+        """
+        if not observations:
+            return topics
+        topic_ids, keys = _factorize([topic_id for topic_id, _ in observations])
+        correct = np.fromiter((c for _, c in observations), dtype=np.float64, count=len(observations))
+        start = np.array([topics.get(topic_id, (self.params.p_init, 0))[0] for topic_id in topic_ids])
+        mastery = trace_stream(keys, correct, start, self.params).tolist()
+        counts = np.bincount(keys, minlength=len(topic_ids)).tolist()
+        for index, topic_id in enumerate(topic_ids):
+            topics[topic_id] = [mastery[index], topics.get(topic_id, (0.0, 0))[1] + counts[index]]
+        return topics
+
+    def trace_cohort(self, user_ids: Sequence[str], topic_ids: Sequence[str],
+                     correct: Iterable[float]) -> Dict[str, Dict[str, List[float]]]:
+        """
+        Mastery of every (student, topic) from historical attempts in time order,
+        starting from p_init
+        """
+        users, user_codes = _factorize(user_ids)
+        topics, topic_codes = _factorize(topic_ids)
+        pairs, keys = np.unique(user_codes * len(topics) + topic_codes, return_inverse=True)
+        correct = np.fromiter(correct, dtype=np.float64, count=len(keys))
+        mastery = trace_stream(keys, correct, np.full(len(pairs), self.params.p_init), self.params).tolist()
+        counts = np.bincount(keys, minlength=len(pairs)).tolist()
+        pair_users, pair_topics = np.divmod(pairs, len(topics))
+        states: Dict[str, Dict[str, List[float]]] = {}
+        for index, (user, topic) in enumerate(zip(pair_users.tolist(), pair_topics.tolist())):
+            states.setdefault(users[user], {})[topics[topic]] = [mastery[index], counts[index]]
+        return states
+
+
+def _factorize(values: Sequence[str]) -> Tuple[List[str], np.ndarray]:
+    """
+    Distinct values in first-seen order and the code of every value
+    """
+    codes: Dict[str, int] = {}
+    indices = np.fromiter((codes.setdefault(value, len(codes)) for value in values), dtype=np.int64, count=len(values))
+    return list(codes), indices
+
+
+def summarize_topics(topics: Dict[str, List[float]]) -> Tuple[List[str], List[str]]:
+    """
+    Mastered topics and topics still below STRUGGLING_THRESHOLD after MIN_EVIDENCE attempts
+    """
+    strengths = [topic_id for topic_id, (mastery, _) in topics.items() if mastery >= MASTERY_THRESHOLD]
+    struggling = [topic_id for topic_id, (mastery, attempts) in topics.items()
+                  if mastery < STRUGGLING_THRESHOLD and attempts >= MIN_EVIDENCE]
+    return strengths, struggling
+
+
+def topic_id(source_id: str, chunk_index: int) -> str:
+    """
+    A topic is one retrieval chunk of a transcript or document
+    """
+    return f"{source_id}:{chunk_index}"
+
+
+class TopicMatcher:
+    """
+    Maps question text to the transcript chunk it is about by word overlap, weighting
+    words by how few chunks they appear in
+    """
+
+    def __init__(self, source_id: str, chunks: List[Dict[str, Any]]):
+        self.source_id = source_id
+        self._chunk_words = [set(_TOPIC_WORD_RE.findall(chunk["text"].lower())) for chunk in chunks]
+        document_frequency: Dict[str, int] = {}
+        for words in self._chunk_words:
+            for word in words:
+                document_frequency[word] = document_frequency.get(word, 0) + 1
+        total = len(chunks)
+        self._idf = {word: np.log(1 + total / count) for word, count in document_frequency.items()}
+
+    def match(self, text: str) -> Optional[str]:
+        words = set(_TOPIC_WORD_RE.findall(text.lower())) & self._idf.keys()
+        if not words:
+            return None
+        scores = [sum(self._idf[word] for word in words & chunk_words) for chunk_words in self._chunk_words]
+        best = int(np.argmax(scores))
+        return topic_id(self.source_id, best) if scores[best] > 0 else None
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    params = DEFAULT_BKT
+    rng = random.Random(5)
+    tracer = KnowledgeTracer(params)
+
+    # One student's stream: the vectorized pass matches applying observe() attempt by attempt
+    observations = [(f"video:{rng.randrange(40)}", rng.choice([0.0, 1.0, 0.5])) for _ in range(2000)]
+    incremental: Dict[str, List[float]] = {}
+    for topic, correct in observations:
+        tracer.observe(incremental, topic, correct)
+    bulk = tracer.observe_many({}, observations)
+    worst = max(abs(bulk[topic][0] - incremental[topic][0]) for topic in incremental)
+    assert worst < 1e-12 and all(bulk[t][1] == incremental[t][1] for t in incremental)
+    print(f"observe_many matches observe, max abs difference {worst:.1e}")
+
+    # Inline cost of a single quiz answer
+    topics = dict(incremental)
+    started = time.perf_counter()
+    for i in range(100000):
+        tracer.observe(topics, f"video:{i % 40}", i % 2)
+    print(f"observe: {(time.perf_counter() - started) / 100000 * 1e6:.2f} us per attempt")
+
+    # Bulk historical replay
+    students, per_student = 20000, 50
+    user_ids = [f"user-{rng.randrange(students)}" for _ in range(students * per_student)]
+    topic_ids = [f"video:{rng.randrange(30)}" for _ in user_ids]
+    correct = [float(rng.random() < 0.6) for _ in user_ids]
+    started = time.perf_counter()
+    states = tracer.trace_cohort(user_ids, topic_ids, correct)
+    bulk_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    reference: Dict[str, Dict[str, List[float]]] = {}
+    for user_id, topic, c in zip(user_ids, topic_ids, correct):
+        tracer.observe(reference.setdefault(user_id, {}), topic, c)
+    loop_seconds = time.perf_counter() - started
+    worst = max(abs(states[u][t][0] - reference[u][t][0]) for u in reference for t in reference[u])
+    assert worst < 1e-12, worst
+    print(f"{len(user_ids)} historical attempts: trace_cohort {bulk_seconds:.2f}s "
+          f"({len(user_ids) / bulk_seconds / 1e6:.1f}M attempts/s), per-attempt loop {loop_seconds:.2f}s")
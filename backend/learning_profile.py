@@ -0,0 +1,231 @@
+import time
+from array import array
+from collections.abc import MutableMapping
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional
+
+from score_stats import new_score_stats
+
+# Every float field of a profile, in storage order
+PROFILE_LAYOUT = (
+    ('perceptual_mode', ('visual', 'auditory', 'reading_writing', 'kinesthetic')),
+    ('cognitive_style', ('global', 'analytical')),
+    ('social_preference', ('independent', 'collaborative')),
+    ('instruction_style', ('direct', 'constructivist', 'inquiry_based', 'project_based')),
+    ('assessment_preference', ('formative', 'summative', 'performance')),
+    ('cognitive_metrics', ('beginner_level', 'intermediate_level', 'advanced_level',
+                           'total_quizzes_taken', 'overall_progress')),
+    ('behavioral_metrics', ('average_time_per_quiz',  # in minutes
+                            'average_time_per_concept',  # in minutes
+                            'total_learning_time',  # in minutes
+                            'session_completion_rate',  # share of started sessions completed
+                            'engagement_score')),
+    ('learning_metrics', ('completion_rate', 'time_to_learn', 'engagement_score')),
+)
+# cognitive_metrics entries that are not floats: running score aggregates, full history is in learning_attempts
+SCORE_STATS_FIELDS = ('quiz_score_stats', 'concept_detective_score_stats')
+INTEGER_FIELDS = frozenset({'total_quizzes_taken'})
+
+# Style name -> the style dimension it belongs to
+STYLE_DIMENSIONS = {key: dimension for dimension, keys in PROFILE_LAYOUT[:5] for key in keys}
+
+_DIMENSION_INDEX: Dict[str, Dict[str, int]] = {}
+_offset = 0
+for _dimension, _keys in PROFILE_LAYOUT:
+    _DIMENSION_INDEX[_dimension] = {key: _offset + i for i, key in enumerate(_keys)}
+    _offset += len(_keys)
+_LAST_UPDATED = _offset  # seconds since the epoch
+_VALUE_COUNT = _offset + 1
+_ZEROS = bytes(8 * _VALUE_COUNT)
+
+
+class MetricView(MutableMapping):
+    """
+    Dict-like view of one profile dimension over the profile's float array.
+    Keys are fixed by PROFILE_LAYOUT; extra holds the non-float entries of
+    cognitive_metrics.
+    """
+
+    __slots__ = ('_values', '_index', '_extra')
+
+    def __init__(self, values: array, index: Dict[str, int], extra: Optional[Dict[str, Any]] = None):
+        self._values = values
+        self._index = index
+        self._extra = extra
+
+    def __getitem__(self, key: str):
+        index = self._index.get(key)
+        if index is None:
+            if self._extra is None:
+                raise KeyError(key)
+            return self._extra[key]
+        value = self._values[index]
+        return int(value) if key in INTEGER_FIELDS else value
+
+    def __setitem__(self, key: str, value):
+        index = self._index.get(key)
+        if index is not None:
+            self._values[index] = value
+        elif self._extra is not None:
+            self._extra[key] = value
+        else:
+            raise KeyError(key)
+
+    def __delitem__(self, key: str):
+        raise TypeError("profile fields cannot be removed")
+
+    def __contains__(self, key) -> bool:
+        return key in self._index or (self._extra is not None and key in self._extra)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._index
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return len(self._index) + (len(self._extra) if self._extra is not None else 0)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+    def copy(self) -> Dict[str, Any]:
+        return dict(self)
+
+
+def _dimension_property(dimension: str) -> property:
+    index = _DIMENSION_INDEX[dimension]
+    has_extra = dimension == 'cognitive_metrics'
+
+    def get(self) -> MetricView:
+        return MetricView(self._values, index, self._stats if has_extra else None)
+
+    def set(self, values: Dict[str, Any]):
+        # Known fields are copied in, anything a newer or older row adds is ignored
+        for key, value in values.items():
+            if key in index:
+                self._values[index[key]] = value
+            elif has_extra and key in SCORE_STATS_FIELDS:
+                self._stats[key] = value
+
+    return property(get, set)
+
+
+class LearningStyleProfile:
+    """
+    A student's learning styles and metrics in one flat float array.
+
+    Each dimension (perceptual_mode, cognitive_metrics, ...) is read and
+    written through a MetricView, so profile.perceptual_mode['visual'] works
+    as with a dict; assigning a dict to a dimension copies its known fields
+    in. The score aggregates of cognitive_metrics are kept as score_stats
+    dicts beside the array.
+    """
+
+    __slots__ = ('_values', '_stats')
+
+    def __init__(self):
+        self._values = array('d', _ZEROS)
+        self._values[_LAST_UPDATED] = time.time()
+        self._stats = {name: new_score_stats() for name in SCORE_STATS_FIELDS}
+
+    @property
+    def last_updated(self) -> datetime:
+        return datetime.fromtimestamp(self._values[_LAST_UPDATED])
+
+    @last_updated.setter
+    def last_updated(self, value: datetime):
+        self._values[_LAST_UPDATED] = value.timestamp()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        The profile as plain dicts, in the shape of a student_profiles row without user_id
+        """
+        values = self._values
+        data: Dict[str, Any] = {dimension: {key: values[i] for key, i in index.items()}
+                                for dimension, index in _DIMENSION_INDEX.items()}
+        cognitive_metrics = data['cognitive_metrics']
+        for key in INTEGER_FIELDS:
+            cognitive_metrics[key] = int(cognitive_metrics[key])
+        cognitive_metrics.update(self._stats)
+        data['last_updated'] = self.last_updated.isoformat()
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'LearningStyleProfile':
+        profile = cls()
+        for dimension, _ in PROFILE_LAYOUT:
+            if data.get(dimension):
+                setattr(profile, dimension, data[dimension])
+        if data.get('last_updated'):
+            profile.last_updated = datetime.fromisoformat(data['last_updated'])
+        return profile
+
+
+for _dimension, _ in PROFILE_LAYOUT:
+    setattr(LearningStyleProfile, _dimension, _dimension_property(_dimension))
+
+
+if __name__ == "__main__":
+    import gc
+    import json
+    import random
+    import tracemalloc
+
+    from benchmark_baselines import LegacyLearningStyleProfile
+    from score_stats import add_score
+
+    rng = random.Random(9)
+    count = 20000
+
+    def fill(profile):
+        for dimension, keys in PROFILE_LAYOUT:
+            values = getattr(profile, dimension)
+            for key in keys:
+                values[key] = rng.random()
+        profile.cognitive_metrics['total_quizzes_taken'] = rng.randrange(100)
+        for name in SCORE_STATS_FIELDS:
+            for _ in range(rng.randrange(30)):
+                add_score(profile.cognitive_metrics[name], rng.uniform(0, 100))
+        return profile
+
+    def legacy_to_dict(profile) -> Dict[str, Any]:
+        data = {dimension: getattr(profile, dimension) for dimension, _ in PROFILE_LAYOUT}
+        data['last_updated'] = profile.last_updated.isoformat()
+        return data
+
+    def legacy_from_dict(data) -> LegacyLearningStyleProfile:
+        profile = LegacyLearningStyleProfile()
+        for dimension, _ in PROFILE_LAYOUT:
+            setattr(profile, dimension, data[dimension])
+        profile.last_updated = datetime.fromisoformat(data['last_updated'])
+        return profile
+
+    def measure(factory):
+        gc.collect()
+        tracemalloc.start()
+        objects = [fill(factory()) for _ in range(count)]
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return objects, size
+
+    legacy, legacy_bytes = measure(LegacyLearningStyleProfile)
+    compact, compact_bytes = measure(LearningStyleProfile)
+    print(f"{count} cached profiles: dicts {legacy_bytes / count:.0f} B/profile, "
+          f"compact {compact_bytes / count:.0f} B/profile ({legacy_bytes / compact_bytes:.1f}x smaller)")
+
+    # Round trips are lossless
+    for profile in compact[:500]:
+        assert LearningStyleProfile.from_dict(json.loads(json.dumps(profile.to_dict()))).to_dict() == profile.to_dict()
+
+    def timed(label, fn, items):
+        started = time.perf_counter()
+        result = [fn(item) for item in items]
+        seconds = time.perf_counter() - started
+        print(f"  {label:<28} {seconds / len(items) * 1e6:7.1f} us/profile")
+        return result
+
+    print("serialization:")
+    legacy_json = timed("dicts -> JSON", lambda p: json.dumps(legacy_to_dict(p)), legacy)
+    timed("JSON -> dicts", lambda s: legacy_from_dict(json.loads(s)), legacy_json)
+    compact_json = timed("compact -> JSON", lambda p: json.dumps(p.to_dict()), compact)
+    timed("JSON -> compact", lambda s: LearningStyleProfile.from_dict(json.loads(s)), compact_json)
@@ -3,18 +3,48 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional, List
 import json
+import asyncio
 from groq import Groq
 import os
-import yt_dlp
-import fitz  # PyMuPDF for PDF processing
 from dotenv import load_dotenv
 from youtube_transcript_api import YouTubeTranscriptApi
 import re
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from auth import router as auth_router, signup_user, login_user
+from caption_parser import parse_captions
+from transcript_cache import transcript_cache
+from ytdlp_pool import ytdlp_pool
+from provider_race import ProviderRacer
+from http_client import http_client
+from video_metadata import video_metadata_cache
+from pdf_extraction import pdf_extractor, join_pages
+from uploads import (
+    save_upload,
+    check_pdf_pages,
+    configure_spooling,
+    temp_upload_path,
+    upload_metrics,
+    UploadLimitMiddleware,
+    MAX_PDF_BYTES,
+    MULTIPART_OVERHEAD,
+)
+from contextlib import asynccontextmanager
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    http_client.start()
+    yield
+    await video_metadata_cache.aclose()
+    await http_client.aclose()
+    ytdlp_pool.shutdown()
+    pdf_extractor.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
-app = FastAPI()
+# Reject oversized uploads while they stream in, before they are spooled
+configure_spooling()
+app.add_middleware(UploadLimitMiddleware, limits={"/upload/pdf": MAX_PDF_BYTES + MULTIPART_OVERHEAD})
 
 # Configure CORS
 app.add_middleware(
@@ -35,6 +65,9 @@ groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
 # Add this with your other environment variables
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
 
+# Ranks the caption providers by observed latency and success rate
+caption_racer = ProviderRacer(hedge_delay=float(os.getenv("CAPTION_HEDGE_DELAY", "1.5")))
+
 print("")
 
 class ChatMessage(BaseModel):
@@ -68,66 +101,99 @@ class AuthRequest(BaseModel):
     email: str
     password: str
 
+class VideoInfoBatchRequest(BaseModel):
+    video_ids: List[str]
+
+def fetch_with_transcript_api(video_id: str) -> str:
+    """
+    Fetches caption text with YouTubeTranscriptApi
+    """
+    transcript = YouTubeTranscriptApi.get_transcript(video_id)
+    return " ".join([entry['text'] for entry in transcript])
+
+async def fetch_with_ytdlp(video_id: str) -> str:
+    """
+    Fetches caption text by resolving the caption track with yt-dlp
+    """
+    info = await ytdlp_pool.extract_info(
+        f"https://www.youtube.com/watch?v={video_id}",
+        fields=("subtitles", "automatic_captions")
+    )
+    tracks = (info.get('subtitles') or {}).get('en') or (info.get('automatic_captions') or {}).get('en')
+    vtt_tracks = [track for track in tracks or [] if track.get('ext') == 'vtt']
+    if not vtt_tracks:
+        raise HTTPException(status_code=400, detail="No subtitles found")
+
+    response = await http_client.get(vtt_tracks[-1]['url'], route="captions")
+    response.raise_for_status()
+    return parse_captions(response.text)["full_transcript"]
+
+def fetch_with_data_api(video_id: str) -> str:
+    """
+    Fetches caption text through the YouTube Data API
+    """
+    try:
+        youtube = build('youtube', 'v3', developerKey=YOUTUBE_API_KEY)
+        
+        # Get captions track
+        captions_response = youtube.captions().list(
+            part='snippet',
+            videoId=video_id
+        ).execute()
+        
+        if not captions_response.get('items'):
+            raise HTTPException(
+                status_code=400,
+                detail="No captions available for this video"
+            )
+        
+        # Get the first English caption track or default to the first available
+        caption_id = None
+        for item in captions_response['items']:
+            if item['snippet']['language'] == 'en':
+                caption_id = item['id']
+                break
+        if not caption_id:
+            caption_id = captions_response['items'][0]['id']
+        
+        # Download the caption track
+        caption = youtube.captions().download(
+            id=caption_id,
+            tfmt='srt'
+        ).execute()
+        
+        # Convert caption to text (remove timecodes and formatting)
+        return parse_captions(caption.decode('utf-8'))["full_transcript"]
+        
+    except HttpError as api_error:
+        raise HTTPException(
+            status_code=400,
+            detail=f"YouTube API error: {str(api_error)}"
+        )
+
+async def fetch_caption_text(video_id: str) -> str:
+    """
+    Fetches the plain caption text of a video by racing YouTubeTranscriptApi,
+    yt-dlp and the YouTube Data API. The fallbacks start after a short hedge
+    delay, or as soon as a running provider fails.
+    """
+    _, full_text = await caption_racer.race([
+        ("transcript_api", lambda: asyncio.to_thread(fetch_with_transcript_api, video_id)),
+        ("yt_dlp", lambda: fetch_with_ytdlp(video_id)),
+        ("data_api", lambda: asyncio.to_thread(fetch_with_data_api, video_id)),
+    ])
+    return full_text
+
 @app.get("/fetch-transcript-video/{video_id}/{input}", response_model=TranscriptResponse)
 async def fetch_transcript(video_id: str, input: str):
     try:
-        # First try YouTubeTranscriptApi
-        try:
-            transcript = YouTubeTranscriptApi.get_transcript(video_id)
-            full_text = " ".join([entry['text'] for entry in transcript])
-        except Exception as transcript_error:
-            try:
-                # Fallback to yt-dlp
-                with yt_dlp.YoutubeDL() as ydl:
-                    info = ydl.extract_info(f"https://www.youtube.com/watch?v={video_id}", download=False)
-                    if info.get('subtitles'):
-                        full_text = info['subtitles'].get('en', [{}])[0].get('text', '')
-                    else:
-                        raise HTTPException(status_code=400, detail="No subtitles found")
-            except Exception as ydl_error:
-                # Final fallback to YouTube Data API
-                youtube = build('youtube', 'v3', developerKey=YOUTUBE_API_KEY)
-                
-                # Get captions track
-                captions_response = youtube.captions().list(
-                    part='snippet',
-                    videoId=video_id
-                ).execute()
-                
-                if not captions_response.get('items'):
-                    raise HTTPException(
-                        status_code=400,
-                        detail="No captions available for this video"
-                    )
-                
-                # Get the first English caption track or default to the first available
-                caption_id = None
-                for item in captions_response['items']:
-                    if item['snippet']['language'] == 'en':
-                        caption_id = item['id']
-                        break
-                if not caption_id:
-                    caption_id = captions_response['items'][0]['id']
-                
-                # Download the caption track
-                caption = youtube.captions().download(
-                    id=caption_id,
-                    tfmt='srt'
-                ).execute()
-                
-                # Convert caption to text (remove timecodes and formatting)
-                full_text = ' '.join(
-                    line for line in caption.decode('utf-8').split('\n')
-                    if not line.strip().isdigit() and 
-                    not '-->' in line and 
-                    line.strip()
-                )
-                
-            except HttpError as api_error:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"YouTube API error: {str(api_error)}"
-                )
+        async def fetch_from_providers():
+            full_text = await fetch_caption_text(video_id)
+            return {"full_transcript": full_text}
+
+        # Popular videos are fetched from the providers once per cache TTL, not once per student
+        cached = await transcript_cache.get_or_fetch(video_id, "en", fetch_from_providers)
+        full_text = cached.get("full_transcript", "")
 
         if input == "":       
             prompt = f"Modify the following text to a markdown format: {full_text}"
@@ -193,26 +259,34 @@ async def chat_endpoint(chat_message: ChatMessage):
 
 @app.post("/upload/pdf")
 async def upload_pdf(file: UploadFile = File(...)):
+    # Stream the PDF to a unique temp file, never holding the whole upload in memory
+    pdf_path = temp_upload_path(".pdf")
     try:
-        # Save PDF temporarily
-        content = await file.read()
-        pdf_path = f"temp_{file.filename}"
-        with open(pdf_path, "wb") as f:
-            f.write(content)
-        
-        # Extract text from PDF
-        doc = fitz.open(pdf_path)
-        text = ""
-        for page in doc:
-            text += page.get_text()
-        
-        # Clean up
-        doc.close()
-        os.remove(pdf_path)
+        with upload_metrics.track("/upload/pdf") as report:
+            upload = await save_upload(file, pdf_path, max_bytes=MAX_PDF_BYTES)
+            report["bytes"] = upload["size"]
+            
+            # Extract text from PDF once the page count is known to be within limits
+            page_count = await check_pdf_pages(pdf_path)
+            pages = await pdf_extractor.extract_pages(pdf_path, page_count)
+            text = join_pages(pages)
         
         return {"content": text}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        # Clean up
+        if os.path.exists(pdf_path):
+            os.remove(pdf_path)
+
+@app.get("/upload-stats")
+async def get_upload_stats():
+    """
+    Upload counters, limit rejections and the memory footprint of recent uploads
+    """
+    return upload_metrics.snapshot()
 
 
 @app.post("/generate_quiz")
@@ -308,11 +382,23 @@ async def generate_content(request: TopicRequest):
     explanation = explanation_response.choices[0].message.content
     return {"explanation": explanation}
 
+@app.get("/provider-stats")
+async def get_provider_stats():
+    return {"captions": caption_racer.snapshot(), "http": http_client.snapshot()}
+
 @app.get("/video-info/{video_id}")
 async def get_video_info(video_id: str):
-    with yt_dlp.YoutubeDL() as ydl:
-        info = ydl.extract_info(f"https://www.youtube.com/watch?v={video_id}", download=False)
-        return {"title": info.get("title")}
+    try:
+        # Served from the metadata cache, stale entries are refreshed in the background
+        return await video_metadata_cache.get(video_id)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/video-info/batch")
+async def get_video_info_batch(request: VideoInfoBatchRequest):
+    if len(request.video_ids) > 100:
+        raise HTTPException(status_code=400, detail="At most 100 video ids per request")
+    return await video_metadata_cache.get_many(request.video_ids)
 
 @app.post("/signup")
 async def signup_endpoint(auth: AuthRequest):
@@ -0,0 +1,255 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from student_modeling import (
+    LearningStyleProfile,
+    get_student_profile,
+    profile_from_row,
+    profile_to_row,
+    save_student_profiles,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ProfileCache:
+    """
+    Per-user student profiles kept in memory, read-through and write-behind.
+
+    get() loads a profile from Supabase on a miss, sharing the load between
+    concurrent callers. mark_dirty() only records that a profile changed; a
+    background task upserts the dirty profiles in batches every
+    flush_interval seconds, or sooner once max_batch of them are waiting. A
+    profile that changes several times between flushes is written once.
+    Profiles evicted from the LRU while dirty stay queued until flushed, and
+    stop() flushes everything, spilling what Supabase would not take to
+    spill_path so start() can retry it. Every listener is called with
+    (user_id, profile) on mark_dirty().
+    """
+
+    def __init__(self, max_profiles: int = 10000, flush_interval: float = 2.0, max_batch: int = 200,
+                 spill_path: Optional[str] = None):
+        self.max_profiles = max_profiles
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.spill_path = spill_path
+        self._profiles: "OrderedDict[str, LearningStyleProfile]" = OrderedDict()
+        self._dirty: Dict[str, LearningStyleProfile] = {}
+        self._dirty_since: Dict[str, float] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self.listeners: List[Callable[[str, LearningStyleProfile], None]] = []
+        self.metrics = {
+            "hits": 0,
+            "misses": 0,
+            "marked_dirty": 0,
+            "coalesced": 0,
+            "flushes": 0,
+            "profiles_flushed": 0,
+            "flush_errors": 0,
+            "last_batch_size": 0,
+            "max_batch_size": 0,
+            "last_flush_lag": 0.0,
+            "max_flush_lag": 0.0,
+        }
+
+    def _remember(self, user_id: str, profile: LearningStyleProfile):
+        self._profiles[user_id] = profile
+        self._profiles.move_to_end(user_id)
+        while len(self._profiles) > self.max_profiles:
+            evicted, _ = self._profiles.popitem(last=False)
+            if evicted in self._dirty:
+                # Still queued in _dirty; flush it soon rather than holding it for the full interval
+                self._wakeup_flusher()
+
+    def _wakeup_flusher(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def peek(self, user_id: str) -> Optional[LearningStyleProfile]:
+        """
+        Returns the profile only if it is already in memory, never touching Supabase
+        """
+        return self._profiles.get(user_id) or self._dirty.get(user_id)
+
+    async def get(self, user_id: str) -> Optional[LearningStyleProfile]:
+        """
+        Returns the cached profile, loading it from Supabase on a miss
+        """
+        profile = self._profiles.get(user_id) or self._dirty.get(user_id)
+        if profile is not None:
+            self.metrics["hits"] += 1
+            self._remember(user_id, profile)
+            return profile
+
+        self.metrics["misses"] += 1
+        inflight = self._inflight.get(user_id)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[user_id] = future
+        try:
+            profile = await get_student_profile(user_id)
+            # A profile marked dirty during the load is newer than the stored one
+            profile = self._dirty.get(user_id) or profile
+            if profile is not None:
+                self._remember(user_id, profile)
+            future.set_result(profile)
+            return profile
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            del self._inflight[user_id]
+
+    async def get_or_create(self, user_id: str) -> LearningStyleProfile:
+        """
+        Returns the user's profile, or a fresh one that is cached once it is marked dirty
+        """
+        return await self.get(user_id) or LearningStyleProfile()
+
+    def mark_dirty(self, user_id: str, profile: LearningStyleProfile):
+        """
+        Records a changed profile; it is written to Supabase by the next flush
+        """
+        self.metrics["marked_dirty"] += 1
+        if user_id in self._dirty:
+            self.metrics["coalesced"] += 1
+        else:
+            self._dirty_since[user_id] = time.monotonic()
+        self._dirty[user_id] = profile
+        self._remember(user_id, profile)
+        if len(self._dirty) >= self.max_batch:
+            self._wakeup_flusher()
+        for listener in self.listeners:
+            try:
+                listener(user_id, profile)
+            except Exception as e:
+                logger.error(f"Profile listener failed for user {user_id}: {e}")
+
+    async def flush(self) -> bool:
+        """
+        Upserts every dirty profile in batches of max_batch rows, returns False if a batch failed
+        """
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            ok = True
+            while self._dirty and ok:
+                user_ids = list(self._dirty)[:self.max_batch]
+                # Rows are serialized and taken off the dirty set before the await,
+                # so changes made during the upsert mark the profile dirty again
+                rows = [profile_to_row(user_id, self._dirty[user_id]) for user_id in user_ids]
+                batch = {user_id: (self._dirty.pop(user_id), self._dirty_since.pop(user_id)) for user_id in user_ids}
+
+                ok = await save_student_profiles(rows) is not None
+                now = time.monotonic()
+                if not ok:
+                    self.metrics["flush_errors"] += 1
+                    for user_id, (profile, dirty_since) in batch.items():
+                        if user_id not in self._dirty:
+                            self._dirty[user_id] = profile
+                            self._dirty_since[user_id] = dirty_since
+                    break
+
+                lag = now - min(dirty_since for _, dirty_since in batch.values())
+                self.metrics["flushes"] += 1
+                self.metrics["profiles_flushed"] += len(rows)
+                self.metrics["last_batch_size"] = len(rows)
+                self.metrics["max_batch_size"] = max(self.metrics["max_batch_size"], len(rows))
+                self.metrics["last_flush_lag"] = lag
+                self.metrics["max_flush_lag"] = max(self.metrics["max_flush_lag"], lag)
+            return ok
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                self.metrics["flush_errors"] += 1
+                logger.error(f"Profile flush failed: {e}")
+
+    def _read_spill(self) -> List[Dict[str, Any]]:
+        with open(self.spill_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_spill(self, rows: List[Dict[str, Any]]):
+        temp_path = f"{self.spill_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(rows, f)
+        os.replace(temp_path, self.spill_path)
+
+    async def start(self):
+        """
+        Starts the background flusher and requeues profiles spilled at the last shutdown
+        """
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        if self.spill_path and os.path.exists(self.spill_path):
+            try:
+                rows = await asyncio.to_thread(self._read_spill)
+                for row in rows:
+                    self.mark_dirty(row["user_id"], profile_from_row(row))
+                os.remove(self.spill_path)
+                logger.info(f"Requeued {len(rows)} spilled student profiles")
+            except Exception as e:
+                logger.error(f"Could not read spilled student profiles from {self.spill_path}: {e}")
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self, attempts: int = 3):
+        """
+        Stops the flusher and writes out every dirty profile, called on shutdown
+        """
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+
+        for attempt in range(attempts):
+            if await self.flush():
+                return
+            await asyncio.sleep(0.5 * (attempt + 1))
+
+        rows = [profile_to_row(user_id, profile) for user_id, profile in self._dirty.items()]
+        if self.spill_path:
+            await asyncio.to_thread(self._write_spill, rows)
+            logger.warning(f"Spilled {len(rows)} unsaved student profiles to {self.spill_path}")
+        else:
+            logger.error(f"Lost {len(rows)} unsaved student profiles, Supabase rejected the final flush")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Returns the cache and flush metrics, including how long the oldest dirty profile has waited
+        """
+        oldest = min(self._dirty_since.values(), default=None)
+        return {
+            **self.metrics,
+            "cached_profiles": len(self._profiles),
+            "dirty_profiles": len(self._dirty),
+            "oldest_dirty_age": time.monotonic() - oldest if oldest is not None else 0.0,
+        }
+
+
+profile_cache = ProfileCache(
+    max_profiles=int(os.getenv("PROFILE_CACHE_SIZE", "10000")),
+    flush_interval=float(os.getenv("PROFILE_FLUSH_SECONDS", "2.0")),
+    max_batch=int(os.getenv("PROFILE_FLUSH_BATCH", "200")),
+    spill_path=os.getenv("PROFILE_SPILL_PATH", "profile_spill.json") or None,
+)
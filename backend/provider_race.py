@@ -0,0 +1,175 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+
+class ProviderStats:
+    """
+    Running success rate and latency of a single provider
+    """
+
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha  # EWMA smoothing factor for latency
+        self.attempts = 0
+        self.successes = 0
+        self.failures = 0
+        self.cancelled = 0  # lost the race, neither success nor failure
+        self.latency_samples = 0
+        self.latency_ewma = 0.0  # seconds to a result, see observe_latency
+
+    def observe_latency(self, latency: float):
+        """
+        Feeds the latency EWMA with the time to a result of a successful call.
+        Failures are left out so a provider that fails fast does not look fast.
+        """
+        self.latency_samples += 1
+        if self.latency_samples == 1:
+            self.latency_ewma = latency
+        else:
+            self.latency_ewma = self.alpha * latency + (1 - self.alpha) * self.latency_ewma
+
+    def record(self, success: bool, latency: float):
+        if success:
+            self.successes += 1
+            self.observe_latency(latency)
+        else:
+            self.failures += 1
+
+    def record_cancelled(self, latency: float):
+        """
+        A cancelled call only tells its result would have taken longer than
+        latency, so it can raise the estimate but never lower it
+        """
+        self.cancelled += 1
+        if self.latency_samples:
+            self.latency_ewma = max(self.latency_ewma, latency)
+
+    @property
+    def success_rate(self) -> float:
+        # Laplace smoothing so a new provider is neither trusted nor written off
+        return (self.successes + 1) / (self.successes + self.failures + 2)
+
+    def expected_cost(self, default_latency: float) -> float:
+        """
+        Expected seconds spent per successful result, used to rank providers
+        """
+        latency = self.latency_ewma if self.latency_samples else default_latency
+        return latency / self.success_rate
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'attempts': self.attempts,
+            'successes': self.successes,
+            'failures': self.failures,
+            'cancelled': self.cancelled,
+            'success_rate': self.success_rate,
+            'latency_ewma': self.latency_ewma
+        }
+
+
+class ProviderRaceError(Exception):
+    """
+    Raised when every provider in a race failed
+    """
+
+    def __init__(self, errors: Dict[str, BaseException]):
+        self.errors = errors
+        details = "; ".join(f"{name}: {error}" for name, error in errors.items())
+        super().__init__(f"All providers failed ({details})")
+
+
+class ProviderRacer:
+    """
+    Hedged racing over an ordered list of interchangeable providers.
+
+    The best-ranked provider starts first. The next one starts after
+    hedge_delay seconds, or immediately when a running provider fails.
+    The first success wins and the remaining calls are cancelled.
+    Providers are ranked by their observed latency divided by success rate,
+    so the order adapts to how each provider actually behaves.
+    """
+
+    def __init__(self, hedge_delay: float = 1.5, default_latency: float = 2.0):
+        self.hedge_delay = hedge_delay
+        self.default_latency = default_latency
+        self.stats: Dict[str, ProviderStats] = {}
+
+    def _stats_for(self, name: str) -> ProviderStats:
+        if name not in self.stats:
+            self.stats[name] = ProviderStats()
+        return self.stats[name]
+
+    def ranked(self, names: Sequence[str]) -> List[str]:
+        """
+        Orders provider names by expected cost, keeping the given order on ties
+        """
+        return sorted(names, key=lambda name: self._stats_for(name).expected_cost(self.default_latency))
+
+    async def _timed(self, name: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        stats = self._stats_for(name)
+        stats.attempts += 1
+        started = time.perf_counter()
+        try:
+            result = await factory()
+        except asyncio.CancelledError:
+            stats.record_cancelled(time.perf_counter() - started)
+            raise
+        except Exception:
+            stats.record(False, time.perf_counter() - started)
+            raise
+        stats.record(True, time.perf_counter() - started)
+        return result
+
+    async def race(self, providers: Sequence[Tuple[str, Callable[[], Awaitable[Any]]]],
+                   hedge_delay: Optional[float] = None) -> Tuple[str, Any]:
+        """
+        Runs the providers as a hedged race and returns (provider_name, result)
+        of the first success. Raises ProviderRaceError if all of them fail.
+        """
+        factories = dict(providers)
+        order = self.ranked(list(factories))
+        delay = self.hedge_delay if hedge_delay is None else hedge_delay
+
+        pending: Dict[asyncio.Future, str] = {}
+        errors: Dict[str, BaseException] = {}
+        next_index = 0
+
+        def launch_next():
+            nonlocal next_index
+            name = order[next_index]
+            next_index += 1
+            pending[asyncio.ensure_future(self._timed(name, factories[name]))] = name
+
+        launch_next()
+        try:
+            while pending:
+                timeout = delay if next_index < len(order) else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # Hedge: the running providers are slow, start the next one alongside
+                    launch_next()
+                    continue
+
+                failed = False
+                for task in done:
+                    name = pending.pop(task)
+                    if task.exception() is None:
+                        return name, task.result()
+                    errors[name] = task.exception()
+                    failed = True
+
+                # Fast failure: do not wait out the hedge delay
+                if failed and next_index < len(order):
+                    launch_next()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise ProviderRaceError(errors)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns per-provider metrics in the current ranking order
+        """
+        return {name: self.stats[name].to_dict() for name in self.ranked(list(self.stats))}
@@ -0,0 +1,116 @@
+import math
+import os
+from typing import Any, Dict, Iterable, List
+
+RECENT_SCORES = int(os.getenv("RECENT_SCORES", "20"))
+SCORE_EWMA_ALPHA = 0.3  # weight of the newest score, as in the level updates of student_modeling
+
+
+def new_score_stats() -> Dict[str, Any]:
+    """
+    Empty running aggregates of a score series, stored as plain JSON in cognitive_metrics.
+
+    count, mean and m2 follow Welford's algorithm, so the variance is exact
+    without keeping the scores. recent is a ring buffer of the last
+    RECENT_SCORES scores with recent_head the slot the next score goes to.
+    """
+    return {
+        'count': 0,
+        'mean': 0.0,
+        'm2': 0.0,
+        'min': None,
+        'max': None,
+        'ewma': None,
+        'recent': [],
+        'recent_head': 0
+    }
+
+
+def add_score(stats: Dict[str, Any], score: float) -> Dict[str, Any]:
+    """
+    Folds one score into the aggregates in place, in constant time and space
+    """
+    score = float(score)
+    stats['count'] += 1
+    delta = score - stats['mean']
+    stats['mean'] += delta / stats['count']
+    stats['m2'] += delta * (score - stats['mean'])
+    stats['min'] = score if stats['min'] is None else min(stats['min'], score)
+    stats['max'] = score if stats['max'] is None else max(stats['max'], score)
+    if stats['ewma'] is None:
+        stats['ewma'] = score
+    else:
+        stats['ewma'] = SCORE_EWMA_ALPHA * score + (1 - SCORE_EWMA_ALPHA) * stats['ewma']
+
+    recent = stats['recent']
+    if len(recent) > RECENT_SCORES:
+        # RECENT_SCORES was lowered since the buffer was written
+        recent[:] = recent_scores(stats)[-RECENT_SCORES:]
+        stats['recent_head'] = 0
+    if len(recent) < RECENT_SCORES:
+        recent.append(score)
+        stats['recent_head'] = len(recent) % RECENT_SCORES
+    else:
+        recent[stats['recent_head']] = score
+        stats['recent_head'] = (stats['recent_head'] + 1) % RECENT_SCORES
+    return stats
+
+
+def add_scores(stats: Dict[str, Any], scores: Iterable[float]) -> Dict[str, Any]:
+    for score in scores:
+        add_score(stats, score)
+    return stats
+
+
+def score_variance(stats: Dict[str, Any]) -> float:
+    """
+    Sample variance of every score seen, 0.0 for fewer than two
+    """
+    return stats['m2'] / (stats['count'] - 1) if stats['count'] > 1 else 0.0
+
+
+def score_stddev(stats: Dict[str, Any]) -> float:
+    return math.sqrt(score_variance(stats))
+
+
+def recent_scores(stats: Dict[str, Any]) -> List[float]:
+    """
+    The ring buffer unrolled, oldest score first
+    """
+    recent = stats['recent']
+    if len(recent) < RECENT_SCORES:
+        return list(recent)
+    head = stats['recent_head'] % len(recent)
+    return recent[head:] + recent[:head]
+
+
+def stats_from_scores(scores: Iterable[float]) -> Dict[str, Any]:
+    """
+    Aggregates of an existing score list, used to migrate the old unbounded lists
+    """
+    return add_scores(new_score_stats(), scores)
+
+
+if __name__ == "__main__":
+    import json
+    import random
+    import statistics
+
+    rng = random.Random(7)
+    scores = [rng.uniform(0, 100) for _ in range(5000)]
+
+    stats = stats_from_scores(scores)
+    assert stats['count'] == len(scores)
+    assert abs(stats['mean'] - statistics.fmean(scores)) < 1e-9
+    assert abs(score_variance(stats) - statistics.variance(scores)) < 1e-6
+    assert stats['min'] == min(scores) and stats['max'] == max(scores)
+    assert recent_scores(stats) == scores[-RECENT_SCORES:]
+    print(f"aggregates match the full list: mean {stats['mean']:.3f}, stddev {score_stddev(stats):.3f}, "
+          f"ewma {stats['ewma']:.3f}")
+
+    # Serialized size of the cognitive_metrics entry as a user's history grows
+    for n in (10, 100, 1000, 10000):
+        history = scores[:n] if n <= len(scores) else scores * (n // len(scores))
+        list_bytes = len(json.dumps(history))
+        stats_bytes = len(json.dumps(stats_from_scores(history)))
+        print(f"{n:>6} scores: list {list_bytes:>7} bytes, aggregates {stats_bytes:>4} bytes")
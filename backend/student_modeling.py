@@ -1,61 +1,18 @@
-from typing import List, Dict, Optional, Any
+import re
+import uuid
+from typing import List, Dict, Optional, Any, Tuple
 import numpy as np
 from datetime import datetime
 from supabase_client import get_supabase_client
+from score_stats import add_score, stats_from_scores
+from learning_profile import LearningStyleProfile, STYLE_DIMENSIONS
+from knowledge_tracing import KnowledgeTracer, summarize_topics
 
-class LearningStyleProfile:
-    def __init__(self):
-        self.perceptual_mode = {
-            'visual': 0.0,
-            'auditory': 0.0,
-            'reading_writing': 0.0,
-            'kinesthetic': 0.0
-        }
-        self.cognitive_style = {
-            'global': 0.0,
-            'analytical': 0.0
-        }
-        self.social_preference = {
-            'independent': 0.0,
-            'collaborative': 0.0
-        }
-        self.instruction_style = {
-            'direct': 0.0,
-            'constructivist': 0.0,
-            'inquiry_based': 0.0,
-            'project_based': 0.0
-        }
-        self.assessment_preference = {
-            'formative': 0.0,
-            'summative': 0.0,
-            'performance': 0.0
-        }
-        self.cognitive_metrics = {
-            'beginner_level': 0.0,
-            'intermediate_level': 0.0,
-            'advanced_level': 0.0,
-            'total_quizzes_taken': 0,
-            'quiz_scores': [],  # List of quiz scores
-            'concept_detective_scores': [],  # List of concept detective scores
-            'overall_progress': 0.0  # Weighted average of all cognitive metrics
-        }
-        self.behavioral_metrics = {
-            'average_time_per_quiz': 0.0,  # in minutes
-            'average_time_per_concept': 0.0,  # in minutes
-            'total_learning_time': 0.0,  # in minutes
-            'session_completion_rate': 0.0,  # percentage of started sessions completed
-            'engagement_score': 0.0
-        }
-        self.learning_metrics = {
-            'completion_rate': 0.0,
-            'time_to_learn': 0.0,  # Average time in minutes
-            'engagement_score': 0.0
-        }
-        self.last_updated = datetime.now()
+knowledge_tracer = KnowledgeTracer()
 
 class KnowledgeState:
     def __init__(self):
-        self.topics = {}  # Topic -> Confidence mapping
+        self.topics = {}  # Topic id -> [BKT mastery, attempts]
         self.misconceptions = []
         self.strengths = []
         self.areas_for_improvement = []
@@ -78,119 +35,186 @@ class ConceptDetectiveAttempt:
         self.timestamp = datetime.now()
 
 class LLMInteraction:
-    def __init__(self, question: str, response: str, interaction_type: str):
+    def __init__(self, question: str, response: str, interaction_type: str, graded_score: Optional[float] = None):
         self.question = question
         self.response = response
         self.interaction_type = interaction_type  # 'quiz', 'concept_detective', 'chat'
+        self.graded_score = graded_score  # 0-100 when the answer was graded, e.g. a submitted quiz answer
         self.timestamp = datetime.now()
         self.evaluation_score = 0.0
         self.learning_indicators = {}
 
+# Enhanced psychological markers for each dimension
+LEARNING_STYLE_INDICATORS = {
+    'visual': [
+        'see', 'look', 'picture', 'diagram', 'graph', 'image', 'visualize', 'draw',
+        'color', 'observe', 'view', 'watch', 'appear', 'show', 'visible'
+    ],
+    'auditory': [
+        'hear', 'sound', 'tell', 'explain', 'discuss', 'listen', 'speak', 'talk',
+        'voice', 'audio', 'noise', 'silence', 'loud', 'quiet'
+    ],
+    'reading_writing': [
+        'read', 'write', 'note', 'text', 'book', 'document', 'list', 'word',
+        'essay', 'paper', 'journal', 'summary', 'definition'
+    ],
+    'kinesthetic': [
+        'do', 'try', 'practice', 'experiment', 'hands-on', 'build', 'create',
+        'feel', 'touch', 'move', 'action', 'physical', 'experience'
+    ],
+    'global': [
+        'overall', 'big picture', 'generally', 'concept', 'broad', 'whole',
+        'context', 'relationship', 'connection', 'pattern'
+    ],
+    'analytical': [
+        'detail', 'specific', 'step', 'analyze', 'break down', 'precise',
+        'exact', 'particular', 'component', 'element'
+    ],
+    'independent': [
+        'self', 'alone', 'individual', 'my own', 'personally', 'independent',
+        'autonomy', 'self-directed', 'private'
+    ],
+    'collaborative': [
+        'group', 'team', 'together', 'share', 'discuss', 'collaborate',
+        'partner', 'peer', 'collective', 'community'
+    ],
+    'formative': [
+        'feedback', 'improve', 'progress', 'learn from', 'guidance',
+        'development', 'growth', 'adjust', 'refine'
+    ],
+    'summative': [
+        'test', 'exam', 'final', 'grade', 'assessment', 'evaluation',
+        'measure', 'score', 'performance'
+    ],
+    'performance': [
+        'project', 'demonstrate', 'show', 'present', 'portfolio',
+        'exhibit', 'display', 'practical', 'real-world'
+    ]
+}
+
+# Context patterns for more accurate analysis
+LEARNING_STYLE_CONTEXTS = {
+    'visual': r'(?:prefer|like|need)\s+to\s+(?:see|visualize)',
+    'auditory': r'(?:better|best)\s+when\s+i\s+(?:hear|listen)',
+    'reading_writing': r'(?:learn|understand)\s+by\s+(?:reading|writing)',
+    'kinesthetic': r'(?:learn|work)\s+best\s+with\s+hands[-\s]on',
+    'global': r'(?:understand|see)\s+the\s+big\s+picture',
+    'analytical': r'(?:break|break\s+down|analyze)\s+step\s+by\s+step',
+    'independent': r'(?:prefer|like)\s+to\s+work\s+alone',
+    'collaborative': r'(?:enjoy|prefer)\s+group\s+work',
+    'formative': r'(?:want|need)\s+regular\s+feedback',
+    'summative': r'(?:focus|concerned)\s+about\s+(?:grades|scores)',
+    'performance': r'(?:show|demonstrate)\s+what\s+i\s+(?:know|learned)'
+}
+
+# Consider sentence structure and emphasis: a marker boosts the styles of the word after it
+EMPHASIS_BONUSES = {'really': 0.3, 'definitely': 0.3, 'always': 0.3, 'prefer': 0.4}
+
+# Inflections accepted after an indicator: visualize(d), draw(s), experiment(ing) ...
+_INFLECTION = r'(?:s|es|d|ed|ing)?'
+
+
+def _trie_pattern(words: List[str]) -> str:
+    """
+    Builds a regex alternation over words factored by common prefixes, so the
+    engine tests each character once instead of trying every word in turn
+    """
+    trie: Dict[str, Any] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node: Dict[str, Any]) -> str:
+        optional = '' in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if optional:
+            pattern = '(?:' + pattern + ')?'
+        return pattern
+
+    return build(trie)
+
+
+def _compile_style_matcher():
+    """
+    Compiles every indicator, context and emphasis pattern into one regex, scanned
+    once per message. Contexts are zero-width lookaheads and emphasis markers only
+    consume the marker, so none of them hide the indicator words they contain.
+    """
+    terms = sorted({term for words in LEARNING_STYLE_INDICATORS.values() for term in words})
+    # Contexts are only tried where one of their opening words starts
+    leads = {
+        re.match(r'\w+', option).group(0)
+        for pattern in LEARNING_STYLE_CONTEXTS.values()
+        for option in re.match(r'\(\?:([^()]*)\)', pattern).group(1).split('|')
+    }
+    contexts = '|'.join(
+        f'(?P<context_{style}>(?={pattern}(?!\\w)))' for style, pattern in LEARNING_STYLE_CONTEXTS.items()
+    )
+    alternatives = [f'(?=(?:{_trie_pattern(sorted(leads))})\\s)(?:{contexts})']
+    alternatives.append(f'(?P<emphasis>{_trie_pattern(list(EMPHASIS_BONUSES))})\\s+(?=(?P<emphasized>\\w+))')
+    alternatives.append(f'(?P<term>{_trie_pattern(terms)}){_INFLECTION}(?!\\w)')
+    scanner = re.compile('(?<!\\w)(?:' + '|'.join(alternatives) + ')')
+
+    # A match credits every indicator it contains: "big picture" is global and,
+    # through "picture", visual as well
+    term_res = {term: re.compile(f'(?<!\\w){re.escape(term)}{_INFLECTION}(?!\\w)') for term in terms}
+    term_credits = {
+        term: frozenset(inner for inner, inner_re in term_res.items() if inner_re.search(term))
+        for term in terms
+    }
+    return scanner, re.compile(f'(?P<term>{_trie_pattern(terms)}){_INFLECTION}'), term_credits
+
+
+# Indicator -> styles listing it, a few indicators such as "show" belong to two styles
+_TERM_STYLES: Dict[str, List[str]] = {}
+for _style, _words in LEARNING_STYLE_INDICATORS.items():
+    for _word in _words:
+        _TERM_STYLES.setdefault(_word, []).append(_style)
+
+_STYLE_SCANNER, _EMPHASIZED_TERM_RE, _TERM_CREDITS = _compile_style_matcher()
+
+
 def analyze_message_for_learning_style(message: str) -> Dict[str, float]:
     """
     Analyzes a single message for learning style indicators using comprehensive psychological markers
     Returns confidence scores for different style aspects
     """
-    # Enhanced psychological markers for each dimension
-    indicators = {
-        'visual': [
-            'see', 'look', 'picture', 'diagram', 'graph', 'image', 'visualize', 'draw',
-            'color', 'observe', 'view', 'watch', 'appear', 'show', 'visible'
-        ],
-        'auditory': [
-            'hear', 'sound', 'tell', 'explain', 'discuss', 'listen', 'speak', 'talk',
-            'voice', 'audio', 'noise', 'silence', 'loud', 'quiet'
-        ],
-        'reading_writing': [
-            'read', 'write', 'note', 'text', 'book', 'document', 'list', 'word',
-            'essay', 'paper', 'journal', 'summary', 'definition'
-        ],
-        'kinesthetic': [
-            'do', 'try', 'practice', 'experiment', 'hands-on', 'build', 'create',
-            'feel', 'touch', 'move', 'action', 'physical', 'experience'
-        ],
-        'global': [
-            'overall', 'big picture', 'generally', 'concept', 'broad', 'whole',
-            'context', 'relationship', 'connection', 'pattern'
-        ],
-        'analytical': [
-            'detail', 'specific', 'step', 'analyze', 'break down', 'precise',
-            'exact', 'particular', 'component', 'element'
-        ],
-        'independent': [
-            'self', 'alone', 'individual', 'my own', 'personally', 'independent',
-            'autonomy', 'self-directed', 'private'
-        ],
-        'collaborative': [
-            'group', 'team', 'together', 'share', 'discuss', 'collaborate',
-            'partner', 'peer', 'collective', 'community'
-        ],
-        'formative': [
-            'feedback', 'improve', 'progress', 'learn from', 'guidance',
-            'development', 'growth', 'adjust', 'refine'
-        ],
-        'summative': [
-            'test', 'exam', 'final', 'grade', 'assessment', 'evaluation',
-            'measure', 'score', 'performance'
-        ],
-        'performance': [
-            'project', 'demonstrate', 'show', 'present', 'portfolio',
-            'exhibit', 'display', 'practical', 'real-world'
-        ]
-    }
-    
-    # Context patterns for more accurate analysis
-    context_patterns = {
-        'visual': r'(prefer|like|need)\s+to\s+(see|visualize)',
-        'auditory': r'(better|best)\s+when\s+I\s+(hear|listen)',
-        'reading_writing': r'(learn|understand)\s+by\s+(reading|writing)',
-        'kinesthetic': r'(learn|work)\s+best\s+with\s+hands[-\s]on',
-        'global': r'(understand|see)\s+the\s+big\s+picture',
-        'analytical': r'(break|break\s+down|analyze)\s+step\s+by\s+step',
-        'independent': r'(prefer|like)\s+to\s+work\s+alone',
-        'collaborative': r'(enjoy|prefer)\s+group\s+work',
-        'formative': r'(want|need)\s+regular\s+feedback',
-        'summative': r'(focus|concerned)\s+about\s+(grades|scores)',
-        'performance': r'(show|demonstrate)\s+what\s+I\s+(know|learned)'
-    }
-    
-    scores = {style: 0.0 for style in indicators.keys()}
-    message = message.lower()
-    
-    # Word-based analysis
-    for style, words in indicators.items():
-        for word in words:
-            if word in message:
-                scores[style] += 0.2  # Base score for word matches
-                
-    # Context-based analysis
-    import re
-    for style, pattern in context_patterns.items():
-        if re.search(pattern, message):
-            scores[style] += 0.4  # Higher score for contextual matches
-    
-    # Consider sentence structure and emphasis
-    emphasis_patterns = {
-        r'really\s+(\w+)': 0.3,
-        r'definitely\s+(\w+)': 0.3,
-        r'always\s+(\w+)': 0.3,
-        r'prefer\s+(\w+)': 0.4
-    }
-    
-    for pattern, bonus in emphasis_patterns.items():
-        matches = re.finditer(pattern, message)
-        for match in matches:
-            emphasized_word = match.group(1)
-            for style, words in indicators.items():
-                if any(word in emphasized_word for word in words):
+    scores = dict.fromkeys(LEARNING_STYLE_INDICATORS, 0.0)
+    matched_terms = set()
+
+    for match in _STYLE_SCANNER.finditer(message.lower()):
+        kind = match.lastgroup
+        if kind == 'term':
+            matched_terms |= _TERM_CREDITS[match.group('term')]
+        elif kind == 'emphasized':
+            emphasized = _EMPHASIZED_TERM_RE.fullmatch(match.group('emphasized'))
+            if emphasized:
+                bonus = EMPHASIS_BONUSES[match.group('emphasis')]
+                styles = {style for term in _TERM_CREDITS[emphasized.group('term')] for style in _TERM_STYLES[term]}
+                for style in styles:
                     scores[style] += bonus
-    
+        else:
+            scores[kind[len('context_'):]] += 0.4  # Higher score for contextual matches
+
+    # Base score once per indicator found, however often it occurs
+    for term in matched_terms:
+        for style in _TERM_STYLES[term]:
+            scores[style] += 0.2
+
     # Normalize scores
     total = sum(scores.values()) + 1e-10  # Avoid division by zero
     normalized_scores = {k: min(v/total, 1.0) for k, v in scores.items()}
     
     return normalized_scores
 
+# Smoothing factor of the EMA over per-message style scores
+STYLE_EMA_ALPHA = 0.7
+
 def extract_learning_styles(chat_history: List[str]) -> LearningStyleProfile:
     """
     Analyzes chat history to extract learning style preferences with temporal weighting
@@ -224,57 +248,73 @@ def extract_learning_styles(chat_history: List[str]) -> LearningStyleProfile:
     for style in style_scores[0].keys():
         style_values = [score[style] for score in style_scores]
         # Use exponential moving average for smoother transitions
-        alpha = 0.7  # Smoothing factor
+        alpha = STYLE_EMA_ALPHA
         ema = style_values[0]
         for value in style_values[1:]:
             ema = alpha * value + (1 - alpha) * ema
         aggregated_scores[style] = ema
     
-    # Update profile with aggregated scores
+    return apply_style_scores(profile, aggregated_scores)
+
+def apply_style_scores(profile: LearningStyleProfile, aggregated_scores: Dict[str, float]) -> LearningStyleProfile:
+    """
+    Writes aggregated style scores into the matching dimensions of the profile
+    """
     for style, score in aggregated_scores.items():
-        if style in profile.perceptual_mode:
-            profile.perceptual_mode[style] = score
-        elif style in profile.cognitive_style:
-            profile.cognitive_style[style] = score
-        elif style in profile.social_preference:
-            profile.social_preference[style] = score
-        elif style in profile.instruction_style:
-            profile.instruction_style[style] = score
-        elif style in profile.assessment_preference:
-            profile.assessment_preference[style] = score
+        dimension = STYLE_DIMENSIONS.get(style)
+        if dimension:
+            getattr(profile, dimension)[style] = score
     
     return profile
 
-def update_knowledge_trace(chat_history: List[str]) -> KnowledgeState:
+def update_knowledge_trace(knowledge_state: Optional[KnowledgeState],
+                           observations: List[Tuple[str, float]]) -> KnowledgeState:
     """
-    Updates the knowledge state based on chat history
+    Updates per-topic mastery with Bayesian Knowledge Tracing. observations are
+    (topic_id, correct) pairs in the order they were answered, correct being 1/0
+    or a score in [0, 1]; topic ids name transcript chunks (see knowledge_tracing.topic_id).
     """
-    knowledge_state = KnowledgeState()
+    if knowledge_state is None:
+        knowledge_state = KnowledgeState()
     
-    # Simple keyword-based topic extraction
-    topics = set()
-    for message in chat_history:
-        # Add sophisticated topic extraction logic here
-        pass
-        
+    if len(observations) == 1:
+        knowledge_tracer.observe(knowledge_state.topics, *observations[0])
+    elif observations:
+        knowledge_tracer.observe_many(knowledge_state.topics, observations)
+    
+    knowledge_state.strengths, knowledge_state.areas_for_improvement = summarize_topics(knowledge_state.topics)
+    knowledge_state.last_updated = datetime.now()
     return knowledge_state
 
+def profile_to_row(user_id: str, profile: LearningStyleProfile) -> Dict[str, Any]:
+    """
+    Converts a profile into a student_profiles row
+    """
+    return {'user_id': user_id, **profile.to_dict()}
+
+def profile_from_row(data: Dict[str, Any]) -> LearningStyleProfile:
+    """
+    Builds a profile from a student_profiles row
+    """
+    data = {**data, 'cognitive_metrics': _migrate_score_lists(dict(data.get('cognitive_metrics') or {}))}
+    return LearningStyleProfile.from_dict(data)
+
+def _migrate_score_lists(cognitive_metrics: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Folds the unbounded score lists of older rows into running aggregates
+    """
+    for legacy_key, stats_key in (('quiz_scores', 'quiz_score_stats'),
+                                  ('concept_detective_scores', 'concept_detective_score_stats')):
+        scores = cognitive_metrics.pop(legacy_key, None)
+        if stats_key not in cognitive_metrics:
+            cognitive_metrics[stats_key] = stats_from_scores(scores or [])
+    return cognitive_metrics
+
 async def save_student_profile(user_id: str, profile: LearningStyleProfile):
     """
     Saves the student profile to Supabase
     """
-    profile_data = {
-        'user_id': user_id,
-        'perceptual_mode': profile.perceptual_mode,
-        'cognitive_style': profile.cognitive_style,
-        'social_preference': profile.social_preference,
-        'instruction_style': profile.instruction_style,
-        'assessment_preference': profile.assessment_preference,
-        'cognitive_metrics': profile.cognitive_metrics,
-        'behavioral_metrics': profile.behavioral_metrics,
-        'learning_metrics': profile.learning_metrics,
-        'last_updated': profile.last_updated.isoformat()
-    }
+    profile_data = profile_to_row(user_id, profile)
     
     try:
         response = await get_supabase_client().table('student_profiles').upsert(profile_data).execute()
@@ -283,6 +323,17 @@ async def save_student_profile(user_id: str, profile: LearningStyleProfile):
         print(f"Error saving student profile: {e}")
         return None
 
+async def save_student_profiles(rows: List[Dict[str, Any]]):
+    """
+    Upserts many student_profiles rows in a single request
+    """
+    try:
+        response = await get_supabase_client().table('student_profiles').upsert(rows).execute()
+        return response.data
+    except Exception as e:
+        print(f"Error saving student profiles: {e}")
+        return None
+
 async def get_student_profile(user_id: str) -> Optional[LearningStyleProfile]:
     """
     Retrieves the student profile from Supabase
@@ -290,23 +341,66 @@ async def get_student_profile(user_id: str) -> Optional[LearningStyleProfile]:
     try:
         response = await get_supabase_client().table('student_profiles').select('*').eq('user_id', user_id).execute()
         if response.data:
-            profile = LearningStyleProfile()
-            data = response.data[0]
-            profile.perceptual_mode = data['perceptual_mode']
-            profile.cognitive_style = data['cognitive_style']
-            profile.social_preference = data['social_preference']
-            profile.instruction_style = data['instruction_style']
-            profile.assessment_preference = data['assessment_preference']
-            profile.cognitive_metrics = data['cognitive_metrics']
-            profile.behavioral_metrics = data['behavioral_metrics']
-            profile.learning_metrics = data['learning_metrics']
-            profile.last_updated = datetime.fromisoformat(data['last_updated'])
-            return profile
+            return profile_from_row(response.data[0])
         return None
     except Exception as e:
         print(f"Error retrieving student profile: {e}")
         return None
 
+def attempt_to_row(user_id: str, attempt_type: str, content_id: str, score: float, time_taken: float,
+                   level: str, timestamp: Optional[datetime] = None,
+                   metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Builds a learning_attempts row. Its id is set here, so a row can be recognized
+    before and after it is inserted.
+    """
+    return {
+        'id': str(uuid.uuid4()),
+        'user_id': user_id,
+        'attempt_type': attempt_type,
+        'content_id': content_id,
+        'score': score,
+        'time_taken': time_taken,
+        'level': level,
+        'timestamp': (timestamp or datetime.now()).isoformat(),
+        'metadata': metadata or {}
+    }
+
+async def save_learning_attempts(rows: List[Dict[str, Any]]):
+    """
+    Inserts many learning_attempts rows in a single request; rows already inserted
+    (by a retry after a lost response) are skipped
+    """
+    if not rows:
+        return []
+    try:
+        response = await get_supabase_client().table('learning_attempts') \
+            .upsert(rows, on_conflict='id', ignore_duplicates=True).execute()
+        return response.data
+    except Exception as e:
+        print(f"Error saving learning attempts: {e}")
+        return None
+
+def attempts_from_rows(rows: List[Dict[str, Any]]) -> Tuple[List[QuizAttempt], List[ConceptDetectiveAttempt]]:
+    """
+    Rebuilds the quiz and concept detective attempts from learning_attempts rows,
+    skipping other attempt types such as LLM-judged answers
+    """
+    quiz_attempts = []
+    concept_attempts = []
+    for row in rows:
+        if row['attempt_type'] == 'quiz':
+            attempt = QuizAttempt(row['content_id'], row['score'], row['time_taken'], row['level'])
+            quiz_attempts.append(attempt)
+        elif row['attempt_type'] == 'concept_detective':
+            attempt = ConceptDetectiveAttempt(row['content_id'], row['score'], row['time_taken'], row['level'])
+            concept_attempts.append(attempt)
+        else:
+            continue
+        if row.get('timestamp'):
+            attempt.timestamp = datetime.fromisoformat(row['timestamp'])
+    return quiz_attempts, concept_attempts
+
 async def get_knowledge_state(user_id: str) -> Optional[KnowledgeState]:
     """
     Retrieves the knowledge state from Supabase
@@ -341,7 +435,7 @@ async def save_knowledge_state(user_id: str, state: KnowledgeState):
     }
     
     try:
-        response = await get_supabase_client().table('knowledge_states').upsert(state_data).execute()
+        response = await get_supabase_client().table('knowledge_states').upsert(state_data, on_conflict='user_id').execute()
         return response.data
     except Exception as e:
         print(f"Error saving knowledge state: {e}")
@@ -360,12 +454,12 @@ def update_cognitive_metrics(profile: LearningStyleProfile, quiz_attempts: List[
     # Process quiz attempts
     for attempt in quiz_attempts:
         level_scores[attempt.level].append(attempt.score)
-        profile.cognitive_metrics['quiz_scores'].append(attempt.score)
+        add_score(profile.cognitive_metrics['quiz_score_stats'], attempt.score)
     
     # Process concept detective attempts
     for attempt in concept_attempts:
         level_scores[attempt.level].append(attempt.score)
-        profile.cognitive_metrics['concept_detective_scores'].append(attempt.score)
+        add_score(profile.cognitive_metrics['concept_detective_score_stats'], attempt.score)
     
     # Update level-specific progress
     if level_scores['beginner']:
@@ -392,6 +486,16 @@ def update_cognitive_metrics(profile: LearningStyleProfile, quiz_attempts: List[
     
     return profile
 
+def record_attempt_score(profile: LearningStyleProfile, attempt_type: str, score: float) -> LearningStyleProfile:
+    """
+    Adds a graded attempt to the lifetime score stats and attempt count as its
+    learning_attempts row is written, the online counterpart of update_cognitive_metrics
+    """
+    stats_key = 'quiz_score_stats' if attempt_type == 'quiz' else 'concept_detective_score_stats'
+    add_score(profile.cognitive_metrics[stats_key], score)
+    profile.cognitive_metrics['total_quizzes_taken'] += 1
+    return profile
+
 def update_behavioral_metrics(profile: LearningStyleProfile, quiz_attempts: List[QuizAttempt], concept_attempts: List[ConceptDetectiveAttempt]) -> LearningStyleProfile:
     """
     Updates behavioral metrics based on time spent and engagement
@@ -425,56 +529,86 @@ def update_behavioral_metrics(profile: LearningStyleProfile, quiz_attempts: List
     
     return profile 
 
+# Question words and how deep an understanding they ask for
+QUESTION_DEPTH_INDICATORS = {
+    'what': 0.3,  # Basic comprehension
+    'how': 0.6,   # Process understanding
+    'why': 0.8,   # Deep understanding
+    'compare': 0.7,
+    'analyze': 0.8,
+    'evaluate': 0.9
+}
+EXPLANATION_INDICATORS = ['because', 'therefore']
+CRITICAL_THINKING_INDICATORS = ['however', 'although', 'on the other hand', 'alternatively']
+EVALUATION_METRICS = ('comprehension', 'depth', 'engagement', 'critical_thinking')
+
+
+def _phrase_matchers(phrases: List[str], inflected: bool = False):
+    """
+    Whole-word matchers, so "what" no longer matches inside "somewhat". Each pattern
+    starts with the literal phrase, which lets the regex engine skip straight to its
+    occurrences; the word boundary before it is a lookbehind placed after the first word.
+    """
+    matchers = []
+    for phrase in phrases:
+        first, *rest = [re.escape(word) for word in phrase.split()]
+        pattern = f'{first}(?<!\\w{first})' + ''.join(r'\s+' + word for word in rest)
+        pattern += (_INFLECTION if inflected else '') + '(?!\\w)'
+        matchers.append((phrase, re.compile(pattern)))
+    return matchers
+
+
+_QUESTION_DEPTH_MATCHERS = _phrase_matchers(list(QUESTION_DEPTH_INDICATORS), inflected=True)
+_EXPLANATION_MATCHERS = _phrase_matchers(EXPLANATION_INDICATORS)
+_CRITICAL_THINKING_MATCHERS = _phrase_matchers(CRITICAL_THINKING_INDICATORS)
+
+
+def score_interaction(question: str, response: str) -> Tuple[float, float, float, float]:
+    """
+    The evaluation metrics of one question/response pair, in EVALUATION_METRICS order
+    """
+    # Question complexity, each indicator counted once
+    question = question.lower()
+    depth = sum(
+        QUESTION_DEPTH_INDICATORS[indicator] for indicator, matcher in _QUESTION_DEPTH_MATCHERS
+        if matcher.search(question)
+    )
+
+    # Explanation patterns and critical thinking indicators in the response
+    response = response.lower()
+    comprehension = 0.5 if any(
+        matcher.search(response) for _, matcher in _EXPLANATION_MATCHERS
+    ) else 0.0
+    critical_thinking = 0.3 * sum(
+        1 for _, matcher in _CRITICAL_THINKING_MATCHERS if matcher.search(response)
+    )
+
+    # Engagement based on response length and detail
+    engagement = len(response.split()) / 100
+
+    return min(1.0, comprehension), min(1.0, depth), min(1.0, engagement), min(1.0, critical_thinking)
+
 def evaluate_llm_interaction(interaction: LLMInteraction) -> Dict[str, float]:
     """
     Evaluates an LLM interaction for learning indicators and quality
     """
-    # Initialize evaluation metrics
-    evaluation = {
-        'comprehension': 0.0,
-        'depth': 0.0,
-        'engagement': 0.0,
-        'critical_thinking': 0.0
-    }
-    
-    # Analyze question complexity
-    question_indicators = {
-        'what': 0.3,  # Basic comprehension
-        'how': 0.6,   # Process understanding
-        'why': 0.8,   # Deep understanding
-        'compare': 0.7,
-        'analyze': 0.8,
-        'evaluate': 0.9
-    }
-    
-    # Calculate question complexity score
-    question = interaction.question.lower()
-    for indicator, weight in question_indicators.items():
-        if indicator in question:
-            evaluation['depth'] += weight
-    
-    # Analyze response quality
-    response = interaction.response.lower()
-    
-    # Check for explanation patterns
-    if 'because' in response or 'therefore' in response:
-        evaluation['comprehension'] += 0.5
-    
-    # Check for critical thinking indicators
-    critical_indicators = ['however', 'although', 'on the other hand', 'alternatively']
-    for indicator in critical_indicators:
-        if indicator in response:
-            evaluation['critical_thinking'] += 0.3
-    
-    # Calculate engagement based on response length and detail
-    words = len(response.split())
-    evaluation['engagement'] = min(1.0, words / 100)  # Cap at 1.0
-    
-    # Normalize scores
-    for metric in evaluation:
-        evaluation[metric] = min(1.0, evaluation[metric])
-    
-    return evaluation
+    return dict(zip(EVALUATION_METRICS, score_interaction(interaction.question, interaction.response)))
+
+def evaluate_llm_interactions(interactions: List[LLMInteraction]) -> List[Dict[str, float]]:
+    """
+    Evaluates a batch of interactions, a single call when run in a worker process
+    """
+    return [evaluate_llm_interaction(interaction) for interaction in interactions]
+
+def get_depth_level(depth: float) -> str:
+    """
+    Maps an interaction's depth score to the level it counts toward
+    """
+    if depth < 0.4:
+        return 'beginner'
+    if depth < 0.7:
+        return 'intermediate'
+    return 'advanced'
 
 def update_learning_profile_from_llm(profile: LearningStyleProfile, 
                                    interaction: LLMInteraction,
@@ -483,22 +617,14 @@ def update_learning_profile_from_llm(profile: LearningStyleProfile,
     Updates the learning profile based on LLM interaction evaluation
     """
     # Update cognitive metrics based on evaluation
-    if interaction.interaction_type == 'quiz':
-        profile.cognitive_metrics['quiz_scores'].append(evaluation['comprehension'] * 100)
+    # Quiz scores are counted once per submission by record_attempt_score, and graded
+    # answers move the levels through the attempt history, not the text heuristics
+    if interaction.interaction_type == 'quiz' and interaction.graded_score is None:
         level_score = evaluation['depth']
-        
-        if level_score < 0.4:
-            profile.cognitive_metrics['beginner_level'] = (
-                profile.cognitive_metrics['beginner_level'] * 0.7 + level_score * 0.3
-            )
-        elif level_score < 0.7:
-            profile.cognitive_metrics['intermediate_level'] = (
-                profile.cognitive_metrics['intermediate_level'] * 0.7 + level_score * 0.3
-            )
-        else:
-            profile.cognitive_metrics['advanced_level'] = (
-                profile.cognitive_metrics['advanced_level'] * 0.7 + level_score * 0.3
-            )
+        level_key = f"{get_depth_level(level_score)}_level"
+        profile.cognitive_metrics[level_key] = (
+            profile.cognitive_metrics[level_key] * 0.7 + level_score * 0.3
+        )
     
     # Update behavioral metrics
     profile.behavioral_metrics['engagement_score'] = (
@@ -556,8 +682,14 @@ async def process_llm_interaction(user_id: str,
     # Update profile with evaluation results
     updated_profile = update_learning_profile_from_llm(profile, interaction, evaluation)
     
-    # Save updated profile
+    # Save updated profile, the judged answer goes to the attempt history under its own
+    # type so the quiz metrics recomputed from graded attempts don't count it
     await save_student_profile(user_id, updated_profile)
+    if interaction_type == 'quiz':
+        await save_learning_attempts([attempt_to_row(
+            user_id, 'llm_quiz', 'llm_interaction', evaluation['comprehension'] * 100, 0.0,
+            get_depth_level(evaluation['depth']), interaction.timestamp, {'evaluation': evaluation}
+        )])
     
     # Return evaluation results and updated profile metrics
     return {
@@ -579,4 +711,42 @@ def get_current_level(profile: LearningStyleProfile) -> str:
         'intermediate': profile.cognitive_metrics['intermediate_level'],
         'advanced': profile.cognitive_metrics['advanced_level']
     }
-    return max(levels.items(), key=lambda x: x[1])[0] 
\ No newline at end of file
+    return max(levels.items(), key=lambda x: x[1])[0] 
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    from benchmark_baselines import legacy_analyze_message_for_learning_style
+
+    # Synthetic but realistic student chat turns
+    openers = ["Can you explain", "I don't get", "Could you show me", "What is", "Why does", "How do I",
+               "I'd like to practice", "Is there a diagram for", "Let's go over", "Help me understand"]
+    topics = ["photosynthesis", "the quadratic formula", "Newton's second law", "supply and demand",
+              "recursion in Python", "the French revolution", "cell division", "binary search trees"]
+    tails = ["step by step", "with an example", "in simple words", "so I can write a summary",
+             "because my exam is next week", "- I prefer to see it visually", "and I learn best with hands-on work",
+             "so our study group can discuss it", "and give me feedback on my answer", "? I really need the big picture",
+             "", "", ""]
+    rng = random.Random(42)
+    chat_log = [f"{rng.choice(openers)} {rng.choice(topics)} {rng.choice(tails)}".strip() for _ in range(20000)]
+
+    def measure(label, analyze):
+        started = time.perf_counter()
+        results = [analyze(message) for message in chat_log]
+        elapsed = time.perf_counter() - started
+        print(f"{label:<28} {len(chat_log) / elapsed:10,.0f} messages/sec")
+        return results, elapsed
+
+    legacy_results, legacy_seconds = measure("substring scans (legacy)", legacy_analyze_message_for_learning_style)
+    results, seconds = measure("precompiled matcher", analyze_message_for_learning_style)
+    print(f"speedup: {legacy_seconds / seconds:.1f}x")
+
+    # Word-boundary matching drops false positives such as "do" in "don't" or "document",
+    # so the scores differ; report how often the dominant style still agrees
+    agree = sum(
+        max(old, key=old.get) == max(new, key=new.get)
+        for old, new in zip(legacy_results, results)
+        if any(old.values()) and any(new.values())
+    )
+    print(f"dominant style agrees with legacy on {agree / len(chat_log):.0%} of messages")
@@ -0,0 +1,165 @@
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from student_modeling import (
+    STYLE_EMA_ALPHA,
+    LearningStyleProfile,
+    analyze_message_for_learning_style,
+    apply_style_scores,
+)
+
+
+class StyleSession:
+    """
+    Running learning-style state of one conversation.
+
+    extract_learning_styles weights message i of n by 0.5 + 0.5 * i / (n - 1)
+    and takes an EMA over the weighted scores. The weight depends on n, but
+    the EMA is linear, so its result splits into
+        0.5 * EMA(s_i) + 0.5 * EMA(i * s_i) / max(1, n - 1)
+    and both EMAs can be advanced one message at a time.
+    """
+
+    __slots__ = ("count", "ema", "index_ema", "last_message")
+
+    def __init__(self):
+        self.count = 0
+        self.ema: Dict[str, float] = {}  # EMA of s_i
+        self.index_ema: Dict[str, float] = {}  # EMA of i * s_i
+        self.last_message: Optional[str] = None
+
+    def add(self, message: str):
+        scores = analyze_message_for_learning_style(message)
+        index = self.count
+        if index == 0:
+            self.ema = dict(scores)
+            self.index_ema = dict.fromkeys(scores, 0.0)
+        else:
+            alpha = STYLE_EMA_ALPHA
+            for style, score in scores.items():
+                self.ema[style] = alpha * score + (1 - alpha) * self.ema[style]
+                self.index_ema[style] = alpha * index * score + (1 - alpha) * self.index_ema[style]
+        self.count += 1
+        self.last_message = message
+
+    def scores(self) -> Dict[str, float]:
+        span = max(1, self.count - 1)
+        return {style: 0.5 * self.ema[style] + 0.5 * self.index_ema[style] / span for style in self.ema}
+
+    def profile(self) -> LearningStyleProfile:
+        profile = LearningStyleProfile()
+        if self.count == 0:
+            return profile
+        return apply_style_scores(profile, self.scores())
+
+
+class IncrementalStyleProfiler:
+    """
+    Learning-style profiles maintained per conversation, so each chat turn only
+    analyzes the messages added since the previous turn.
+
+    Sessions are kept in an LRU. A session is rebuilt from scratch when the
+    history no longer extends the one it has seen (fewer messages, or a
+    different message where the previous turn ended).
+    """
+
+    def __init__(self, max_sessions: int = 10000):
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, StyleSession]" = OrderedDict()
+        self.stats = {"messages_analyzed": 0, "messages_reused": 0, "rebuilds": 0}
+
+    @staticmethod
+    def session_key(chat_history: List[str], user_id: Optional[str] = None,
+                    session_id: Optional[str] = None) -> str:
+        """
+        Uses the client's session id, or else identifies the conversation by its user and opening message
+        """
+        if session_id:
+            return f"session:{session_id}"
+        opening = chat_history[0] if chat_history else ""
+        return "derived:" + hashlib.sha1(f"{user_id or ''}\0{opening}".encode("utf-8")).hexdigest()
+
+    def peek(self, key: str) -> Optional[LearningStyleProfile]:
+        """
+        Returns the session's profile as of its last update, None for an unknown session
+        """
+        session = self._sessions.get(key)
+        if session is None or session.count == 0:
+            return None
+        return session.profile()
+
+    def update(self, key: str, chat_history: List[str]) -> LearningStyleProfile:
+        """
+        Brings the session up to date with chat_history and returns the same
+        profile extract_learning_styles(chat_history) would
+        """
+        session = self._sessions.get(key)
+        if session is not None and (
+            session.count > len(chat_history)
+            or (session.count and chat_history[session.count - 1] != session.last_message)
+        ):
+            self.stats["rebuilds"] += 1
+            session = None
+        if session is None:
+            session = StyleSession()
+
+        self.stats["messages_reused"] += session.count
+        for message in chat_history[session.count:]:
+            session.add(message)
+            self.stats["messages_analyzed"] += 1
+
+        self._sessions[key] = session
+        self._sessions.move_to_end(key)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return session.profile()
+
+
+style_profiler = IncrementalStyleProfiler(max_sessions=int(os.getenv("STYLE_PROFILER_SESSIONS", "10000")))
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    from student_modeling import extract_learning_styles
+
+    dimensions = ("perceptual_mode", "cognitive_style", "social_preference", "instruction_style", "assessment_preference")
+
+    def flatten(profile: LearningStyleProfile) -> Dict[str, float]:
+        return {style: score for dimension in dimensions for style, score in getattr(profile, dimension).items()}
+
+    phrases = ["can you show me a diagram", "I learn best with hands-on practice", "explain it again please",
+               "let's discuss this as a group", "I need regular feedback", "what's on the final exam",
+               "break it down step by step", "I prefer to see the big picture", "ok", "thanks!", "",
+               "I'd rather read the summary and write notes", "I prefer to work alone on my own project"]
+    rng = random.Random(3)
+
+    # Equivalence with the full recomputation after every turn of many conversations
+    profiler = IncrementalStyleProfiler()
+    worst = 0.0
+    for conversation in range(200):
+        history: List[str] = []
+        for turn in range(rng.randint(1, 40)):
+            history.append(" ".join(rng.choice(phrases) for _ in range(rng.randint(1, 3))))
+            incremental = flatten(profiler.update(f"c{conversation}", history))
+            full = flatten(extract_learning_styles(history))
+            worst = max(worst, max(abs(incremental[style] - full[style]) for style in full))
+    assert worst < 1e-9, worst
+    print(f"equivalent to extract_learning_styles, max abs difference {worst:.2e}")
+
+    # Cost of a 100-turn session, per-turn analysis of the full history vs the new message only
+    history = [" ".join(rng.choice(phrases) for _ in range(3)) for _ in range(100)]
+    started = time.perf_counter()
+    for turn in range(1, len(history) + 1):
+        extract_learning_styles(history[:turn])
+    full_seconds = time.perf_counter() - started
+    profiler = IncrementalStyleProfiler()
+    started = time.perf_counter()
+    for turn in range(1, len(history) + 1):
+        profiler.update("bench", history[:turn])
+    incremental_seconds = time.perf_counter() - started
+    print(f"100-turn session: full recompute {full_seconds * 1000:.1f} ms, "
+          f"incremental {incremental_seconds * 1000:.1f} ms ({full_seconds / incremental_seconds:.0f}x)")
@@ -0,0 +1,156 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+_SAFE_KEY_RE = re.compile(r'[^A-Za-z0-9_.-]')
+
+
+class TranscriptCache:
+    """
+    Transcript store shared by every YouTube ingestion path.
+
+    Entries are keyed by (video_id, language) and expire after ttl_seconds.
+    The in-memory tier is a size-bounded LRU; when persist_dir is set, entries
+    are also written there as JSON files so they survive restarts and can be
+    shared by workers on the same host. Concurrent misses for the same key
+    share a single provider fetch.
+
+    Paths store values of different richness under the same key (text only,
+    or text with sentences and title), so readers name the fields they need
+    and an entry that lacks one counts as a miss; the fetched value is merged
+    into it.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 24 * 3600,
+                 persist_dir: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persist_dir = persist_dir
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self.stats = {'hits': 0, 'persistent_hits': 0, 'misses': 0, 'evictions': 0}
+        if persist_dir:
+            os.makedirs(persist_dir, exist_ok=True)
+
+    def _is_fresh(self, stored_at: float) -> bool:
+        return time.time() - stored_at < self.ttl_seconds
+
+    def _path_for(self, key: Tuple[str, str]) -> str:
+        video_id, language = key
+        filename = f"{_SAFE_KEY_RE.sub('_', video_id)}.{_SAFE_KEY_RE.sub('_', language)}.json"
+        return os.path.join(self.persist_dir, filename)
+
+    def _remember(self, key: Tuple[str, str], stored_at: float, value: Dict[str, Any]):
+        self._entries[key] = (stored_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def _read_persistent(self, key: Tuple[str, str]) -> Optional[Tuple[float, Dict[str, Any]]]:
+        try:
+            with open(self._path_for(key), 'r', encoding='utf-8') as f:
+                record = json.load(f)
+            return record['stored_at'], record['value']
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable transcript cache entry {key}: {e}")
+            return None
+
+    def _write_persistent(self, key: Tuple[str, str], stored_at: float, value: Dict[str, Any]):
+        path = self._path_for(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'stored_at': stored_at, 'value': value}, f)
+            os.replace(temp_path, path)
+        except Exception as e:
+            logger.warning(f"Could not persist transcript cache entry {key}: {e}")
+
+    async def get(self, video_id: str, language: str = 'en') -> Optional[Dict[str, Any]]:
+        """
+        Returns a fresh cached transcript, checking memory first and then the persistent tier
+        """
+        key = (video_id, language)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if self._is_fresh(entry[0]):
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry[1]
+            del self._entries[key]
+
+        if self.persist_dir:
+            record = await asyncio.to_thread(self._read_persistent, key)
+            if record is not None and self._is_fresh(record[0]):
+                self._remember(key, record[0], record[1])
+                self.stats['persistent_hits'] += 1
+                return record[1]
+
+        return None
+
+    async def put(self, video_id: str, language: str, value: Dict[str, Any]):
+        """
+        Stores a transcript in memory and, if configured, in the persistent tier
+        """
+        key = (video_id, language)
+        stored_at = time.time()
+        self._remember(key, stored_at, value)
+        if self.persist_dir:
+            await asyncio.to_thread(self._write_persistent, key, stored_at, value)
+
+    async def get_or_fetch(self, video_id: str, language: str,
+                           fetcher: Callable[[], Awaitable[Dict[str, Any]]],
+                           required: Sequence[str] = ('full_transcript',)) -> Dict[str, Any]:
+        """
+        Returns the cached transcript if it has every required field, or calls fetcher
+        once to load it. Exceptions raised by fetcher propagate and nothing is cached.
+        """
+        cached = await self.get(video_id, language)
+        if cached is not None and all(field in cached for field in required):
+            return cached
+
+        key = (video_id, language)
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            value = await asyncio.shield(inflight)
+            if all(field in value for field in required):
+                return value
+            # A poorer fetch was running, load what this caller needs after it
+            return await self.get_or_fetch(video_id, language, fetcher, required)
+
+        self.stats['misses'] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await fetcher()
+            if cached is not None:
+                value = {**cached, **value}
+            await self.put(video_id, language, value)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting on it
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+
+transcript_cache = TranscriptCache(
+    max_entries=int(os.getenv("TRANSCRIPT_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("TRANSCRIPT_CACHE_TTL", str(24 * 3600))),
+    persist_dir=os.getenv("TRANSCRIPT_CACHE_DIR") or None,
+)
@@ -0,0 +1,240 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from itertools import accumulate
+from typing import List, Dict, Optional, Tuple, Any
+import struct
+import sys
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional, binary encoding is always available
+    msgpack = None
+
+# Wire header: magic, format version, sentence count, text buffer length in bytes
+_HEADER = struct.Struct("<4sHII")
+_MAGIC = b"VTL1"
+_VERSION = 1
+
+
+def _little_endian(values: array) -> bytes:
+    """
+    Returns the raw bytes of an array in little-endian order
+    """
+    if sys.byteorder == "little":
+        return values.tobytes()
+    swapped = array(values.typecode, values)
+    swapped.byteswap()
+    return swapped.tobytes()
+
+
+def _from_little_endian(typecode: str, data: bytes) -> array:
+    """
+    Builds an array from little-endian raw bytes
+    """
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+class SentenceTimeline:
+    """
+    Compact, column-oriented store for timestamped transcript sentences.
+
+    Start and end times live in parallel float32 arrays and all sentence text is
+    kept in one UTF-8 buffer addressed by byte offsets, so a multi-hour recording
+    costs a few bytes per sentence instead of one dict per sentence.
+    Sentences are kept in order of start time, and end times never decrease
+    (range_indices bisects on them): a sentence that ends before an earlier,
+    overlapping one is taken to last until that one ends.
+    """
+
+    __slots__ = ("starts", "ends", "offsets", "text")
+
+    def __init__(self, starts: array, ends: array, offsets: array, text: bytes):
+        self.starts = starts  # float32 start times in seconds
+        self.ends = ends  # float32 end times in seconds
+        self.offsets = offsets  # uint32 byte offsets into text, len(starts) + 1 entries
+        self.text = text  # concatenated UTF-8 sentence text
+
+    @classmethod
+    def from_sentences(cls, sentences: List[Dict[str, Any]]) -> "SentenceTimeline":
+        """
+        Builds a timeline from the list of {"text", "start", "end"} dicts
+        produced by transcribe_audio
+        """
+        ordered = sorted(sentences, key=lambda s: s.get("start", 0.0))
+        starts = array("f", (s.get("start", 0.0) for s in ordered))
+        ends = array("f", accumulate((s.get("end", 0.0) for s in ordered), max))
+
+        encoded = [s.get("text", "").encode("utf-8") for s in ordered]
+        offsets = array("I", [0])
+        position = 0
+        for chunk in encoded:
+            position += len(chunk)
+            offsets.append(position)
+
+        return cls(starts, ends, offsets, b"".join(encoded))
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def text_at(self, index: int) -> str:
+        """
+        Returns the text of the sentence at the given index
+        """
+        return self.text[self.offsets[index]:self.offsets[index + 1]].decode("utf-8")
+
+    def sentence(self, index: int) -> Dict[str, Any]:
+        """
+        Returns a single sentence in the same shape as transcribe_audio
+        """
+        # float32 keeps millisecond precision for recordings up to several hours
+        return {
+            "text": self.text_at(index),
+            "start": round(self.starts[index], 3),
+            "end": round(self.ends[index], 3)
+        }
+
+    def index_at(self, t: float) -> Optional[int]:
+        """
+        Returns the index of the sentence being spoken at time t, or None if
+        t falls before the first sentence or in a gap between sentences
+        """
+        index = bisect_right(self.starts, t) - 1
+        if index < 0 or t > self.ends[index]:
+            return None
+        return index
+
+    def sentence_at(self, t: float) -> Optional[Dict[str, Any]]:
+        """
+        Returns the sentence being spoken at time t
+        """
+        index = self.index_at(t)
+        return self.sentence(index) if index is not None else None
+
+    def range_indices(self, t0: float, t1: Optional[float] = None) -> Tuple[int, int]:
+        """
+        Returns the half-open index range of sentences overlapping [t0, t1]
+        """
+        lo = bisect_left(self.ends, t0)
+        hi = len(self.starts) if t1 is None else bisect_right(self.starts, t1)
+        return lo, max(lo, hi)
+
+    def slice(self, lo: int, hi: int) -> "SentenceTimeline":
+        """
+        Returns a new timeline holding sentences lo..hi with rebased text offsets,
+        empty when the range starts past the last sentence
+        """
+        lo = min(max(0, lo), len(self.starts))
+        hi = min(len(self.starts), max(lo, hi))
+        base = self.offsets[lo]
+        offsets = array("I", (offset - base for offset in self.offsets[lo:hi + 1]))
+        return SentenceTimeline(
+            self.starts[lo:hi],
+            self.ends[lo:hi],
+            offsets,
+            self.text[base:self.offsets[hi]]
+        )
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        """
+        Expands the timeline back into a list of sentence dicts
+        """
+        return [self.sentence(i) for i in range(len(self.starts))]
+
+    def to_bytes(self) -> bytes:
+        """
+        Serializes the timeline into the compact binary wire format:
+        header, float32 starts, float32 ends, uint32 offsets, UTF-8 text
+        """
+        header = _HEADER.pack(_MAGIC, _VERSION, len(self.starts), len(self.text))
+        return b"".join((
+            header,
+            _little_endian(self.starts),
+            _little_endian(self.ends),
+            _little_endian(self.offsets),
+            self.text
+        ))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "SentenceTimeline":
+        """
+        Parses a timeline from the binary wire format
+        """
+        magic, version, count, text_length = _HEADER.unpack_from(data, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("Unsupported sentence timeline format")
+
+        position = _HEADER.size
+        float_bytes = count * 4
+        starts = _from_little_endian("f", data[position:position + float_bytes])
+        position += float_bytes
+        ends = _from_little_endian("f", data[position:position + float_bytes])
+        position += float_bytes
+        offset_bytes = (count + 1) * 4
+        offsets = _from_little_endian("I", data[position:position + offset_bytes])
+        position += offset_bytes
+        text = bytes(data[position:position + text_length])
+        return cls(starts, ends, offsets, text)
+
+    def to_msgpack(self) -> bytes:
+        """
+        Serializes the timeline as a columnar msgpack map
+        """
+        if msgpack is None:
+            raise RuntimeError("msgpack is not installed. Install with: pip install msgpack")
+        return msgpack.packb({
+            "start": list(self.starts),
+            "end": list(self.ends),
+            "text": [self.text_at(i) for i in range(len(self.starts))]
+        }, use_single_float=True)
+
+
+class TimelineStore:
+    """
+    Size-bounded in-memory store of timelines keyed by timeline id.
+    The least recently used timeline is evicted once max_entries is reached.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._timelines: "OrderedDict[str, SentenceTimeline]" = OrderedDict()
+
+    def put(self, timeline_id: str, timeline: SentenceTimeline):
+        self._timelines[timeline_id] = timeline
+        self._timelines.move_to_end(timeline_id)
+        while len(self._timelines) > self.max_entries:
+            self._timelines.popitem(last=False)
+
+    def get(self, timeline_id: str) -> Optional[SentenceTimeline]:
+        timeline = self._timelines.get(timeline_id)
+        if timeline is not None:
+            self._timelines.move_to_end(timeline_id)
+        return timeline
+
+
+if __name__ == "__main__":
+    timeline = SentenceTimeline.from_sentences([
+        {"text": f"Sentence {i}.", "start": i * 2.0, "end": i * 2.0 + 1.5} for i in range(25)
+    ])
+    assert timeline.range_indices(3.0, 7.0) == (1, 4)
+    assert timeline.slice(10, 20).to_list() == timeline.to_list()[10:20]
+
+    # A page past the last sentence is empty rather than an error
+    for lo, hi in ((200, 210), (25, 30), (24, 10)):
+        page = timeline.slice(lo, hi)
+        assert len(page) == 0 and page.to_list() == [] and len(page.to_bytes()) > 0
+    assert SentenceTimeline.from_bytes(timeline.slice(200, 210).to_bytes()).to_list() == []
+
+    # A sentence nested in an earlier one still keeps the end times bisectable
+    overlapping = SentenceTimeline.from_sentences([
+        {"text": "Long.", "start": 0.0, "end": 10.0},
+        {"text": "Short.", "start": 1.0, "end": 2.0},
+        {"text": "Later.", "start": 11.0, "end": 12.0},
+    ])
+    assert list(overlapping.ends) == [10.0, 10.0, 12.0]
+    assert overlapping.range_indices(5.0, 6.0) == (0, 2)
+    print("timeline slicing and range checks passed")
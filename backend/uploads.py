@@ -0,0 +1,259 @@
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+import wave
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from starlette.formparsers import MultiPartParser
+
+from pdf_extraction import count_pages
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_PDF_BYTES = int(os.getenv("MAX_PDF_UPLOAD_MB", "100")) * 1024 * 1024
+MAX_AUDIO_BYTES = int(os.getenv("MAX_AUDIO_UPLOAD_MB", "200")) * 1024 * 1024
+MAX_PDF_PAGES = int(os.getenv("MAX_PDF_PAGES", "1000"))
+MAX_AUDIO_SECONDS = float(os.getenv("MAX_AUDIO_SECONDS", str(4 * 3600)))
+UPLOAD_TEMP_DIR = os.getenv("UPLOAD_TEMP_DIR") or None
+UPLOAD_SPOOL_BYTES = int(os.getenv("UPLOAD_SPOOL_BYTES", str(1024 * 1024)))
+# Allowance for multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def _mb(size: float) -> str:
+    return f"{size / (1024 * 1024):.0f} MB"
+
+
+def _current_rss() -> int:
+    """
+    Resident set size of this process in bytes, 0 where /proc is unavailable
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def _peak_rss() -> int:
+    """
+    High-water mark of the process RSS in bytes
+    """
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class UploadMetrics:
+    """
+    Upload counters and the memory footprint of recent upload requests.
+
+    Memory is read from the process RSS, so with concurrent requests the
+    figures of one request include whatever ran alongside it. rss_growth is
+    the RSS difference across the request and peak_raised_by how far the
+    request pushed the process high-water mark.
+    """
+
+    def __init__(self, recent: int = 50):
+        self.stats = {
+            "uploads": 0,
+            "bytes_received": 0,
+            "rejected_too_large": 0,
+            "rejected_pages": 0,
+            "rejected_duration": 0,
+            "max_peak_raised_by": 0,
+        }
+        self.recent: deque = deque(maxlen=recent)
+
+    @contextmanager
+    def track(self, endpoint: str) -> Iterator[Dict[str, Any]]:
+        """
+        Measures the memory of one upload request; the yielded dict holds the report on exit
+        """
+        report: Dict[str, Any] = {"endpoint": endpoint}
+        rss_before, peak_before = _current_rss(), _peak_rss()
+        started = time.perf_counter()
+        try:
+            yield report
+        finally:
+            rss_after, peak_after = _current_rss(), _peak_rss()
+            report.update({
+                "seconds": round(time.perf_counter() - started, 3),
+                "rss_growth": rss_after - rss_before,
+                "peak_rss": peak_after,
+                "peak_raised_by": peak_after - peak_before,
+            })
+            self.stats["uploads"] += 1
+            self.stats["max_peak_raised_by"] = max(self.stats["max_peak_raised_by"], report["peak_raised_by"])
+            self.recent.append(report)
+            logger.info(
+                f"{endpoint}: {report.get('bytes', 0)} bytes in {report['seconds']}s, "
+                f"RSS {rss_before / 2 ** 20:.1f} -> {rss_after / 2 ** 20:.1f} MB, "
+                f"peak {peak_after / 2 ** 20:.1f} MB (+{report['peak_raised_by'] / 2 ** 20:.1f} MB)"
+            )
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "recent": list(self.recent)}
+
+
+upload_metrics = UploadMetrics()
+
+
+def configure_spooling(temp_dir: Optional[str] = UPLOAD_TEMP_DIR, spool_bytes: int = UPLOAD_SPOOL_BYTES):
+    """
+    Starlette spools every multipart file part through a SpooledTemporaryFile before the
+    endpoint runs. Keep at most spool_bytes of each part in memory and roll the rest
+    over to temp_dir instead of the system temp dir.
+    """
+    MultiPartParser.spool_max_size = spool_bytes
+    if temp_dir:
+        os.makedirs(temp_dir, exist_ok=True)
+        tempfile.tempdir = temp_dir
+
+
+def temp_upload_path(suffix: str = "") -> str:
+    """
+    Returns a fresh path in the upload temp dir
+    """
+    return os.path.join(UPLOAD_TEMP_DIR or tempfile.gettempdir(), f"upload_{uuid.uuid4()}{suffix}")
+
+
+class UploadLimitMiddleware:
+    """
+    Rejects request bodies above a per-path byte limit with 413 before they are buffered.
+
+    A declared Content-Length is checked before any of the body is read.
+    Bodies without one are counted as they stream in and cut off as soon as
+    they pass the limit.
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope.get("path")) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Upload exceeds the {_mb(limit - MULTIPART_OVERHEAD)} limit"
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit() and int(value) > limit:
+                upload_metrics.stats["rejected_too_large"] += 1
+                await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+                return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    upload_metrics.stats["rejected_too_large"] += 1
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+async def save_upload(file: UploadFile, destination: str, max_bytes: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Streams an upload to disk in fixed-size chunks, computing its SHA-256 on the way
+    so the content hash needs no second pass over the file. Uploads larger than
+    max_bytes are rejected with 413 and the partial file is removed.
+    """
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with open(destination, "wb") as buffer:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    upload_metrics.stats["rejected_too_large"] += 1
+                    raise HTTPException(status_code=413, detail=f"Upload exceeds the {_mb(max_bytes)} limit")
+                hasher.update(chunk)
+                buffer.write(chunk)
+    except BaseException:
+        if os.path.exists(destination):
+            os.remove(destination)
+        raise
+    upload_metrics.stats["bytes_received"] += size
+    return {"sha256": hasher.hexdigest(), "size": size}
+
+
+async def check_pdf_pages(file_path: str, max_pages: int = MAX_PDF_PAGES) -> int:
+    """
+    Reads the page count before any text is extracted and rejects documents over max_pages
+    """
+    try:
+        page_count = await asyncio.to_thread(count_pages, file_path)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error reading PDF: {str(e)}")
+    if page_count > max_pages:
+        upload_metrics.stats["rejected_pages"] += 1
+        raise HTTPException(status_code=413, detail=f"PDF has {page_count} pages, the limit is {max_pages}")
+    return page_count
+
+
+def probe_audio_duration(file_path: str) -> Optional[float]:
+    """
+    Reads the duration in seconds from the file header: WAV through the wave module,
+    other formats through ffprobe when it is installed. None when it cannot be told.
+    """
+    try:
+        with wave.open(file_path, "rb") as audio:
+            return audio.getnframes() / float(audio.getframerate())
+    except Exception:
+        pass
+
+    ffprobe = shutil.which("ffprobe")
+    if ffprobe is None:
+        return None
+    try:
+        result = subprocess.run(
+            [ffprobe, "-v", "error", "-show_entries", "format=duration",
+             "-of", "default=noprint_wrappers=1:nokey=1", file_path],
+            capture_output=True, text=True, timeout=30
+        )
+        return float(result.stdout.strip())
+    except (subprocess.SubprocessError, ValueError):
+        return None
+
+
+async def check_audio_duration(file_path: str, max_seconds: float = MAX_AUDIO_SECONDS) -> Optional[float]:
+    """
+    Rejects recordings longer than max_seconds before they are sent for transcription
+    """
+    duration = await asyncio.to_thread(probe_audio_duration, file_path)
+    if duration is not None and duration > max_seconds:
+        upload_metrics.stats["rejected_duration"] += 1
+        raise HTTPException(
+            status_code=413,
+            detail=f"Recording is {duration / 60:.0f} minutes long, the limit is {max_seconds / 60:.0f} minutes"
+        )
+    return duration
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from ytdlp_pool import ytdlp_pool
+
+logger = logging.getLogger(__name__)
+
+_INFO_FIELDS = ("title", "duration", "thumbnails", "thumbnail", "subtitles", "automatic_captions", "channel")
+
+
+def summarize_video_info(video_id: str, info: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reduces a yt-dlp info dict to the metadata the UI shows on a video card
+    """
+    thumbnails = [
+        {"url": thumb.get("url"), "width": thumb.get("width"), "height": thumb.get("height")}
+        for thumb in (info.get("thumbnails") or [])
+        if thumb.get("width")
+    ]
+    # Keep the few largest sizes, yt-dlp lists dozens of variants
+    thumbnails = sorted(thumbnails, key=lambda thumb: thumb["width"])[-3:]
+    subtitles = info.get("subtitles") or {}
+    automatic_captions = info.get("automatic_captions") or {}
+
+    return {
+        "video_id": video_id,
+        "title": info.get("title"),
+        "channel": info.get("channel"),
+        "duration": info.get("duration"),
+        "thumbnail": info.get("thumbnail"),
+        "thumbnails": thumbnails,
+        "caption_languages": sorted(subtitles.keys()),
+        "has_captions": "en" in subtitles,
+        "has_auto_captions": "en" in automatic_captions,
+    }
+
+
+class VideoMetadataCache:
+    """
+    Video metadata keyed by video id, served stale-while-revalidate.
+
+    Entries younger than fresh_seconds are served as is. Older entries, up to
+    stale_seconds, are still served immediately while a background task
+    refreshes them. Only missing or expired entries make the caller wait for
+    yt-dlp, and concurrent misses for one video share a single extraction.
+    """
+
+    def __init__(self, max_entries: int = 5000, fresh_seconds: float = 6 * 3600,
+                 stale_seconds: float = 7 * 24 * 3600):
+        self.max_entries = max_entries
+        self.fresh_seconds = fresh_seconds
+        self.stale_seconds = stale_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refreshing: Set[asyncio.Task] = set()
+        self.stats = {"fresh_hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "refresh_errors": 0}
+
+    def _remember(self, video_id: str, metadata: Dict[str, Any]):
+        self._entries[video_id] = (time.time(), metadata)
+        self._entries.move_to_end(video_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _load(self, video_id: str) -> Dict[str, Any]:
+        """
+        Extracts metadata once per video id, sharing the result with concurrent callers
+        """
+        inflight = self._inflight.get(video_id)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[video_id] = future
+        try:
+            info = await ytdlp_pool.extract_info(
+                f"https://www.youtube.com/watch?v={video_id}", fields=_INFO_FIELDS
+            )
+            metadata = summarize_video_info(video_id, info)
+            self._remember(video_id, metadata)
+            future.set_result(metadata)
+            return metadata
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            del self._inflight[video_id]
+
+    async def _refresh(self, video_id: str):
+        self.stats["refreshes"] += 1
+        try:
+            await self._load(video_id)
+        except Exception as e:
+            self.stats["refresh_errors"] += 1
+            logger.warning(f"Background refresh of video {video_id} failed: {e}")
+
+    def _schedule_refresh(self, video_id: str):
+        if video_id in self._inflight:
+            return
+        task = asyncio.create_task(self._refresh(video_id))
+        # Keep a reference so the task is not garbage collected mid-flight
+        self._refreshing.add(task)
+        task.add_done_callback(self._refreshing.discard)
+
+    async def get(self, video_id: str) -> Dict[str, Any]:
+        """
+        Returns metadata for one video, refreshing stale entries in the background
+        """
+        entry = self._entries.get(video_id)
+        if entry is not None:
+            age = time.time() - entry[0]
+            if age < self.fresh_seconds:
+                self._entries.move_to_end(video_id)
+                self.stats["fresh_hits"] += 1
+                return entry[1]
+            if age < self.stale_seconds:
+                self._entries.move_to_end(video_id)
+                self.stats["stale_hits"] += 1
+                self._schedule_refresh(video_id)
+                return entry[1]
+
+        self.stats["misses"] += 1
+        return await self._load(video_id)
+
+    async def get_many(self, video_ids: List[str]) -> Dict[str, Any]:
+        """
+        Looks up many videos at once; cached ones return immediately and
+        misses are extracted concurrently within the yt-dlp pool limits
+        """
+        unique_ids = list(dict.fromkeys(video_ids))
+        results = await asyncio.gather(*(self.get(video_id) for video_id in unique_ids), return_exceptions=True)
+
+        videos: Dict[str, Optional[Dict[str, Any]]] = {}
+        errors: Dict[str, str] = {}
+        for video_id, result in zip(unique_ids, results):
+            if isinstance(result, Exception):
+                videos[video_id] = None
+                errors[video_id] = str(result)
+            else:
+                videos[video_id] = result
+        return {"videos": videos, "errors": errors}
+
+    async def aclose(self):
+        """
+        Cancels pending background refreshes, called on shutdown
+        """
+        for task in list(self._refreshing):
+            task.cancel()
+        await asyncio.gather(*self._refreshing, return_exceptions=True)
+
+
+video_metadata_cache = VideoMetadataCache(
+    max_entries=int(os.getenv("VIDEO_METADATA_CACHE_SIZE", "5000")),
+    fresh_seconds=float(os.getenv("VIDEO_METADATA_FRESH_SECONDS", str(6 * 3600))),
+    stale_seconds=float(os.getenv("VIDEO_METADATA_STALE_SECONDS", str(7 * 24 * 3600))),
+)
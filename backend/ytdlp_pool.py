@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Optional, Sequence
+
+# Seconds a worker waits on a silent connection, so a job abandoned by a timeout ends on its own
+SOCKET_TIMEOUT = float(os.getenv("YTDLP_SOCKET_TIMEOUT", "30"))
+
+# yt-dlp option profiles, one warm YoutubeDL instance per profile in each worker
+YDL_PROFILES = {
+    # Full metadata including caption tracks, nothing is downloaded
+    "info": {
+        "quiet": True,
+        "no_warnings": True,
+        "socket_timeout": SOCKET_TIMEOUT,
+        "skip_download": True,
+        "writeautomaticsub": True,
+        "subtitlesformat": "vtt",
+    },
+    # Playlist/channel expansion without resolving every entry
+    "flat": {
+        "quiet": True,
+        "no_warnings": True,
+        "socket_timeout": SOCKET_TIMEOUT,
+        "skip_download": True,
+        "extract_flat": "in_playlist",
+    },
+}
+
+logger = logging.getLogger(__name__)
+
+# Per-process YoutubeDL instances, created once by the worker initializer
+_worker_ydl: Dict[str, Any] = {}
+
+
+def _init_worker():
+    """
+    Imports yt-dlp once per worker process and builds its YoutubeDL instances
+    """
+    import yt_dlp
+
+    for name, options in YDL_PROFILES.items():
+        _worker_ydl[name] = yt_dlp.YoutubeDL(options)
+
+
+def _prime_worker() -> int:
+    """
+    No-op job submitted by start() so every worker is spawned and initialized up front
+    """
+    return os.getpid()
+
+
+def _extract_in_worker(url: str, profile: str, fields: Optional[Sequence[str]]) -> Dict[str, Any]:
+    """
+    Runs extract_info inside a worker process and returns a picklable dict
+    """
+    ydl = _worker_ydl[profile]
+    info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+    if fields:
+        # Only ship the requested keys back, the full info dict can be several MB
+        return {field: info.get(field) for field in fields}
+    return info
+
+
+class YtDlpPool:
+    """
+    Pool of warm worker processes running yt-dlp in-process.
+
+    Jobs are submitted from async code, capped at max_concurrency in flight
+    (never more than there are workers, so every admitted job has a process).
+    A job that exceeds its timeout is abandoned and, since its worker is
+    still stuck in the extraction, the pool is recycled: a fresh, primed
+    pool takes the next jobs while the old one is shut down without waiting.
+    Jobs still running on the old pool finish there, and its processes exit
+    once they have; no running extraction is killed.
+    """
+
+    def __init__(self, max_workers: int = 4, max_concurrency: int = 4, timeout: float = 60.0):
+        self.max_workers = max_workers
+        self.max_concurrency = max(1, min(max_concurrency, max_workers))
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.recycles = 0
+
+    def _spawn(self) -> ProcessPoolExecutor:
+        executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker)
+        # Submitted while none is idle, each job spawns another worker
+        for _ in range(self.max_workers):
+            executor.submit(_prime_worker)
+        return executor
+
+    def start(self):
+        """
+        Starts and primes every worker process, yt-dlp is imported once per worker here
+        """
+        if self._executor is None:
+            self._executor = self._spawn()
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    def _recycle(self, executor: ProcessPoolExecutor, reason: str):
+        """
+        Swaps in a fresh pool for one with a stuck or dead worker; the old pool drains
+        the jobs it is running and then exits
+        """
+        if self._executor is not executor:
+            return  # already recycled by another job
+        self.recycles += 1
+        self._executor = self._spawn()
+        executor.shutdown(wait=False)
+        logger.warning(f"Recycled the yt-dlp pool after {reason}")
+
+    def shutdown(self):
+        """
+        Stops the worker processes, pending jobs are cancelled
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._semaphore = None
+
+    async def extract_info(self, url: str, profile: str = "info",
+                           fields: Optional[Sequence[str]] = None,
+                           timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Extracts metadata for a URL in a worker process without blocking the event loop.
+        Raises asyncio.TimeoutError if the job does not finish within the timeout.
+        """
+        if profile not in YDL_PROFILES:
+            raise ValueError(f"Unknown yt-dlp profile: {profile}")
+        self.start()
+
+        loop = asyncio.get_running_loop()
+        fields = tuple(fields) if fields else None
+        async with self._semaphore:
+            executor = self._executor
+            future = loop.run_in_executor(executor, _extract_in_worker, url, profile, fields)
+            try:
+                return await asyncio.wait_for(future, timeout or self.timeout)
+            except asyncio.TimeoutError:
+                self._recycle(executor, "a timed-out job")
+                raise
+            except BrokenProcessPool:
+                # A worker died, the pool takes no more jobs
+                self._recycle(executor, "a worker died")
+                raise
+
+
+ytdlp_pool = YtDlpPool(
+    max_workers=int(os.getenv("YTDLP_WORKERS", "4")),
+    max_concurrency=int(os.getenv("YTDLP_MAX_CONCURRENCY", "4")),
+    timeout=float(os.getenv("YTDLP_TIMEOUT", "60")),
+)
@@ -10,6 +10,17 @@ import {
   ResponsiveContainer
 } from 'recharts';
 
+interface ScoreStats {
+  count: number;
+  mean: number;
+  m2: number;
+  min: number | null;
+  max: number | null;
+  ewma: number | null;
+  recent: number[];
+  recent_head: number;
+}
+
 interface LearningStyleProfile {
   perceptual_mode: {
     visual: number;
@@ -41,8 +52,8 @@ interface LearningStyleProfile {
     intermediate_level: number;
     advanced_level: number;
     total_quizzes_taken: number;
-    quiz_scores: number[];
-    concept_detective_scores: number[];
+    quiz_score_stats: ScoreStats;
+    concept_detective_score_stats: ScoreStats;
     overall_progress: number;
   };
   behavioral_metrics: {